@@ -1,16 +1,28 @@
 """Admin API endpoints."""
 
+import asyncio
+import time
 from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 
 from app.api import deps
+from app.core.logging_config import loggers
+from app.core.profiler import (
+    PROFILE_TOKEN_HEADER,
+    ProfilerBusyError,
+    sampling_profiler,
+    sign_profile_token,
+)
 from app.models.admin import AdminLog, AdminLogType
 from app.models.user import User
 from app.schemas.admin import AdminLogResponse, ContentOverrideRequest, UserManagementRequest
 from app.services.admin import AdminService
 
+logger = loggers.get_logger(__name__)
+
 router = APIRouter()
 
 
@@ -83,4 +95,81 @@ async def manage_user(
         details=user_management.details,
         request=request,
     )
-    return {"message": "User management action completed successfully"} 
\ No newline at end of file
+    return {"message": "User management action completed successfully"}
+
+
+@router.get("/profile")
+async def profile_process(
+    seconds: float = Query(10, gt=0, le=60),
+    interval_ms: float = Query(10, ge=1, le=100),
+    format: str = Query("collapsed", regex="^(collapsed|json)$"),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """Sample all thread stacks for a number of seconds.
+
+    Returns collapsed stacks (one ``frame;frame;... count`` line per stack,
+    the input format of flamegraph.pl and speedscope) or JSON.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
+    logger.info(f"Admin {current_user.id} started a {seconds}s profile")
+    try:
+        # Sample from a worker thread so the event loop keeps running and
+        # shows up in the profile
+        profile = await asyncio.to_thread(
+            sampling_profiler.profile, seconds, interval_ms / 1000
+        )
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    if format == "json":
+        return profile.as_dict()
+    return PlainTextResponse(profile.collapsed())
+
+
+@router.post("/profile/token")
+async def create_profile_token(
+    ttl: int = Query(300, ge=1, le=3600),
+    current_user: User = Depends(deps.get_current_user),
+) -> Dict[str, Any]:
+    """Create a signed token that enables per-request profiling.
+
+    Requests sent with the token in the ``X-Profile-Token`` header are
+    profiled; the ``X-Profile-Id`` response header names the result.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
+    logger.info(f"Admin {current_user.id} created a profile token valid for {ttl}s")
+    return {
+        "header": PROFILE_TOKEN_HEADER,
+        "token": sign_profile_token(ttl),
+        "expires_at": int(time.time()) + ttl,
+    }
+
+
+@router.get("/profile/requests/{profile_id}")
+async def get_request_profile(
+    profile_id: str,
+    format: str = Query("collapsed", regex="^(collapsed|json)$"),
+    current_user: User = Depends(deps.get_current_user),
+) -> Any:
+    """Get the profile recorded for a request."""
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
+    profile = sampling_profiler.results.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found",
+        )
+    if format == "json":
+        return profile.as_dict()
+    return PlainTextResponse(profile.collapsed())
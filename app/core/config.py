@@ -78,6 +78,17 @@ class Settings(BaseSettings):
     CLIP_API_KEY: Optional[str] = None
     CLIP_API_URL: Optional[str] = None
 
+    # Tracing
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATE: float = 0.1
+    TRACING_SERVICE_NAME: str = "auto-scheduler"
+    # Spans go to this OTLP/HTTP collector when set, else to TRACING_FILE
+    TRACING_OTLP_ENDPOINT: Optional[str] = None
+    TRACING_FILE: str = "logs/traces.jsonl"
+    # TRACING_FILE rolls over at this size, keeping this many old files
+    TRACING_FILE_MAX_BYTES: int = 10 * 1024 * 1024  # 10MB
+    TRACING_FILE_BACKUPS: int = 5
+
     class Config:
         case_sensitive = True
         env_file = ".env"
@@ -5,6 +5,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from ..models.base_class import Base
+from .tracing import instrument_engine
 
 # Load environment variables
 load_dotenv()
@@ -16,6 +17,7 @@ DATABASE_URL = os.getenv(
 
 # Create SQLAlchemy engine
 engine = create_engine(DATABASE_URL)
+instrument_engine(engine)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
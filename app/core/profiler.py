@@ -0,0 +1,319 @@
+"""Sampling profiler module."""
+
+import asyncio
+import hashlib
+import hmac
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Optional, Set
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logging_config import loggers
+
+logger = loggers.get_logger(__name__)
+
+PROFILE_TOKEN_HEADER = "X-Profile-Token"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+
+@dataclass
+class Profile:
+    """Aggregated stack samples from one profiling run."""
+
+    interval: float
+    started_at: float = field(default_factory=time.time)
+    duration: float = 0.0
+    samples: int = 0
+    truncated: int = 0
+    stacks: Counter = field(default_factory=Counter)
+
+    def collapsed(self) -> str:
+        """Render in the collapsed format read by flamegraph.pl and speedscope."""
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return metadata and stacks as a JSON-serializable dict."""
+        return {
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "interval": self.interval,
+            "samples": self.samples,
+            "truncated": self.truncated,
+            "stacks": dict(self.stacks.most_common()),
+        }
+
+
+class SamplingProfiler:
+    """Statistical profiler sampling thread stacks at a fixed interval.
+
+    A daemon thread reads ``sys._current_frames()`` every ``interval``
+    seconds and counts each distinct stack; nothing is installed in the
+    profiled code, so the overhead is a few microseconds per thread per
+    sample and nothing at all between runs. Only one run happens at a time,
+    durations are capped at ``max_duration`` and the number of distinct
+    stacks at ``max_stacks``, which makes it safe to leave enabled in
+    production behind admin authentication.
+    """
+
+    def __init__(
+        self,
+        max_duration: float = 60.0,
+        min_interval: float = 0.001,
+        max_stacks: int = 10_000,
+        max_depth: int = 128,
+        keep_results: int = 20,
+    ):
+        """Initialize profiler."""
+        self.max_duration = max_duration
+        self.min_interval = min_interval
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self.keep_results = keep_results
+        self.results: "OrderedDict[str, Profile]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._frame_names: Dict[Any, str] = {}
+
+    def _frame_name(self, code) -> str:
+        name = self._frame_names.get(code)
+        if name is None:
+            filename = code.co_filename.rsplit("/", 1)[-1]
+            qualname = getattr(code, "co_qualname", code.co_name)
+            name = f"{qualname} ({filename})"
+            if len(self._frame_names) < 100_000:
+                self._frame_names[code] = name
+        return name
+
+    def _stack(self, frame, thread_name: str) -> str:
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            names.append(self._frame_name(frame.f_code))
+            frame = frame.f_back
+        names.append(thread_name)
+        names.reverse()
+        return ";".join(names)
+
+    def _add(self, profile: Profile, stack: str):
+        if stack in profile.stacks or len(profile.stacks) < self.max_stacks:
+            profile.stacks[stack] += 1
+        else:
+            profile.truncated += 1
+
+    def _run(
+        self,
+        profile: Profile,
+        stop: threading.Event,
+        deadline: float,
+        thread_ids: Optional[Set[int]] = None,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        task: Optional[asyncio.Task] = None,
+        loop_thread_id: Optional[int] = None,
+    ):
+        own_id = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        start = time.monotonic()
+        while not stop.wait(profile.interval) and time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_ids is not None and thread_id not in thread_ids:
+                    continue
+                # On the loop thread only count samples taken while the
+                # profiled request's task is the one running
+                if task is not None and thread_id == loop_thread_id:
+                    if asyncio.current_task(loop) is not task:
+                        continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                self._add(profile, self._stack(frame, names.get(thread_id, str(thread_id))))
+            profile.samples += 1
+        profile.duration = time.monotonic() - start
+
+    def _acquire(self):
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running")
+
+    def _run_request(self, *args, **kwargs):
+        try:
+            self._run(*args, **kwargs)
+        finally:
+            self._lock.release()
+
+    def profile(
+        self,
+        duration: float,
+        interval: float = 0.01,
+        thread_ids: Optional[Iterable[int]] = None,
+    ) -> Profile:
+        """Sample all threads, or ``thread_ids``, for ``duration`` seconds.
+
+        Blocks the calling thread, so call it from a worker thread when on
+        the event loop.
+        """
+        self._acquire()
+        try:
+            profile = Profile(interval=max(interval, self.min_interval))
+            deadline = time.monotonic() + min(duration, self.max_duration)
+            self._run(
+                profile,
+                threading.Event(),
+                deadline,
+                set(thread_ids) if thread_ids is not None else None,
+            )
+            return profile
+        finally:
+            self._lock.release()
+
+    def start_request(self, interval: float = 0.005) -> Optional["RequestProfile"]:
+        """Start profiling the current request task, or None if busy."""
+        try:
+            self._acquire()
+        except ProfilerBusyError:
+            return None
+        loop_thread_id = threading.get_ident()
+        profile = Profile(interval=max(interval, self.min_interval))
+        stop = threading.Event()
+        # The sampler thread releases the lock itself when it exits
+        thread = threading.Thread(
+            target=self._run_request,
+            args=(profile, stop, time.monotonic() + self.max_duration),
+            kwargs={
+                "thread_ids": {loop_thread_id},
+                "loop": asyncio.get_running_loop(),
+                "task": asyncio.current_task(),
+                "loop_thread_id": loop_thread_id,
+            },
+            name="request-profiler",
+            daemon=True,
+        )
+        thread.start()
+        return RequestProfile(self, profile, stop, thread)
+
+    def store(self, profile: Profile, profile_id: Optional[str] = None) -> str:
+        """Keep a profile for later retrieval and return its id."""
+        profile_id = profile_id or uuid.uuid4().hex
+        self.results[profile_id] = profile
+        while len(self.results) > self.keep_results:
+            self.results.popitem(last=False)
+        return profile_id
+
+
+class RequestProfile:
+    """Handle on a running per-request profile."""
+
+    def __init__(
+        self,
+        profiler: SamplingProfiler,
+        profile: Profile,
+        stop: threading.Event,
+        thread: threading.Thread,
+    ):
+        """Initialize request profile."""
+        self.profiler = profiler
+        self.profile = profile
+        self.profile_id = uuid.uuid4().hex
+        self._stop = stop
+        self._thread = thread
+
+    def finish(self, timeout: float = 1.0) -> Profile:
+        """Stop sampling, wait for the sampler to exit and store the profile."""
+        self._stop.set()
+        # The sampler exits after the sample in progress; joining it keeps
+        # late samples out of the stored profile and sets its duration
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(
+                f"Profiler thread still running after {timeout}s, "
+                f"storing profile {self.profile_id} as is"
+            )
+        self.profiler.store(self.profile, self.profile_id)
+        return self.profile
+
+
+def _token_signature(expires: int) -> str:
+    return hmac.new(
+        settings.SECRET_KEY.encode(), f"profile:{expires}".encode(), hashlib.sha256
+    ).hexdigest()
+
+
+def sign_profile_token(ttl: int = 300) -> str:
+    """Create a token enabling per-request profiling for ``ttl`` seconds."""
+    expires = int(time.time()) + ttl
+    return f"{expires}.{_token_signature(expires)}"
+
+
+def verify_profile_token(token: str, max_ttl: int = 3600) -> bool:
+    """Check a profile token's signature and expiry."""
+    try:
+        expires_str, signature = token.split(".", 1)
+        expires = int(expires_str)
+    except ValueError:
+        return False
+    now = time.time()
+    if not now < expires <= now + max_ttl:
+        return False
+    return hmac.compare_digest(signature, _token_signature(expires))
+
+
+class ProfilingMiddleware:
+    """Profile requests carrying a valid signed ``X-Profile-Token`` header.
+
+    The profile is stored on the profiler and its id returned in the
+    ``X-Profile-Id`` response header. Requests with a missing or invalid
+    token, or arriving while another profile runs, are served normally.
+    """
+
+    def __init__(self, app: ASGIApp, profiler: Optional[SamplingProfiler] = None):
+        """Initialize middleware."""
+        self.app = app
+        self.profiler = profiler or sampling_profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = None
+        header = PROFILE_TOKEN_HEADER.lower().encode()
+        for key, value in scope.get("headers", []):
+            if key == header:
+                token = value.decode("latin-1")
+                break
+        if not token or not verify_profile_token(token):
+            await self.app(scope, receive, send)
+            return
+
+        request_profile = self.profiler.start_request()
+        if request_profile is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[PROFILE_ID_HEADER] = request_profile.profile_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Joining the sampler takes at most one sample pass
+            request_profile.finish()
+            logger.info(
+                f"Profiled {scope['method']} {scope['path']} "
+                f"as {request_profile.profile_id} ({request_profile.profile.samples} samples)"
+            )
+
+
+sampling_profiler = SamplingProfiler()
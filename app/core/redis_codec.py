@@ -0,0 +1,128 @@
+"""Size-threshold compression codec for values stored in Redis."""
+
+import json
+import logging
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Header bytes prefixed to every encoded value. Values written before the
+# codec existed are plain JSON and start with "{" or "[", so they never
+# collide with these and are still readable.
+HEADER_RAW = b"\x00"
+HEADER_ZLIB = b"\x01"
+HEADER_ZSTD = b"\x02"
+
+DEFAULT_THRESHOLD = 1024  # bytes
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+class CodecError(Exception):
+    """Raised when a stored value cannot be decoded."""
+
+
+@dataclass
+class CompressionStats:
+    """Running counters for the codec."""
+
+    writes: int = 0
+    compressed_writes: int = 0
+    raw_bytes: int = 0
+    stored_bytes: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.raw_bytes - self.stored_bytes
+
+    def as_dict(self) -> Dict[str, Any]:
+        ratio = self.stored_bytes / self.raw_bytes if self.raw_bytes else 1.0
+        return {
+            "writes": self.writes,
+            "compressed_writes": self.compressed_writes,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "bytes_saved": self.bytes_saved,
+            "ratio": round(ratio, 4),
+        }
+
+
+class RedisCodec:
+    """Encode JSON values, compressing anything above ``threshold`` bytes."""
+
+    def __init__(self, threshold: int = DEFAULT_THRESHOLD, algorithm: Optional[str] = None):
+        """Initialize codec.
+
+        ``algorithm`` is ``"zstd"`` or ``"zlib"``; by default zstd is used
+        when the ``zstandard`` package is installed, zlib otherwise.
+        """
+        if algorithm is None:
+            algorithm = "zstd" if zstandard is not None else "zlib"
+        if algorithm == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed, falling back to zlib")
+            algorithm = "zlib"
+        if algorithm not in ("zstd", "zlib"):
+            raise ValueError(f"Unknown compression algorithm: {algorithm}")
+
+        self.threshold = threshold
+        self.algorithm = algorithm
+        self.stats = CompressionStats()
+        self._zstd_compressor = (
+            zstandard.ZstdCompressor(level=ZSTD_LEVEL) if zstandard is not None else None
+        )
+        self._zstd_decompressor = (
+            zstandard.ZstdDecompressor() if zstandard is not None else None
+        )
+
+    def encode(self, value: Any) -> bytes:
+        """Serialize ``value`` to JSON and prefix it with a header byte."""
+        raw = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        self.stats.writes += 1
+        self.stats.raw_bytes += len(raw)
+
+        if len(raw) >= self.threshold:
+            if self.algorithm == "zstd":
+                payload = HEADER_ZSTD + self._zstd_compressor.compress(raw)
+            else:
+                payload = HEADER_ZLIB + zlib.compress(raw, ZLIB_LEVEL)
+            # Incompressible data is stored as-is
+            if len(payload) < len(raw) + 1:
+                self.stats.compressed_writes += 1
+                self.stats.stored_bytes += len(payload)
+                return payload
+
+        payload = HEADER_RAW + raw
+        self.stats.stored_bytes += len(payload)
+        return payload
+
+    def decode(self, data: bytes) -> Any:
+        """Decode a value written by :meth:`encode` or a legacy JSON string."""
+        if not data:
+            raise CodecError("Empty value")
+        header, body = data[:1], data[1:]
+        try:
+            if header == HEADER_RAW:
+                raw = body
+            elif header == HEADER_ZLIB:
+                raw = zlib.decompress(body)
+            elif header == HEADER_ZSTD:
+                if self._zstd_decompressor is None:
+                    raise CodecError("Value is zstd-compressed but zstandard is not installed")
+                raw = self._zstd_decompressor.decompress(body)
+            else:
+                # Legacy uncompressed JSON without a header
+                raw = data
+            return json.loads(raw)
+        except (zlib.error, ValueError) as e:
+            raise CodecError(str(e)) from e
+        except Exception as e:
+            if zstandard is not None and isinstance(e, zstandard.ZstdError):
+                raise CodecError(str(e)) from e
+            raise
@@ -1,11 +1,13 @@
 """Redis configuration for the application."""
 
-import json
 import logging
-from typing import Dict, Any, Optional, Union, cast, Protocol, runtime_checkable
+from typing import ContextManager, Dict, Any, Optional, Union, cast, Protocol, runtime_checkable
 import redis.asyncio as redis
 from redis.exceptions import RedisError
 
+from app.core.redis_codec import DEFAULT_THRESHOLD, CodecError, RedisCodec
+from app.core.tracing import CLIENT, Span, tracer
+
 logger = logging.getLogger(__name__)
 
 @runtime_checkable
@@ -31,56 +33,88 @@ class AsyncRedisProtocol(Protocol):
 class RedisClient:
     """Redis client wrapper with type hints and error handling."""
     
-    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0):
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        db: int = 0,
+        compression_threshold: int = DEFAULT_THRESHOLD,
+        compression: Optional[str] = None,
+    ):
         """Initialize Redis client."""
         self._client: redis.Redis[str] = redis.Redis(host=host, port=port, db=db, decode_responses=True)
+        # JSON values may be compressed, so they are read and written as bytes
+        self._binary_client: redis.Redis[bytes] = redis.Redis(host=host, port=port, db=db, decode_responses=False)
+        self.codec = RedisCodec(threshold=compression_threshold, algorithm=compression)
+    
+    def _span(self, operation: str) -> ContextManager[Span]:
+        """Trace one Redis command."""
+        return tracer.start_span(
+            f"redis {operation}",
+            {"db.system": "redis", "db.operation": operation},
+            kind=CLIENT,
+        )
     
     async def get(self, key: str) -> Optional[str]:
         """Get value from Redis."""
-        try:
-            return await self._client.get(key)
-        except RedisError as e:
-            logger.error(f"Redis get error: {str(e)}")
-            return None
+        with self._span("GET") as span:
+            try:
+                return await self._client.get(key)
+            except RedisError as e:
+                span.record_exception(e)
+                logger.error(f"Redis get error: {str(e)}")
+                return None
     
     async def set(self, key: str, value: Union[str, bytes], expire: int = 3600) -> bool:
         """Set value in Redis with expiration."""
-        try:
-            result = await self._client.set(key, value, ex=expire)
-            return bool(result) if result is not None else False
-        except RedisError as e:
-            logger.error(f"Redis set error: {str(e)}")
-            return False
+        with self._span("SET") as span:
+            try:
+                result = await self._client.set(key, value, ex=expire)
+                return bool(result) if result is not None else False
+            except RedisError as e:
+                span.record_exception(e)
+                logger.error(f"Redis set error: {str(e)}")
+                return False
     
     async def delete(self, key: str) -> bool:
         """Delete key from Redis."""
-        try:
-            result = await self._client.delete(key)
-            return bool(result)
-        except RedisError as e:
-            logger.error(f"Redis delete error: {str(e)}")
-            return False
+        with self._span("DEL") as span:
+            try:
+                result = await self._client.delete(key)
+                return bool(result)
+            except RedisError as e:
+                span.record_exception(e)
+                logger.error(f"Redis delete error: {str(e)}")
+                return False
     
     async def get_json(self, key: str) -> Optional[Dict[str, Any]]:
-        """Get JSON value from Redis."""
-        try:
-            value = await self._client.get(key)
-            if value is None:
+        """Get JSON value from Redis, transparently decompressing it."""
+        with self._span("GET") as span:
+            try:
+                value = await self._binary_client.get(key)
+                if value is None:
+                    return None
+                return cast(Dict[str, Any], self.codec.decode(value))
+            except (RedisError, CodecError) as e:
+                span.record_exception(e)
+                logger.error(f"Redis get_json error: {str(e)}")
                 return None
-            return cast(Dict[str, Any], json.loads(value))
-        except (RedisError, json.JSONDecodeError) as e:
-            logger.error(f"Redis get_json error: {str(e)}")
-            return None
     
     async def set_json(self, key: str, value: Dict[str, Any], expire: int = 3600) -> bool:
-        """Set JSON value in Redis with expiration."""
-        try:
-            result = await self._client.set(key, json.dumps(value), ex=expire)
-            return bool(result) if result is not None else False
-        except (RedisError, TypeError) as e:
-            logger.error(f"Redis set_json error: {str(e)}")
-            return False
+        """Set JSON value in Redis with expiration, compressing large values."""
+        with self._span("SET") as span:
+            try:
+                result = await self._binary_client.set(key, self.codec.encode(value), ex=expire)
+                return bool(result) if result is not None else False
+            except (RedisError, TypeError) as e:
+                span.record_exception(e)
+                logger.error(f"Redis set_json error: {str(e)}")
+                return False
     
+    def compression_stats(self) -> Dict[str, Any]:
+        """Get bytes written and saved by JSON value compression."""
+        return self.codec.stats.as_dict()
+
     async def flushdb(self) -> bool:
         """Flush all keys from the current database."""
         try:
@@ -6,6 +6,7 @@ from typing import Any, Dict, List, Optional
 
 from app.core.logging_config import loggers
 from app.core.redis_config import redis
+from app.core.tracing import PRODUCER, tracer
 
 logger = loggers.get_logger(__name__)
 
@@ -108,21 +109,26 @@ class Scheduler:
         """Schedule a new job"""
         try:
             job_id = f"job:{datetime.now().timestamp()}"
-            job = {
-                "id": job_id,
-                "data": job_data,
-                "scheduled_time": scheduled_time.isoformat(),
-                "status": "pending",
-                "retries": 0,
-                "created_at": datetime.now().isoformat(),
-            }
-
-            # Add to scheduled queue
-            await self.redis.set(f"{self.queue_key}:{job_id}", job)
+            with tracer.start_span(
+                "scheduler.schedule_job", {"job.id": job_id}, kind=PRODUCER
+            ):
+                job = {
+                    "id": job_id,
+                    "data": job_data,
+                    "scheduled_time": scheduled_time.isoformat(),
+                    "status": "pending",
+                    "retries": 0,
+                    "created_at": datetime.now().isoformat(),
+                    # Restored by the worker so the job joins this trace
+                    "trace": tracer.inject(),
+                }
+
+                # Add to scheduled queue
+                await self.redis.set(f"{self.queue_key}:{job_id}", job)
 
-            # Add to sorted set for scheduling
-            score = scheduled_time.timestamp()
-            await self.redis.zadd(self.queue_key, {job_id: score})
+                # Add to sorted set for scheduling
+                score = scheduled_time.timestamp()
+                await self.redis.zadd(self.queue_key, {job_id: score})
 
             logger.info(f"Job scheduled: {job_id}")
             return job_id
@@ -0,0 +1,580 @@
+"""Lightweight span tracing module."""
+
+import atexit
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.logging_config import loggers
+
+logger = loggers.get_logger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+TRACE_ID_HEADER = "X-Trace-Id"
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Span kinds, numbered as in OTLP
+INTERNAL = 1
+SERVER = 2
+CLIENT = 3
+PRODUCER = 4
+CONSUMER = 5
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    """Identifiers of a span, as propagated between processes."""
+
+    trace_id: str
+    span_id: str
+    sampled: bool = True
+
+    @property
+    def traceparent(self) -> str:
+        """Render as a W3C ``traceparent`` value."""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def parse(cls, value: Optional[str]) -> Optional["SpanContext"]:
+        """Parse a W3C ``traceparent`` value, or return None if invalid."""
+        if not value:
+            return None
+        parts = value.strip().split("-")
+        if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+            return None
+        try:
+            int(parts[1], 16)
+            int(parts[2], 16)
+            flags = int(parts[3][:2], 16)
+        except ValueError:
+            return None
+        if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+            return None
+        return cls(parts[1], parts[2], bool(flags & 1))
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = (
+        "tracer", "name", "context", "parent_id", "kind",
+        "attributes", "start_ns", "end_ns", "status", "error",
+    )
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        context: SpanContext,
+        parent_id: Optional[str],
+        kind: int,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        """Initialize span."""
+        self.tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes) if attributes else {}
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        """Set an attribute on the span."""
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException):
+        """Mark the span as failed by ``exc``."""
+        self.status = "error"
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def end(self):
+        """End the span and hand it to the exporter if sampled."""
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self.context.sampled:
+            self.tracer.on_end(self)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the span as a JSON-serializable dict."""
+        end_ns = self.end_ns or time.time_ns()
+        return {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "end_ns": end_ns,
+            "duration_ms": (end_ns - self.start_ns) / 1e6,
+            "attributes": self.attributes,
+            "status": self.status,
+            "error": self.error,
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    """Get the active span, if any."""
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    """Get the ID of the active trace, if any."""
+    span = _current_span.get()
+    return span.context.trace_id if span is not None else None
+
+
+class FileSpanExporter:
+    """
+    Append finished spans to a local file, one JSON object per line.
+    Rolls over like the log files: once the file would grow past
+    ``max_bytes`` it is renamed to ``path.1`` (older files shift up) and
+    only ``backup_count`` old files are kept.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        service_name: str,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+    ):
+        """Initialize exporter."""
+        self.path = path
+        self.service_name = service_name
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _rotate(self):
+        """Shift path -> path.1 -> path.2 ..., dropping the oldest."""
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def export(self, spans: List[Dict[str, Any]]):
+        """Write a batch of spans."""
+        data = "".join(
+            json.dumps({"service": self.service_name, **span}, default=str) + "\n"
+            for span in spans
+        ).encode()
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        if size and size + len(data) > self.max_bytes:
+            self._rotate()
+        with open(self.path, "ab") as f:
+            f.write(data)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Mapping[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {"key": key, "value": _otlp_value(value)}
+        for key, value in attributes.items()
+        if value is not None
+    ]
+
+
+class OTLPSpanExporter:
+    """Send finished spans to an OTLP/HTTP collector as JSON."""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 5.0):
+        """Initialize exporter."""
+        endpoint = endpoint.rstrip("/")
+        if not endpoint.endswith("/v1/traces"):
+            endpoint += "/v1/traces"
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def _span(self, span: Dict[str, Any]) -> Dict[str, Any]:
+        body = {
+            "traceId": span["trace_id"],
+            "spanId": span["span_id"],
+            "name": span["name"],
+            "kind": span["kind"],
+            "startTimeUnixNano": str(span["start_ns"]),
+            "endTimeUnixNano": str(span["end_ns"]),
+            "attributes": _otlp_attributes(span["attributes"]),
+            "status": {"code": 2, "message": span["error"]}
+            if span["status"] == "error" else {"code": 1},
+        }
+        if span["parent_id"]:
+            body["parentSpanId"] = span["parent_id"]
+        return body
+
+    def export(self, spans: List[Dict[str, Any]]):
+        """Post a batch of spans."""
+        payload = {
+            "resourceSpans": [{
+                "resource": {
+                    "attributes": _otlp_attributes({"service.name": self.service_name}),
+                },
+                "scopeSpans": [{
+                    "scope": {"name": __name__},
+                    "spans": [self._span(span) for span in spans],
+                }],
+            }]
+        }
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class BatchSpanProcessor:
+    """Export finished spans in batches from a background thread.
+
+    Ending a span only puts it on a bounded queue, so request handlers
+    never wait on the exporter. Spans arriving while the queue is full are
+    dropped and counted.
+    """
+
+    def __init__(
+        self,
+        exporter: Any,
+        max_queue_size: int = 2048,
+        max_batch_size: int = 512,
+        schedule_delay: float = 2.0,
+    ):
+        """Initialize processor."""
+        self.exporter = exporter
+        self.max_batch_size = max_batch_size
+        self.schedule_delay = schedule_delay
+        self.dropped = 0
+        self.exported = 0
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="span-exporter", daemon=True
+                    )
+                    self._thread.start()
+                    atexit.register(self.shutdown)
+
+    def on_end(self, span: Span):
+        """Queue a finished span for export."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(span.as_dict())
+        except queue.Full:
+            self.dropped += 1
+
+    def _export(self, batch: List[Dict[str, Any]]):
+        try:
+            self.exporter.export(batch)
+            self.exported += len(batch)
+        except Exception as e:
+            logger.warning(f"Failed to export {len(batch)} spans: {e}")
+
+    def _run(self):
+        while True:
+            batch: List[Dict[str, Any]] = []
+            stopping = False
+            deadline = time.monotonic() + self.schedule_delay
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                self._export(batch)
+            if stopping:
+                return
+
+    def shutdown(self, timeout: float = 5.0):
+        """Flush queued spans and stop the export thread."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+
+
+class Tracer:
+    """Create spans and propagate trace context.
+
+    The active span is kept in a context variable, so it follows the
+    request through awaits, tasks it spawns and ``asyncio.to_thread``
+    calls. Sampling is decided once per trace at its root and carried in
+    the propagated context; unsampled spans still propagate IDs but cost
+    nothing to export.
+    """
+
+    def __init__(
+        self,
+        service_name: str,
+        processor: Optional[BatchSpanProcessor] = None,
+        sample_rate: float = 1.0,
+    ):
+        """Initialize tracer."""
+        self.service_name = service_name
+        self.processor = processor
+        self.sample_rate = sample_rate
+
+    def on_end(self, span: Span):
+        """Pass a finished span to the processor."""
+        if self.processor is not None:
+            self.processor.on_end(span)
+
+    def start(
+        self,
+        name: str,
+        attributes: Optional[Dict[str, Any]] = None,
+        parent: Optional[SpanContext] = None,
+        kind: int = INTERNAL,
+    ) -> Span:
+        """Start a span without making it active; call ``end()`` on it."""
+        if parent is None:
+            active = _current_span.get()
+            parent = active.context if active is not None else None
+        if parent is None:
+            sampled = self.processor is not None and random.random() < self.sample_rate
+            context = SpanContext(_new_id(128), _new_id(64), sampled)
+            parent_id = None
+        else:
+            context = SpanContext(
+                parent.trace_id, _new_id(64), parent.sampled and self.processor is not None
+            )
+            parent_id = parent.span_id
+        return Span(self, name, context, parent_id, kind, attributes)
+
+    @contextmanager
+    def start_span(
+        self,
+        name: str,
+        attributes: Optional[Dict[str, Any]] = None,
+        parent: Optional[SpanContext] = None,
+        kind: int = INTERNAL,
+    ) -> Iterator[Span]:
+        """Run the enclosed block in a new active span."""
+        span = self.start(name, attributes, parent, kind)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def traced(
+        self, name: Optional[str] = None, kind: int = INTERNAL, **attributes: Any
+    ) -> Callable:
+        """Decorate a sync or async function to run in its own span."""
+
+        def decorator(func: Callable) -> Callable:
+            span_name = name or func.__qualname__
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                    with self.start_span(span_name, attributes, kind=kind):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                with self.start_span(span_name, attributes, kind=kind):
+                    return func(*args, **kwargs)
+            return wrapper
+
+        return decorator
+
+    def inject(self) -> Dict[str, str]:
+        """Return the active trace context for embedding in a payload."""
+        span = _current_span.get()
+        if span is None:
+            return {}
+        return {TRACEPARENT_HEADER: span.context.traceparent}
+
+    def extract(self, carrier: Optional[Mapping[str, Any]]) -> Optional[SpanContext]:
+        """Read a trace context written by ``inject``."""
+        if not carrier:
+            return None
+        return SpanContext.parse(carrier.get(TRACEPARENT_HEADER))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get exporter counters."""
+        if self.processor is None:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "sample_rate": self.sample_rate,
+            "exported": self.processor.exported,
+            "dropped": self.processor.dropped,
+        }
+
+
+def instrument_engine(engine: Any, tracer_: Optional[Tracer] = None):
+    """Record a client span for every statement run on a SQLAlchemy engine."""
+    from sqlalchemy import event
+
+    tracer_ = tracer_ or tracer
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current_span.get() is None:
+            return
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+        context._trace_span = tracer_.start(
+            f"db {operation}",
+            {
+                "db.system": engine.dialect.name,
+                "db.operation": operation,
+                "db.statement": statement[:1000],
+            },
+            kind=CLIENT,
+        )
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            span.end()
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        span = getattr(exception_context.execution_context, "_trace_span", None)
+        if span is not None:
+            span.record_exception(exception_context.original_exception)
+            span.end()
+
+
+class TracingMiddleware:
+    """Run each HTTP request in a server span.
+
+    An incoming ``traceparent`` header continues the caller's trace, and an
+    ``X-Request-ID`` is recorded on the span so traces can be found from
+    access logs. The trace ID is returned in ``X-Trace-Id``.
+    """
+
+    def __init__(self, app: ASGIApp, tracer_: Optional[Tracer] = None):
+        """Initialize middleware."""
+        self.app = app
+        self.tracer = tracer_ or tracer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = request_id = None
+        traceparent_header = TRACEPARENT_HEADER.encode()
+        request_id_header = REQUEST_ID_HEADER.lower().encode()
+        for key, value in scope.get("headers", []):
+            if key == traceparent_header:
+                traceparent = value.decode("latin-1")
+            elif key == request_id_header:
+                request_id = value.decode("latin-1")
+
+        with self.tracer.start_span(
+            f"{scope['method']} {scope['path']}",
+            {
+                "http.method": scope["method"],
+                "http.target": scope["path"],
+                "http.request_id": request_id,
+            },
+            parent=SpanContext.parse(traceparent),
+            kind=SERVER,
+        ) as span:
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.status = "error"
+                    MutableHeaders(scope=message)[TRACE_ID_HEADER] = span.context.trace_id
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                # Name by route template once routing has matched one
+                route = scope.get("route")
+                template = getattr(route, "path_format", None) or getattr(route, "path", None)
+                if template:
+                    span.name = f"{scope['method']} {template}"
+                    span.set_attribute("http.route", template)
+
+
+def _build_tracer() -> Tracer:
+    processor = None
+    if settings.TRACING_ENABLED:
+        if settings.TRACING_OTLP_ENDPOINT:
+            exporter: Any = OTLPSpanExporter(
+                settings.TRACING_OTLP_ENDPOINT, settings.TRACING_SERVICE_NAME
+            )
+        else:
+            exporter = FileSpanExporter(
+                settings.TRACING_FILE,
+                settings.TRACING_SERVICE_NAME,
+                settings.TRACING_FILE_MAX_BYTES,
+                settings.TRACING_FILE_BACKUPS,
+            )
+        processor = BatchSpanProcessor(exporter)
+    return Tracer(settings.TRACING_SERVICE_NAME, processor, settings.TRACING_SAMPLE_RATE)
+
+
+tracer = _build_tracer()
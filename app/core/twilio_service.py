@@ -5,6 +5,8 @@ from dotenv import load_dotenv
 from fastapi import HTTPException
 from twilio.rest import Client
 
+from app.core.tracing import CLIENT, tracer
+
 # Load environment variables
 load_dotenv()
 
@@ -34,9 +36,10 @@ class TwilioService:
             dict: Message details including SID and status
         """
         try:
-            message = self.client.messages.create(
-                body=message, from_=self.phone_number, to=to_number
-            )
+            with tracer.start_span("twilio.messages.create", kind=CLIENT):
+                message = self.client.messages.create(
+                    body=message, from_=self.phone_number, to=to_number
+                )
 
             return {
                 "success": True,
@@ -1,50 +1,90 @@
 import asyncio
+import importlib
 import logging
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 from .logging_config import loggers
 from .scheduler import scheduler
+from .tracing import CONSUMER, tracer
 
 logger = loggers["root"]
 
+# Handlers receive the job and return its result
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+
+# Modules that register job handlers when imported
+JOB_HANDLER_MODULES = ("app.storage.policy",)
+
 
 class Worker:
     def __init__(self):
         self.running = False
         self.poll_interval = 60  # seconds
+        self.handlers: Dict[str, JobHandler] = {}
 
-    async def process_job(self, job: Dict[str, Any]) -> None:
-        """Process a single job"""
-        try:
-            job_id = job["id"]
-            logger.info(f"Processing job: {job_id}")
+    def register_handler(self, job_type: str, handler: JobHandler) -> None:
+        """Run jobs whose data has ``type`` set to ``job_type`` with ``handler``"""
+        self.handlers[job_type] = handler
 
-            # Update job status to processing
-            await scheduler.update_job_status(job_id, "processing")
+    def _load_handlers(self) -> None:
+        for module in JOB_HANDLER_MODULES:
+            try:
+                importlib.import_module(module)
+            except Exception as e:
+                logger.error(f"Failed to load job handlers from {module}: {str(e)}")
 
-            # TODO: Implement actual job processing logic
-            # This is where you'd add your specific job handling code
-            # For example:
-            # - Posting to social media
-            # - Processing content
-            # - Sending notifications
+    async def process_job(self, job: Dict[str, Any]) -> None:
+        """Process a single job"""
+        job_id = job["id"]
+        # Continue the trace of the request that scheduled the job
+        with tracer.start_span(
+            "worker.process_job",
+            {
+                "job.id": job_id,
+                "job.retries": job.get("retries", 0),
+                "job.queue_delay_s": _queue_delay(job),
+            },
+            parent=tracer.extract(job.get("trace")),
+            kind=CONSUMER,
+        ) as span:
+            try:
+                logger.info(f"Processing job: {job_id}")
 
-            # Simulate job processing
-            await asyncio.sleep(2)
+                # Update job status to processing
+                await scheduler.update_job_status(job_id, "processing")
 
-            # Update job status to completed
-            await scheduler.update_job_status(
-                job_id, "completed", {"processed_at": datetime.now().isoformat()}
-            )
+                job_type = (job.get("data") or {}).get("type")
+                handler = self.handlers.get(job_type)
+                if handler is not None:
+                    span.set_attribute("job.type", job_type)
+                    result = await handler(job) or {}
+                else:
+                    # TODO: Implement actual job processing logic
+                    # This is where you'd add your specific job handling code
+                    # For example:
+                    # - Posting to social media
+                    # - Processing content
+                    # - Sending notifications
+
+                    # Simulate job processing
+                    await asyncio.sleep(2)
+                    result = {}
+
+                # Update job status to completed
+                await scheduler.update_job_status(
+                    job_id, "completed", {**result, "processed_at": datetime.now().isoformat()}
+                )
 
-        except Exception as e:
-            logger.error(f"Error processing job {job_id}: {str(e)}")
-            await scheduler.retry_job(job_id, str(e))
+            except Exception as e:
+                span.record_exception(e)
+                logger.error(f"Error processing job {job_id}: {str(e)}")
+                await scheduler.retry_job(job_id, str(e))
 
     async def run(self) -> None:
         """Run the worker"""
         self.running = True
+        self._load_handlers()
         logger.info("Worker started")
 
         while self.running:
@@ -72,5 +112,14 @@ class Worker:
         logger.info("Worker stopped")
 
 
+def _queue_delay(job: Dict[str, Any]) -> Optional[float]:
+    """Seconds between a job's scheduled time and now."""
+    try:
+        scheduled = datetime.fromisoformat(job["scheduled_time"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return max((datetime.now() - scheduled).total_seconds(), 0.0)
+
+
 # Create global worker instance
 worker = Worker()
@@ -5,6 +5,8 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.v1 import admin, auth, notifications, users
 from app.core.config import settings
+from app.core.profiler import ProfilingMiddleware
+from app.core.tracing import TracingMiddleware
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -21,6 +23,12 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+# Per-request profiling for requests carrying a signed X-Profile-Token
+app.add_middleware(ProfilingMiddleware)
+
+# Added last so the request span covers the other middleware
+app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(admin.router, prefix=f"{settings.API_V1_STR}/admin", tags=["admin"])
 app.include_router(auth.router, prefix=f"{settings.API_V1_STR}/auth", tags=["auth"])
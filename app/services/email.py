@@ -6,6 +6,7 @@ import smtplib
 from typing import Optional
 
 from app.core.config import settings
+from app.core.tracing import CLIENT, tracer
 
 
 async def send_email(
@@ -31,7 +32,9 @@ async def send_email(
         message.attach(MIMEText(html_body, "html"))
 
     try:
-        with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
+        with tracer.start_span(
+            "smtp.send", {"net.peer.name": settings.SMTP_HOST}, kind=CLIENT
+        ), smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
             if settings.SMTP_TLS:
                 server.starttls()
             if settings.SMTP_USER and settings.SMTP_PASSWORD:
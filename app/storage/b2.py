@@ -9,18 +9,26 @@ Security & Compliance:
 - Never log sensitive information.
 - All operations are logged for auditing.
 """
-from typing import BinaryIO
-from .base import StorageBackend, StorageError, logger
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator
+from .base import STORAGE_STREAM_CHUNK_SIZE, StorageBackend, StorageError, StorageNotFoundError, logger
+import hashlib
+import io
 import os
 import b2sdk.v2 as b2
+from b2sdk.v2.exception import FileNotPresent
 
 class B2StorageBackend(StorageBackend):
     """
     Backblaze B2 storage backend implementation.
     Uses b2sdk for all operations. Credentials and bucket are loaded from environment variables or config.
     """
-    def __init__(self, bucket: str):
+
+    def __init__(self, bucket: str, max_concurrency: int = None):
         self.bucket_name = bucket
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("B2_MAX_CONCURRENCY", self.max_concurrency)
+        )
         self.account_id = os.getenv("B2_ACCOUNT_ID")
         self.application_key = os.getenv("B2_APPLICATION_KEY")
         self.b2_api = b2.B2Api()
@@ -29,8 +37,9 @@ class B2StorageBackend(StorageBackend):
 
     def upload(self, file: BinaryIO, path: str) -> str:
         try:
-            self.bucket.upload_bytes(file.read(), path)
-            url = f"b2://{self.bucket_name}/{path}"
+            # Uploads in buffered parts, never holding the whole file
+            self.bucket.upload_unbound_stream(file, path, buffer_size=STORAGE_STREAM_CHUNK_SIZE)
+            url = self.url(path)
             logger.info(f"Uploaded file to {url}")
             return url
         except Exception as e:
@@ -55,14 +64,65 @@ class B2StorageBackend(StorageBackend):
             logger.error(f"Failed to delete file from B2: {e}")
             raise StorageError("B2 delete failed") from e
 
-    def move(self, path: str, new_backend: StorageBackend) -> str:
+    def open_stream(self, path: str, chunk_size: int = STORAGE_STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        try:
+            response = self.bucket.download_file_by_name(path).response
+        except Exception as e:
+            logger.error(f"Failed to open file from B2: {e}")
+            raise StorageError("B2 download failed") from e
+        try:
+            yield from response.iter_content(chunk_size)
+        except Exception as e:
+            logger.error(f"Failed to stream file from B2: {e}")
+            raise StorageError("B2 download failed") from e
+        finally:
+            response.close()
+
+    def url(self, path: str) -> str:
+        return f"b2://{self.bucket_name}/{path}"
+
+    @contextmanager
+    def _errors(self, operation: str):
         try:
-            data = self.download(path)
-            from io import BytesIO
-            new_path = new_backend.upload(BytesIO(data), path)
-            self.delete(path)
-            logger.info(f"Moved file from B2 to {type(new_backend).__name__}: {path}")
-            return new_path
+            yield
+        except FileNotPresent as e:
+            raise StorageNotFoundError(f"B2 {operation} failed: not found") from e
         except Exception as e:
-            logger.error(f"Failed to move file from B2: {e}")
-            raise StorageError("B2 move failed") from e 
\ No newline at end of file
+            logger.error(f"Failed to {operation} on B2: {e}")
+            raise StorageError(f"B2 {operation} failed") from e
+
+    def size(self, path: str) -> int:
+        with self._errors("get file info"):
+            return self.bucket.get_file_info_by_name(path).size
+
+    def read_range(self, path: str, start: int, length: int) -> bytes:
+        with self._errors("download"):
+            downloaded = self.bucket.download_file_by_name(path, range_=(start, start + length - 1))
+            return downloaded.response.content
+
+    def create_multipart(self, path: str) -> str:
+        with self._errors("start large file"):
+            return self.b2_api.services.large_file.start_large_file(
+                self.bucket.id_, path, "b2/x-auto", {}
+            ).id_
+
+    def upload_part(self, path: str, upload_id: str, part_number: int, data: bytes) -> str:
+        sha1 = hashlib.sha1(data).hexdigest()
+        with self._errors("upload part"):
+            self.b2_api.session.upload_part(upload_id, part_number, len(data), sha1, io.BytesIO(data))
+        return sha1
+
+    def list_parts(self, path: str, upload_id: str) -> Dict[int, str]:
+        with self._errors("list parts"):
+            return {part.part_number: part.content_sha1 for part in self.b2_api.list_parts(upload_id)}
+
+    def complete_multipart(self, path: str, upload_id: str, parts: Dict[int, str]) -> str:
+        with self._errors("finish large file"):
+            self.b2_api.session.finish_large_file(upload_id, [parts[number] for number in sorted(parts)])
+        url = self.url(path)
+        logger.info(f"Uploaded file to {url} in {len(parts)} parts")
+        return url
+
+    def abort_multipart(self, path: str, upload_id: str) -> None:
+        with self._errors("cancel large file"):
+            self.b2_api.cancel_large_file(upload_id)
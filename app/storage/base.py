@@ -10,15 +10,101 @@ Security & Compliance:
 - All file operations should be auditable and logged.
 """
 from abc import ABC, abstractmethod
-from typing import BinaryIO, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, Optional, Tuple, TypeVar
+import asyncio
+import contextvars
+import hashlib
 import logging
+import os
+import threading
+import weakref
 
 logger = logging.getLogger("storage")
 
+T = TypeVar("T")
+
+# Threads shared by all backends for blocking SDK calls made from async code
+STORAGE_EXECUTOR_WORKERS = int(os.getenv("STORAGE_EXECUTOR_WORKERS", 32))
+# Default per-backend limit on concurrent async operations
+STORAGE_MAX_CONCURRENCY = int(os.getenv("STORAGE_MAX_CONCURRENCY", 8))
+# Size of the chunks streamed between backends; bounds the memory of a move
+STORAGE_STREAM_CHUNK_SIZE = int(os.getenv("STORAGE_STREAM_CHUNK_SIZE", 8 * 1024 * 1024))
+# Re-read and hash the copy before deleting the source of a move
+STORAGE_MOVE_VERIFY = os.getenv("STORAGE_MOVE_VERIFY", "true").lower() == "true"
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_storage_executor() -> ThreadPoolExecutor:
+    """
+    Get the bounded thread pool used by the async storage methods.
+    Kept apart from the event loop's default executor so large transfers
+    cannot starve other ``run_in_executor`` users.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=STORAGE_EXECUTOR_WORKERS,
+                    thread_name_prefix="storage",
+                )
+    return _executor
+
 class StorageError(Exception):
     """Custom exception for storage-related errors."""
     pass
 
+class StorageNotFoundError(StorageError):
+    """Raised when the backend reports that a file does not exist."""
+    pass
+
+class HashingReader:
+    """
+    Non-seekable, read-only file object over an iterator of byte chunks.
+    Hashes everything read, so a copy can be verified without keeping it;
+    holds at most one chunk in memory. ``read(n)`` returns exactly ``n``
+    bytes until the end of the stream, as multipart uploaders expect.
+    """
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+        self._offset = 0
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def read(self, size: int = -1) -> bytes:
+        parts = []
+        wanted = size
+        while size < 0 or wanted > 0:
+            if self._offset >= len(self._buffer):
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._buffer, self._offset = chunk, 0
+                continue
+            end = len(self._buffer) if size < 0 else min(len(self._buffer), self._offset + wanted)
+            parts.append(self._buffer[self._offset:end])
+            wanted -= end - self._offset
+            self._offset = end
+        data = b"".join(parts)
+        self.sha256.update(data)
+        self.size += len(data)
+        return data
+
+    def close(self) -> None:
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()
+
 class StorageBackend(ABC):
     """
     Abstract base class for storage backends.
@@ -27,8 +113,19 @@ class StorageBackend(ABC):
     - Use environment variables for credentials.
     - Log all operations and errors (never log secrets).
     - Raise StorageError for all backend-specific errors.
+    Async:
+    - aupload/adownload/adelete/amove run the blocking methods on the shared
+      storage executor, so they never block the event loop.
+    - At most ``max_concurrency`` of them run at once per backend; further
+      calls wait their turn without holding a thread.
     """
 
+    max_concurrency: int = STORAGE_MAX_CONCURRENCY
+
+    # Part limits of the multipart primitives used by the transfer engine
+    min_part_size: int = 5 * 1024 * 1024
+    max_parts: int = 10000
+
     @abstractmethod
     def upload(self, file: BinaryIO, path: str) -> str:
         """
@@ -67,16 +164,241 @@ class StorageBackend(ABC):
         """
         pass
 
+    def open_stream(self, path: str, chunk_size: int = STORAGE_STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Stream a file from the storage backend in chunks.
+        Backends should override this; the default downloads the whole file.
+        Args:
+            path: Path or identifier of the file in the storage backend.
+            chunk_size: Preferred size of each chunk in bytes.
+        Returns:
+            An iterator over the file content.
+        Raises:
+            StorageError: If download fails.
+        """
+        yield self.download(path)
+
+    def checksum(self, path: str, chunk_size: int = STORAGE_STREAM_CHUNK_SIZE) -> Tuple[str, int]:
+        """
+        Compute the SHA-256 and size of a stored file by streaming it.
+        Args:
+            path: Path or identifier of the file in the storage backend.
+            chunk_size: Size of the chunks read.
+        Returns:
+            The hex digest and the size in bytes.
+        Raises:
+            StorageError: If download fails.
+        """
+        reader = HashingReader(self.open_stream(path, chunk_size))
+        while reader.read(chunk_size):
+            pass
+        return reader.sha256.hexdigest(), reader.size
+
+    @abstractmethod
+    def url(self, path: str) -> str:
+        """
+        Get the URL or identifier that upload returns for ``path``.
+        """
+        pass
+
+    def exists(self, path: str) -> bool:
+        """
+        Check whether a file is stored at ``path``.
+        Returns False only when the backend says the file is not there.
+        Raises:
+            StorageError: If the backend cannot be asked (timeouts, server
+                or auth errors), so an outage is never taken for a missing file.
+        """
+        try:
+            self.size(path)
+            return True
+        except StorageNotFoundError:
+            return False
+
+    @abstractmethod
+    def size(self, path: str) -> int:
+        """
+        Get the size of a stored file in bytes.
+        Raises:
+            StorageNotFoundError: If the file does not exist.
+            StorageError: If the size cannot be read.
+        """
+        pass
+
+    @abstractmethod
+    def read_range(self, path: str, start: int, length: int) -> bytes:
+        """
+        Download ``length`` bytes of a file starting at offset ``start``.
+        Raises:
+            StorageError: If download fails.
+        """
+        pass
+
     @abstractmethod
-    def move(self, path: str, new_backend: 'StorageBackend') -> str:
+    def create_multipart(self, path: str) -> str:
+        """
+        Start a multipart upload.
+        Returns:
+            The upload ID passed to the other multipart methods.
+        Raises:
+            StorageError: If the upload cannot be started.
+        """
+        pass
+
+    @abstractmethod
+    def upload_part(self, path: str, upload_id: str, part_number: int, data: bytes) -> str:
+        """
+        Upload one part of a multipart upload. Parts are numbered from 1 and
+        may be uploaded concurrently and in any order.
+        Returns:
+            The backend's token for the part (ETag, SHA-1), needed to complete.
+        Raises:
+            StorageError: If upload fails.
+        """
+        pass
+
+    @abstractmethod
+    def list_parts(self, path: str, upload_id: str) -> Dict[int, str]:
+        """
+        List the parts already stored for a multipart upload.
+        Returns:
+            Part tokens by part number.
+        Raises:
+            StorageError: If the upload no longer exists.
+        """
+        pass
+
+    @abstractmethod
+    def complete_multipart(self, path: str, upload_id: str, parts: Dict[int, str]) -> str:
+        """
+        Assemble the uploaded parts into the final file.
+        Returns:
+            The URL or identifier of the uploaded file.
+        Raises:
+            StorageError: If completion fails.
+        """
+        pass
+
+    @abstractmethod
+    def abort_multipart(self, path: str, upload_id: str) -> None:
+        """
+        Discard a multipart upload and its stored parts.
+        Raises:
+            StorageError: If abort fails.
+        """
+        pass
+
+    def move(
+        self,
+        path: str,
+        new_backend: 'StorageBackend',
+        chunk_size: int = STORAGE_STREAM_CHUNK_SIZE,
+        verify: bool = STORAGE_MOVE_VERIFY,
+    ) -> str:
         """
         Move a file from this backend to another backend.
+        The file is streamed in ``chunk_size`` chunks straight into the
+        target's upload, so memory use does not depend on the file size.
+        With ``verify``, the copy is streamed back and its SHA-256 and size
+        compared with what was read from the source. The source is only
+        deleted once the copy is complete (and verified).
         Args:
             path: Path or identifier of the file in this backend.
             new_backend: The target storage backend instance.
+            chunk_size: Size of the chunks streamed between backends.
+            verify: Whether to check the copy's checksum before deleting.
         Returns:
             The new path or identifier in the target backend.
         Raises:
-            StorageError: If move fails.
+            StorageError: If move fails; the source is kept.
+        """
+        source = type(self).__name__
+        target = type(new_backend).__name__
+        reader = HashingReader(self.open_stream(path, chunk_size))
+        try:
+            new_path = new_backend.upload(reader, path)
+        except Exception as e:
+            logger.error(f"Failed to copy {path} from {source} to {target}: {e}")
+            raise StorageError(f"{source} move failed") from e
+        finally:
+            reader.close()
+
+        if verify:
+            expected = (reader.sha256.hexdigest(), reader.size)
+            try:
+                actual = new_backend.checksum(path, chunk_size)
+            except Exception as e:
+                logger.error(f"Failed to verify {path} in {target}: {e}")
+                raise StorageError(f"{source} move failed") from e
+            if actual != expected:
+                logger.error(
+                    f"Checksum mismatch moving {path} from {source} to {target}: "
+                    f"expected {expected[0]} ({expected[1]} bytes), got {actual[0]} ({actual[1]} bytes)"
+                )
+                raise StorageError(f"{source} move failed: checksum mismatch")
+
+        self.delete(path)
+        logger.info(f"Moved file from {source} to {target}: {path} ({reader.size} bytes)")
+        return new_path
+
+    def _async_limit(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        limits = self.__dict__.get("_async_limits")
+        if limits is None:
+            limits = self.__dict__["_async_limits"] = weakref.WeakKeyDictionary()
+        limit = limits.get(loop)
+        if limit is None:
+            limit = limits[loop] = asyncio.Semaphore(self.max_concurrency)
+        return limit
+
+    async def run_async(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Run a blocking call on the storage executor within this backend's
+        concurrency limit.
+        The slot is released when the call finishes in its thread, not when
+        the caller stops waiting, so cancelled callers cannot push the number
+        of running transfers over the limit.
+        """
+        loop = asyncio.get_running_loop()
+        limit = self._async_limit(loop)
+        await limit.acquire()
+        try:
+            # Copy the context so tracing spans and request IDs carry over
+            context = contextvars.copy_context()
+            future = get_storage_executor().submit(context.run, func, *args)
+        except BaseException:
+            limit.release()
+            raise
+
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(limit.release)
+            except RuntimeError:
+                pass  # Loop already closed
+
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future, loop=loop)
+
+    async def aupload(self, file: BinaryIO, path: str) -> str:
+        """
+        Async counterpart of upload, run off the event loop.
+        """
+        return await self.run_async(self.upload, file, path)
+
+    async def adownload(self, path: str) -> bytes:
+        """
+        Async counterpart of download, run off the event loop.
+        """
+        return await self.run_async(self.download, path)
+
+    async def adelete(self, path: str) -> None:
+        """
+        Async counterpart of delete, run off the event loop.
+        """
+        await self.run_async(self.delete, path)
+
+    async def amove(self, path: str, new_backend: 'StorageBackend') -> str:
+        """
+        Async counterpart of move, run off the event loop.
+        Counts against this backend's concurrency limit only.
         """
-        pass 
\ No newline at end of file
+        return await self.run_async(self.move, path, new_backend)
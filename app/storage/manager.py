@@ -3,16 +3,21 @@ StorageManager
 --------------
 Central manager for all file operations. Selects the backend based on config or function argument.
 """
-from typing import BinaryIO, Optional
+from typing import BinaryIO, Callable, Optional
 from .base import StorageBackend
 from .s3 import S3StorageBackend
 from .b2 import B2StorageBackend
+from .transfer import TransferEngine, TransferReport
+from app.core.tracing import CLIENT, tracer
 import os
 
 class StorageManager:
     """
     StorageManager routes file operations to the correct backend.
     - Uses config (DEFAULT_STORAGE_BACKEND) or per-operation override.
+    - Async routes should use the a* methods, which run transfers off the event loop.
+    - Large media should use upload_large/download_large, which transfer
+      parts in parallel through the TransferEngine and report throughput.
     - Supports easy registration of new backends.
     """
     def __init__(self):
@@ -26,6 +31,7 @@ class StorageManager:
             ),
         }
         self.default_backend = os.getenv("DEFAULT_STORAGE_BACKEND", "s3")
+        self.transfer = TransferEngine()
 
     def get_backend(self, backend: Optional[str] = None) -> StorageBackend:
         key = backend or self.default_backend
@@ -33,19 +39,109 @@ class StorageManager:
             raise ValueError(f"Unknown storage backend: {key}")
         return self.backends[key]
 
+    def _span(self, operation: str, path: str, backend: Optional[str], **attributes):
+        return tracer.start_span(
+            f"storage.{operation}",
+            {
+                "storage.backend": backend or self.default_backend,
+                "storage.path": path,
+                **attributes,
+            },
+            kind=CLIENT,
+        )
+
     def upload(self, file: BinaryIO, path: str, backend: Optional[str] = None) -> str:
-        return self.get_backend(backend).upload(file, path)
+        with self._span("upload", path, backend):
+            return self.get_backend(backend).upload(file, path)
 
     def download(self, path: str, backend: Optional[str] = None) -> bytes:
-        return self.get_backend(backend).download(path)
+        with self._span("download", path, backend) as span:
+            data = self.get_backend(backend).download(path)
+            span.set_attribute("storage.bytes", len(data))
+            return data
 
     def delete(self, path: str, backend: Optional[str] = None) -> None:
-        self.get_backend(backend).delete(path)
+        with self._span("delete", path, backend):
+            self.get_backend(backend).delete(path)
 
     def move(self, path: str, from_backend: Optional[str], to_backend: str) -> str:
-        src = self.get_backend(from_backend)
-        dst = self.get_backend(to_backend)
-        return src.move(path, dst)
+        with self._span("move", path, from_backend, **{"storage.target_backend": to_backend}):
+            src = self.get_backend(from_backend)
+            dst = self.get_backend(to_backend)
+            return src.move(path, dst)
+
+    async def aupload(self, file: BinaryIO, path: str, backend: Optional[str] = None) -> str:
+        with self._span("upload", path, backend):
+            return await self.get_backend(backend).aupload(file, path)
+
+    async def adownload(self, path: str, backend: Optional[str] = None) -> bytes:
+        with self._span("download", path, backend) as span:
+            data = await self.get_backend(backend).adownload(path)
+            span.set_attribute("storage.bytes", len(data))
+            return data
+
+    async def adelete(self, path: str, backend: Optional[str] = None) -> None:
+        with self._span("delete", path, backend):
+            await self.get_backend(backend).adelete(path)
+
+    async def amove(self, path: str, from_backend: Optional[str], to_backend: str) -> str:
+        with self._span("move", path, from_backend, **{"storage.target_backend": to_backend}):
+            src = self.get_backend(from_backend)
+            dst = self.get_backend(to_backend)
+            return await src.amove(path, dst)
+
+    def _record_transfer(self, span, report: TransferReport) -> TransferReport:
+        span.set_attribute("storage.bytes", report.size)
+        span.set_attribute("storage.parts", report.parts)
+        span.set_attribute("storage.throughput_mb_s", report.throughput / (1024 * 1024))
+        return report
+
+    def upload_large(
+        self,
+        file: BinaryIO,
+        path: str,
+        backend: Optional[str] = None,
+        progress: Optional[Callable[[TransferReport], None]] = None,
+    ) -> TransferReport:
+        with self._span("upload_large", path, backend) as span:
+            report = self.transfer.upload(self.get_backend(backend), file, path, progress=progress)
+            return self._record_transfer(span, report)
+
+    def download_large(
+        self,
+        path: str,
+        dest: str,
+        backend: Optional[str] = None,
+        progress: Optional[Callable[[TransferReport], None]] = None,
+    ) -> TransferReport:
+        with self._span("download_large", path, backend) as span:
+            report = self.transfer.download(self.get_backend(backend), path, dest, progress=progress)
+            return self._record_transfer(span, report)
+
+    async def aupload_large(
+        self,
+        file: BinaryIO,
+        path: str,
+        backend: Optional[str] = None,
+        progress: Optional[Callable[[TransferReport], None]] = None,
+    ) -> TransferReport:
+        # The engine runs its own part threads; this holds one backend slot
+        target = self.get_backend(backend)
+        with self._span("upload_large", path, backend) as span:
+            report = await target.run_async(self.transfer.upload, target, file, path, None, progress)
+            return self._record_transfer(span, report)
+
+    async def adownload_large(
+        self,
+        path: str,
+        dest: str,
+        backend: Optional[str] = None,
+        progress: Optional[Callable[[TransferReport], None]] = None,
+    ) -> TransferReport:
+        source = self.get_backend(backend)
+        with self._span("download_large", path, backend) as span:
+            report = await source.run_async(self.transfer.download, source, path, dest, progress)
+            return self._record_transfer(span, report)
 
     def register_backend(self, name: str, backend: StorageBackend):
         """
@@ -1,44 +1,266 @@
 """
 Hot/Cold Storage Policy & Automation
 -----------------------------------
-Defines policy for hot/cold storage and a Celery task to migrate files automatically.
+Defines policy for hot/cold storage and a resumable worker job to migrate files automatically.
 """
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
 from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
 from sqlalchemy.orm import Session
 from app.models.file import FileMetadata, StorageBackendType
+from app.storage.base import StorageError, StorageNotFoundError, logger
 from app.storage.manager import StorageManager
+import asyncio
 import os
+import time
 
 # Policy: files older than this (in days) are considered cold
 HOT_STORAGE_MAX_AGE_DAYS = int(os.getenv("HOT_STORAGE_MAX_AGE_DAYS", 30))
 COLD_BACKEND = StorageBackendType.B2
 HOT_BACKEND = StorageBackendType.S3
 
-# Celery task (pseudo-code, integrate with your Celery app)
-def migrate_hot_to_cold(db: Session):
+# Migration job tuning
+MIGRATION_JOB_TYPE = "storage.migrate_hot_to_cold"
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", 100))
+MIGRATION_CONCURRENCY = int(os.getenv("MIGRATION_CONCURRENCY", 4))
+MIGRATION_MAX_RETRIES = int(os.getenv("MIGRATION_MAX_RETRIES", 3))
+# Failed file IDs kept in the report; further failures are only counted
+MIGRATION_MAX_FAILED_IDS = 1000
+
+
+@dataclass
+class MigrationProgress:
+    """
+    Progress of a migration run, doubling as its checkpoint.
+    ``cutoff`` is fixed when the migration first starts, so a resumed run
+    works through the same set of files; ``last_id`` is the keyset cursor,
+    the highest file ID whose batch has been committed.
+    """
+    cutoff: str
+    last_id: int = 0
+    total: int = 0
+    moved: int = 0
+    failed: int = 0
+    failed_ids: List[int] = field(default_factory=list)
+    batches: int = 0
+    started_at: float = field(default_factory=time.time)
+    elapsed: float = 0.0
+
+    @property
+    def processed(self) -> int:
+        return self.moved + self.failed
+
+    @property
+    def rate(self) -> float:
+        """Files processed per second over the run."""
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        if not self.rate:
+            return None
+        return max(self.total - self.processed, 0) / self.rate
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            **asdict(self),
+            "processed": self.processed,
+            "rate": self.rate,
+            "eta_seconds": self.eta_seconds,
+        }
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint: Dict[str, Any]) -> "MigrationProgress":
+        fields = {name: checkpoint[name] for name in cls.__dataclass_fields__ if name in checkpoint}
+        return cls(**fields)
+
+
+def _move_file(storage: StorageManager, path: str, max_retries: int) -> str:
+    """
+    Move one file to cold storage and return its new URL.
+    Safe to repeat: the source is only deleted once its copy is verified,
+    so if the hot backend reports the file missing (not merely
+    unreachable), an earlier attempt, or an earlier run that crashed
+    before committing, already moved it and the cold copy is used. When
+    this call saw the source, the cold copy must also match its size.
+    """
+    hot = storage.get_backend(HOT_BACKEND)
+    cold = storage.get_backend(COLD_BACKEND)
+    expected_size = None
+    for attempt in range(max_retries + 1):
+        try:
+            try:
+                expected_size = hot.size(path)
+            except StorageNotFoundError:
+                size = cold.size(path)
+                if expected_size is not None and size != expected_size:
+                    raise StorageError(
+                        f"Cold copy of {path} is {size} bytes, expected {expected_size}"
+                    )
+                logger.info(f"File already in cold storage, updating metadata: {path}")
+                return cold.url(path)
+            return hot.move(path, cold)
+        except StorageError:
+            if attempt == max_retries:
+                raise
+            time.sleep(2 ** attempt)
+
+
+def migrate_hot_to_cold(
+    db: Session,
+    storage: Optional[StorageManager] = None,
+    batch_size: int = MIGRATION_BATCH_SIZE,
+    concurrency: int = MIGRATION_CONCURRENCY,
+    max_retries: int = MIGRATION_MAX_RETRIES,
+    checkpoint: Optional[Dict[str, Any]] = None,
+    on_progress: Optional[Callable[[MigrationProgress], None]] = None,
+) -> MigrationProgress:
     """
     Finds files in hot storage older than policy and migrates them to cold storage.
     Updates metadata in the database.
+    - Files are read in keyset-paged batches of ``batch_size`` by ID, so
+      memory does not grow with the library.
+    - Up to ``concurrency`` files of a batch are moved at once; each is
+      retried up to ``max_retries`` times, then recorded as failed and
+      skipped so one bad file cannot stall the run.
+    - Metadata is committed after every batch, then ``on_progress`` is
+      called with the progress, which is also the checkpoint: pass it back
+      as ``checkpoint`` to resume after the last committed batch.
     """
-    now = datetime.utcnow()
-    cutoff = now - timedelta(days=HOT_STORAGE_MAX_AGE_DAYS)
-    storage = StorageManager()
-    files = db.query(FileMetadata).filter(
+    storage = storage or StorageManager()
+    if checkpoint:
+        progress = MigrationProgress.from_checkpoint(checkpoint)
+    else:
+        cutoff = datetime.utcnow() - timedelta(days=HOT_STORAGE_MAX_AGE_DAYS)
+        progress = MigrationProgress(cutoff=cutoff.isoformat())
+    started = time.monotonic() - progress.elapsed
+
+    eligible = db.query(FileMetadata).filter(
         FileMetadata.backend == HOT_BACKEND,
-        FileMetadata.uploaded_at < cutoff
-    ).all()
-    for file in files:
-        # Move file to cold backend
-        new_url = storage.move(file.path, from_backend=HOT_BACKEND, to_backend=COLD_BACKEND)
-        file.backend = COLD_BACKEND
-        file.url = new_url
-        file.last_accessed_at = now
-        db.add(file)
-    db.commit()
+        FileMetadata.uploaded_at < datetime.fromisoformat(progress.cutoff),
+    )
+    progress.total = progress.processed + eligible.filter(FileMetadata.id > progress.last_id).count()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="migration") as pool:
+        while True:
+            batch = (
+                eligible.filter(FileMetadata.id > progress.last_id)
+                .order_by(FileMetadata.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+
+            # Only paths go to the threads; the session stays on this one
+            moves = {pool.submit(_move_file, storage, file.path, max_retries): file for file in batch}
+            now = datetime.utcnow()
+            for future in as_completed(moves):
+                file = moves[future]
+                try:
+                    new_url = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to migrate file {file.id} ({file.path}): {e}")
+                    progress.failed += 1
+                    if len(progress.failed_ids) < MIGRATION_MAX_FAILED_IDS:
+                        progress.failed_ids.append(file.id)
+                    continue
+                file.backend = COLD_BACKEND
+                file.url = new_url
+                file.last_accessed_at = now
+                progress.moved += 1
+
+            # Read before the commit expires the instances
+            last_id = batch[-1].id
+            db.commit()
+            # Drop the batch from the identity map to keep memory flat
+            db.expunge_all()
+            progress.last_id = last_id
+            progress.batches += 1
+            progress.elapsed = time.monotonic() - started
+            logger.info(
+                f"Migration batch {progress.batches}: {progress.processed}/{progress.total} files, "
+                f"{progress.failed} failed, ETA {progress.eta_seconds or 0:.0f}s"
+            )
+            if on_progress is not None:
+                on_progress(progress)
+
+    progress.elapsed = time.monotonic() - started
+    logger.info(
+        f"Migration finished: {progress.moved} moved, {progress.failed} failed "
+        f"in {progress.elapsed:.0f}s"
+    )
+    return progress
+
+
+async def run_migration_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Worker job handler for MIGRATION_JOB_TYPE.
+    Progress is saved on the job after every batch, so a retried job
+    resumes from its last checkpoint instead of starting over.
+    """
+    from app.core.scheduler import scheduler
+    from app.db.session import SessionLocal
+
+    data = job.get("data") or {}
+    checkpoint = (job.get("result") or {}).get("checkpoint")
+    loop = asyncio.get_running_loop()
+    updates = []
+
+    def report(progress: MigrationProgress) -> None:
+        updates.append(asyncio.run_coroutine_threadsafe(
+            scheduler.update_job_status(job["id"], "processing", {"checkpoint": progress.as_dict()}),
+            loop,
+        ))
+
+    def run() -> MigrationProgress:
+        db = SessionLocal()
+        try:
+            return migrate_hot_to_cold(
+                db,
+                batch_size=data.get("batch_size", MIGRATION_BATCH_SIZE),
+                concurrency=data.get("concurrency", MIGRATION_CONCURRENCY),
+                max_retries=data.get("max_retries", MIGRATION_MAX_RETRIES),
+                checkpoint=checkpoint,
+                on_progress=report,
+            )
+        finally:
+            db.close()
+
+    try:
+        progress = await asyncio.to_thread(run)
+    finally:
+        # Let checkpoint writes land before the worker records the outcome
+        await asyncio.gather(*(asyncio.wrap_future(update) for update in updates))
+    return {"checkpoint": progress.as_dict()}
+
+
+async def schedule_migration(run_at: Optional[datetime] = None, **options: Any) -> str:
+    """
+    Queue a hot-to-cold migration on the worker.
+    Options (batch_size, concurrency, max_retries) override the defaults.
+    """
+    from app.core.scheduler import scheduler
+
+    return await scheduler.schedule_job(
+        {"type": MIGRATION_JOB_TYPE, **options}, run_at or datetime.now()
+    )
+
+
+def _register_job_handler() -> None:
+    from app.core.worker import worker
+
+    worker.register_handler(MIGRATION_JOB_TYPE, run_migration_job)
+
+
+_register_job_handler()
 
 """
 Summary:
 - Policy is config-driven (HOT_STORAGE_MAX_AGE_DAYS).
-- Celery task migrates files from S3 to B2 if they are older than the policy.
-- Metadata is updated for auditing and future queries.
-""" 
\ No newline at end of file
+- migrate_hot_to_cold streams eligible files in keyset-paged batches, moves them concurrently
+  and commits metadata per batch, reporting progress and ETA as a resumable checkpoint.
+- The worker runs it as a MIGRATION_JOB_TYPE job (see schedule_migration), saving the
+  checkpoint on the job so retries pick up where the last attempt stopped.
+"""
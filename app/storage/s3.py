@@ -10,8 +10,11 @@ Security & Compliance:
 - All operations are logged for auditing.
 """
 import boto3
-from typing import BinaryIO
-from .base import StorageBackend, StorageError, logger
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator
+from .base import STORAGE_STREAM_CHUNK_SIZE, StorageBackend, StorageError, StorageNotFoundError, logger
 import os
 
 class S3StorageBackend(StorageBackend):
@@ -19,8 +22,12 @@ class S3StorageBackend(StorageBackend):
     AWS S3 storage backend implementation.
     Uses boto3 for all operations. Credentials and bucket are loaded from environment variables or config.
     """
-    def __init__(self, bucket: str, region: str = None):
+
+    def __init__(self, bucket: str, region: str = None, max_concurrency: int = None):
         self.bucket = bucket
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("S3_MAX_CONCURRENCY", self.max_concurrency)
+        )
         self.region = region or os.getenv("AWS_REGION", "us-east-1")
         self.s3 = boto3.client(
             "s3",
@@ -28,11 +35,16 @@ class S3StorageBackend(StorageBackend):
             aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
             region_name=self.region,
         )
+        # Multipart uploads buffer up to chunk size x concurrency bytes
+        self.transfer_config = TransferConfig(
+            multipart_chunksize=STORAGE_STREAM_CHUNK_SIZE,
+            max_concurrency=int(os.getenv("S3_TRANSFER_CONCURRENCY", 4)),
+        )
 
     def upload(self, file: BinaryIO, path: str) -> str:
         try:
-            self.s3.upload_fileobj(file, self.bucket, path)
-            url = f"s3://{self.bucket}/{path}"
+            self.s3.upload_fileobj(file, self.bucket, path, Config=self.transfer_config)
+            url = self.url(path)
             logger.info(f"Uploaded file to {url}")
             return url
         except Exception as e:
@@ -56,14 +68,78 @@ class S3StorageBackend(StorageBackend):
             logger.error(f"Failed to delete file from S3: {e}")
             raise StorageError("S3 delete failed") from e
 
-    def move(self, path: str, new_backend: StorageBackend) -> str:
+    def open_stream(self, path: str, chunk_size: int = STORAGE_STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        try:
+            body = self.s3.get_object(Bucket=self.bucket, Key=path)["Body"]
+        except Exception as e:
+            logger.error(f"Failed to open file from S3: {e}")
+            raise StorageError("S3 download failed") from e
         try:
-            data = self.download(path)
-            from io import BytesIO
-            new_path = new_backend.upload(BytesIO(data), path)
-            self.delete(path)
-            logger.info(f"Moved file from S3 to {type(new_backend).__name__}: {path}")
-            return new_path
+            yield from body.iter_chunks(chunk_size)
         except Exception as e:
-            logger.error(f"Failed to move file from S3: {e}")
-            raise StorageError("S3 move failed") from e 
\ No newline at end of file
+            logger.error(f"Failed to stream file from S3: {e}")
+            raise StorageError("S3 download failed") from e
+        finally:
+            body.close()
+
+    def url(self, path: str) -> str:
+        return f"s3://{self.bucket}/{path}"
+
+    @contextmanager
+    def _errors(self, operation: str):
+        try:
+            yield
+        except ClientError as e:
+            # HEAD requests have no body, so a missing key only shows as 404
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                raise StorageNotFoundError(f"S3 {operation} failed: not found") from e
+            logger.error(f"Failed to {operation} on S3: {e}")
+            raise StorageError(f"S3 {operation} failed") from e
+        except Exception as e:
+            logger.error(f"Failed to {operation} on S3: {e}")
+            raise StorageError(f"S3 {operation} failed") from e
+
+    def size(self, path: str) -> int:
+        with self._errors("head"):
+            return self.s3.head_object(Bucket=self.bucket, Key=path)["ContentLength"]
+
+    def read_range(self, path: str, start: int, length: int) -> bytes:
+        with self._errors("download"):
+            obj = self.s3.get_object(
+                Bucket=self.bucket, Key=path, Range=f"bytes={start}-{start + length - 1}"
+            )
+            return obj["Body"].read()
+
+    def create_multipart(self, path: str) -> str:
+        with self._errors("start multipart upload"):
+            return self.s3.create_multipart_upload(Bucket=self.bucket, Key=path)["UploadId"]
+
+    def upload_part(self, path: str, upload_id: str, part_number: int, data: bytes) -> str:
+        with self._errors("upload part"):
+            return self.s3.upload_part(
+                Bucket=self.bucket, Key=path, UploadId=upload_id,
+                PartNumber=part_number, Body=data,
+            )["ETag"]
+
+    def list_parts(self, path: str, upload_id: str) -> Dict[int, str]:
+        with self._errors("list parts"):
+            pages = self.s3.get_paginator("list_parts").paginate(
+                Bucket=self.bucket, Key=path, UploadId=upload_id
+            )
+            return {part["PartNumber"]: part["ETag"] for page in pages for part in page.get("Parts", [])}
+
+    def complete_multipart(self, path: str, upload_id: str, parts: Dict[int, str]) -> str:
+        with self._errors("complete multipart upload"):
+            self.s3.complete_multipart_upload(
+                Bucket=self.bucket, Key=path, UploadId=upload_id,
+                MultipartUpload={
+                    "Parts": [{"PartNumber": number, "ETag": parts[number]} for number in sorted(parts)]
+                },
+            )
+        url = self.url(path)
+        logger.info(f"Uploaded file to {url} in {len(parts)} parts")
+        return url
+
+    def abort_multipart(self, path: str, upload_id: str) -> None:
+        with self._errors("abort multipart upload"):
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=path, UploadId=upload_id)
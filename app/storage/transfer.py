@@ -0,0 +1,387 @@
+"""
+TransferEngine
+--------------
+Parallel multipart upload and download of large files.
+
+Files are split into parts that are transferred concurrently over separate
+connections, so a single large video is no longer limited to the bandwidth
+of one stream. Failed parts are retried with backoff; a transfer that still
+fails keeps a checkpoint, and calling it again resumes with the missing
+parts only.
+
+Memory use is bounded by part_size x concurrency.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Set
+import contextvars
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+
+from .base import StorageBackend, StorageError, logger
+
+STORAGE_PART_SIZE = int(os.getenv("STORAGE_PART_SIZE", 16 * 1024 * 1024))
+STORAGE_TRANSFER_CONCURRENCY = int(os.getenv("STORAGE_TRANSFER_CONCURRENCY", 8))
+STORAGE_TRANSFER_STATE_DIR = os.getenv("STORAGE_TRANSFER_STATE_DIR", ".transfers")
+
+
+class TransferError(StorageError):
+    """Raised when parts still fail after retries; the transfer can be resumed."""
+    def __init__(self, message: str, failed_parts: List[int]):
+        super().__init__(message)
+        self.failed_parts = failed_parts
+
+
+@dataclass
+class TransferReport:
+    """
+    Progress and throughput of one transfer.
+    ``bytes_transferred`` counts bytes sent or received by this call, so
+    parts resumed from an earlier attempt do not inflate the throughput.
+    """
+    path: str
+    direction: str
+    size: int
+    part_size: int
+    parts: int
+    resumed_parts: int = 0
+    completed_parts: int = 0
+    retries: int = 0
+    bytes_transferred: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    duration: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second transferred by this call."""
+        elapsed = self.duration or (time.monotonic() - self.started_at)
+        return self.bytes_transferred / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "direction": self.direction,
+            "size": self.size,
+            "part_size": self.part_size,
+            "parts": self.parts,
+            "resumed_parts": self.resumed_parts,
+            "completed_parts": self.completed_parts,
+            "retries": self.retries,
+            "bytes_transferred": self.bytes_transferred,
+            "duration": self.duration,
+            "throughput_mb_s": self.throughput / (1024 * 1024),
+        }
+
+
+class TransferEngine:
+    """
+    Splits transfers into parts and runs them on a pool of ``concurrency``
+    threads.
+    - part_size: Bytes per part; raised to the backend's minimum, and so
+      that no file needs more than the backend's maximum number of parts.
+    - concurrency: Parts in flight at once per transfer.
+    - max_retries: Attempts per part beyond the first, with exponential
+      backoff starting at retry_delay seconds.
+    - state_dir: Where checkpoints of unfinished transfers are kept.
+    """
+    def __init__(
+        self,
+        part_size: int = STORAGE_PART_SIZE,
+        concurrency: int = STORAGE_TRANSFER_CONCURRENCY,
+        max_retries: int = 3,
+        retry_delay: float = 1.0,
+        state_dir: str = STORAGE_TRANSFER_STATE_DIR,
+    ):
+        self.part_size = part_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.state_dir = state_dir
+
+    def _part_size(self, backend: StorageBackend, size: int) -> int:
+        return max(self.part_size, backend.min_part_size, math.ceil(size / backend.max_parts))
+
+    def _checkpoint_path(self, direction: str, backend: StorageBackend, path: str, local: str) -> str:
+        # The backend's URL prefix names its bucket, so transfers of the
+        # same path to two buckets keep separate checkpoints
+        key = f"{direction}:{backend.url('')}:{path}:{local}"
+        return os.path.join(self.state_dir, hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+    @staticmethod
+    def _file_version(file: BinaryIO) -> Optional[List[int]]:
+        """
+        Size and modification time of the local file behind ``file``, or
+        None for in-memory streams, which cannot be checked and are never
+        resumed.
+        """
+        try:
+            stat = os.fstat(file.fileno())
+        except (AttributeError, OSError):
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _load_checkpoint(self, checkpoint: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(checkpoint) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_checkpoint(self, checkpoint: str, state: Dict[str, Any]) -> None:
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp = checkpoint + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, checkpoint)
+
+    def _remove_checkpoint(self, checkpoint: str) -> None:
+        try:
+            os.remove(checkpoint)
+        except FileNotFoundError:
+            pass
+
+    def _retry(self, func: Callable[[], Any], report: TransferReport, lock: threading.Lock) -> Any:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return func()
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                with lock:
+                    report.retries += 1
+                time.sleep(self.retry_delay * 2 ** attempt)
+
+    def _run_parts(
+        self,
+        transfer_part: Callable[[int], None],
+        part_numbers: List[int],
+        report: TransferReport,
+    ) -> List[int]:
+        """Run the parts concurrently and return the numbers of those that failed."""
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="transfer") as pool:
+            # Each part is read inside its task, so at most ``concurrency``
+            # parts are in memory
+            futures = {
+                pool.submit(contextvars.copy_context().run, transfer_part, number): number
+                for number in part_numbers
+            }
+            for future in as_completed(futures):
+                if future.exception() is not None:
+                    number = futures[future]
+                    failed.append(number)
+                    logger.error(f"Part {number} of {report.path} failed: {future.exception()}")
+        report.duration = time.monotonic() - report.started_at
+        return sorted(failed)
+
+    def _log(self, report: TransferReport) -> None:
+        logger.info(
+            f"Transferred {report.path} ({report.direction}): {report.size} bytes in "
+            f"{report.parts} parts, {report.resumed_parts} resumed, {report.retries} retries, "
+            f"{report.duration:.1f}s, {report.throughput / (1024 * 1024):.1f} MB/s"
+        )
+
+    def upload(
+        self,
+        backend: StorageBackend,
+        file: BinaryIO,
+        path: str,
+        size: Optional[int] = None,
+        progress: Optional[Callable[[TransferReport], None]] = None,
+    ) -> TransferReport:
+        """
+        Upload a seekable file in parallel parts.
+        Args:
+            backend: Target storage backend.
+            file: Seekable file object opened in binary mode.
+            path: Destination path in the backend.
+            size: File size; measured from the file when omitted.
+            progress: Called with the report after each part.
+        Returns:
+            The transfer report.
+        Raises:
+            TransferError: If parts still fail after retries. The upload is
+                kept, and calling upload again with the same file resumes it.
+            StorageError: If the upload cannot be started or completed.
+        """
+        if size is None:
+            size = file.seek(0, os.SEEK_END)
+        part_size = self._part_size(backend, size)
+        parts = max(math.ceil(size / part_size), 1)
+        report = TransferReport(path, "upload", size, part_size, parts)
+
+        if parts == 1:
+            file.seek(0)
+            backend.upload(file, path)
+            report.bytes_transferred = report.size
+            report.completed_parts = 1
+            report.duration = time.monotonic() - report.started_at
+            self._log(report)
+            return report
+
+        local = getattr(file, "name", "")
+        checkpoint = self._checkpoint_path("upload", backend, path, str(local))
+        state = self._load_checkpoint(checkpoint)
+        version = self._file_version(file)
+        done: Dict[int, str] = {}
+        upload_id = None
+        if state:
+            # Stored parts are only reused if the local file is unchanged
+            # since they were uploaded
+            if (
+                version is not None and state.get("version") == version
+                and state.get("size") == size and state.get("part_size") == part_size
+            ):
+                try:
+                    done = backend.list_parts(path, state["upload_id"])
+                    upload_id = state["upload_id"]
+                except StorageError:
+                    # Expired or aborted on the backend, start over
+                    done = {}
+            else:
+                try:
+                    backend.abort_multipart(path, state["upload_id"])
+                except StorageError:
+                    pass
+        if upload_id is None:
+            upload_id = backend.create_multipart(path)
+            self._save_checkpoint(
+                checkpoint,
+                {"upload_id": upload_id, "size": size, "part_size": part_size, "version": version},
+            )
+        report.resumed_parts = len(done)
+        report.completed_parts = len(done)
+
+        read_lock = threading.Lock()
+        report_lock = threading.Lock()
+
+        def transfer_part(number: int) -> None:
+            start = (number - 1) * part_size
+            with read_lock:
+                file.seek(start)
+                data = file.read(min(part_size, size - start))
+            token = self._retry(lambda: backend.upload_part(path, upload_id, number, data), report, report_lock)
+            with report_lock:
+                done[number] = token
+                report.completed_parts += 1
+                report.bytes_transferred += len(data)
+            if progress is not None:
+                progress(report)
+
+        failed = self._run_parts(
+            transfer_part, [n for n in range(1, parts + 1) if n not in done], report
+        )
+        if failed:
+            raise TransferError(
+                f"Upload of {path} incomplete: {len(failed)} of {parts} parts failed; retry to resume",
+                failed,
+            )
+
+        backend.complete_multipart(path, upload_id, done)
+        self._remove_checkpoint(checkpoint)
+        report.duration = time.monotonic() - report.started_at
+        self._log(report)
+        return report
+
+    def abort_upload(self, backend: StorageBackend, file: BinaryIO, path: str) -> None:
+        """
+        Discard an unfinished upload instead of resuming it.
+        """
+        checkpoint = self._checkpoint_path("upload", backend, path, str(getattr(file, "name", "")))
+        state = self._load_checkpoint(checkpoint)
+        if state:
+            backend.abort_multipart(path, state["upload_id"])
+        self._remove_checkpoint(checkpoint)
+
+    def download(
+        self,
+        backend: StorageBackend,
+        path: str,
+        dest: str,
+        progress: Optional[Callable[[TransferReport], None]] = None,
+    ) -> TransferReport:
+        """
+        Download a file to a local path with parallel ranged reads.
+        Parts are written in place into ``dest + ".part"``, which is renamed
+        to ``dest`` once every part has arrived.
+        Args:
+            backend: Source storage backend.
+            path: Path of the file in the backend.
+            dest: Local destination path.
+            progress: Called with the report after each part.
+        Returns:
+            The transfer report.
+        Raises:
+            TransferError: If parts still fail after retries. Calling
+                download again resumes with the missing parts.
+            StorageError: If the file cannot be found.
+        """
+        tmp = dest + ".part"
+        size = backend.size(path)
+        part_size = self._part_size(backend, size)
+        parts = max(math.ceil(size / part_size), 1)
+        report = TransferReport(path, "download", size, part_size, parts)
+
+        checkpoint = self._checkpoint_path("download", backend, path, dest)
+        if size == 0:
+            # There is no valid byte range to request for an empty file
+            open(dest, "wb").close()
+            self._remove_checkpoint(checkpoint)
+            report.completed_parts = 1
+            report.duration = time.monotonic() - report.started_at
+            self._log(report)
+            return report
+        state = self._load_checkpoint(checkpoint)
+        done: Set[int] = set()
+        if (
+            state and state.get("size") == size and state.get("part_size") == part_size
+            and os.path.exists(tmp)
+        ):
+            done = set(state.get("done", []))
+        report.resumed_parts = len(done)
+        report.completed_parts = len(done)
+
+        fd = os.open(tmp, os.O_RDWR | os.O_CREAT)
+        lock = threading.Lock()
+        try:
+            os.ftruncate(fd, size)
+
+            def transfer_part(number: int) -> None:
+                start = (number - 1) * part_size
+                length = min(part_size, size - start)
+                data = self._retry(lambda: backend.read_range(path, start, length), report, lock)
+                if len(data) != length:
+                    raise StorageError(f"Short read for part {number}: {len(data)} of {length} bytes")
+                # Positional writes need no lock between parts
+                os.pwrite(fd, data, start)
+                with lock:
+                    done.add(number)
+                    report.completed_parts += 1
+                    report.bytes_transferred += length
+                    self._save_checkpoint(
+                        checkpoint, {"size": size, "part_size": part_size, "done": sorted(done)}
+                    )
+                if progress is not None:
+                    progress(report)
+
+            failed = self._run_parts(
+                transfer_part, [n for n in range(1, parts + 1) if n not in done], report
+            )
+            if not failed:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        if failed:
+            raise TransferError(
+                f"Download of {path} incomplete: {len(failed)} of {parts} parts failed; retry to resume",
+                failed,
+            )
+        os.replace(tmp, dest)
+        self._remove_checkpoint(checkpoint)
+        self._log(report)
+        return report
@@ -1,11 +1,14 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
+from app.api.v1 import audit
 from app.api.v1.endpoints import auth, users, content, projects, social_media
+from app.core.rate_limit import quota_engine
 
-api_router = APIRouter()
+api_router = APIRouter(dependencies=[Depends(quota_engine)])
 
 api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(content.router, prefix="/content", tags=["content"])
 api_router.include_router(projects.router, prefix="/projects", tags=["projects"])
-api_router.include_router(social_media.router, prefix="/social-media", tags=["social-media"]) 
\ No newline at end of file
+api_router.include_router(social_media.router, prefix="/social-media", tags=["social-media"]) 
+api_router.include_router(audit.router, prefix="/audit", tags=["audit"])
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import Any, Dict, Iterator, Optional
+import json
+from app.core.audit import audit_trail
+from app.core.security import get_admin_user
+
+router = APIRouter()
+
+@router.get("/report")
+def get_audit_report(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    event_type: Optional[str] = None,
+    user_id: Optional[str] = None,
+    current_user = Depends(get_admin_user)
+) -> Dict[str, Any]:
+    """Get aggregated audit counts for a time range
+
+    Declared sync so FastAPI runs the SQLite queries in its threadpool.
+    """
+    return audit_trail.generate_report(start_date, end_date, event_type, user_id)
+
+@router.get("/timeline")
+def get_audit_timeline(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    event_type: Optional[str] = None,
+    user_id: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    current_user = Depends(get_admin_user)
+) -> StreamingResponse:
+    """Stream one page of the audit timeline as newline-delimited JSON
+
+    The cursor for the next page is returned in the ``X-Next-Cursor``
+    header; it is absent on the last page. Declared sync so the query runs
+    in FastAPI's threadpool; the response iterates in it as well.
+    """
+    try:
+        timeline, next_cursor = audit_trail.get_timeline(
+            start_date, end_date, event_type, user_id, limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    def lines() -> Iterator[str]:
+        for entry in timeline:
+            yield json.dumps(entry) + "\n"
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers=headers)
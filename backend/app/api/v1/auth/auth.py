@@ -68,8 +68,8 @@ class UserResponse(BaseModel):
     is_active: bool = True
     is_admin: bool = False
 
-@rate_limit(limit=5, period=300)  # 5 attempts per 5 minutes
 @router.post("/token", response_model=Token)
+@rate_limit(limit=5, period=300)  # 5 attempts per 5 minutes
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
@@ -1,13 +1,24 @@
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Deque, Dict, Any, Iterator, Optional, List, Tuple
+from .audit_segments import SegmentReader
+from .audit_sink import AuditSink
+from .audit_store import AuditStore
+from .counters import ThresholdTracker
 from .logging import get_audit_logger
 from pydantic import BaseModel
 import json
 from pathlib import Path
-from collections import defaultdict
+from collections import defaultdict, deque
 
 audit_logger = get_audit_logger()
 
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
 class AuditEvent(BaseModel):
     """Model for audit events"""
     timestamp: datetime
@@ -36,23 +47,42 @@ class SecurityEvent(BaseModel):
 class AuditTrail:
     """Track and manage audit events"""
     
-    def __init__(self, log_dir: str = "logs/audit"):
+    def __init__(self, log_dir: str = "logs/audit", sink: Optional[AuditSink] = None):
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(parents=True, exist_ok=True)
-        self.security_events: List[SecurityEvent] = []
+        # Indexed copy of audit events for queries; the JSONL files remain
+        # the append-only record
+        self.store = AuditStore(self.log_dir / "audit.db")
+        # File and index writes happen on the sink's background thread
+        self.sink = sink or AuditSink(self.log_dir, store=self.store)
+        # Time-range reads over the rotated, compressed JSONL segments
+        self.segments = SegmentReader(self.log_dir)
+        self.security_events: Deque[SecurityEvent] = deque(maxlen=1000)
+        # More than 10 security events from one IP, or 5 for one user,
+        # within the window is reported once per crossing
+        self.pattern_window = 3600  # seconds
+        self.ip_patterns = ThresholdTracker(window=self.pattern_window, threshold=10)
+        self.user_patterns = ThresholdTracker(window=self.pattern_window, threshold=5)
         self.error_patterns: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
         
     def log_event(self, event: AuditEvent):
         """Log an audit event"""
-        # Log to file
-        log_file = self.log_dir / f"audit_{datetime.now().strftime('%Y%m%d')}.log"
-        with open(log_file, "a") as f:
-            f.write(f"{json.dumps(event.dict())}\n")
+        data = event.dict()
+        line = json.dumps(data, default=_json_default)
+        
+        # Queue for the background file and index writer
+        self.sink.submit(
+            "audit",
+            datetime.now().strftime('%Y%m%d'),
+            line,
+            critical=event.status == "error",
+            row=AuditStore.to_row(data, line),
+        )
             
         # Log to audit logger
         audit_logger.info(
             f"Audit event: {event.event_type}",
-            extra=event.dict()
+            extra=data
         )
         
         # Track error patterns for security events
@@ -61,70 +91,64 @@ class AuditTrail:
             
     def log_security_event(self, event: SecurityEvent):
         """Log a security event with enhanced tracking"""
-        # Add to security events list
+        # Add to security events list, keeping only the last 1000
         self.security_events.append(event)
-        
-        # Keep only last 1000 events
-        if len(self.security_events) > 1000:
-            self.security_events = self.security_events[-1000:]
             
-        # Log to file
-        log_file = self.log_dir / f"security_{datetime.now().strftime('%Y%m%d')}.log"
-        with open(log_file, "a") as f:
-            f.write(f"{json.dumps(event.dict())}\n")
+        data = event.dict()
+        
+        # Queue for the background file writer
+        self.sink.submit(
+            "security",
+            datetime.now().strftime('%Y%m%d'),
+            json.dumps(data, default=_json_default),
+            critical=True,
+        )
             
         # Log to audit logger with appropriate level
         if event.severity == "critical":
             audit_logger.critical(
                 f"Security event: {event.event_type}",
-                extra=event.dict()
+                extra=data
             )
         elif event.severity == "error":
             audit_logger.error(
                 f"Security event: {event.event_type}",
-                extra=event.dict()
+                extra=data
             )
         else:
             audit_logger.warning(
                 f"Security event: {event.event_type}",
-                extra=event.dict()
+                extra=data
             )
             
         # Check for security patterns
-        self._analyze_security_patterns()
-        
-    def _analyze_security_patterns(self):
-        """Analyze security events for patterns"""
-        # Group events by type and IP
-        ip_events = defaultdict(list)
-        user_events = defaultdict(list)
+        self._analyze_security_patterns(event)
         
-        for event in self.security_events:
-            if event.ip_address:
-                ip_events[event.ip_address].append(event)
-            if event.user_id:
-                user_events[event.user_id].append(event)
-                
-        # Check for suspicious patterns
-        for ip, events in ip_events.items():
-            if len(events) > 10:  # More than 10 security events from same IP
+    def _analyze_security_patterns(self, event: SecurityEvent):
+        """Update per-IP and per-user windowed counts and alert on crossings"""
+        if event.ip_address:
+            count = self.ip_patterns.record(event.ip_address)
+            if count is not None:
                 audit_logger.warning(
                     "Suspicious IP activity detected",
                     extra={
-                        "ip": ip,
-                        "event_count": len(events),
-                        "event_types": [e.event_type for e in events]
+                        "ip": event.ip_address,
+                        "event_count": count,
+                        "window": self.pattern_window,
+                        "event_type": event.event_type
                     }
                 )
                 
-        for user_id, events in user_events.items():
-            if len(events) > 5:  # More than 5 security events for same user
+        if event.user_id:
+            count = self.user_patterns.record(event.user_id)
+            if count is not None:
                 audit_logger.warning(
                     "Suspicious user activity detected",
                     extra={
-                        "user_id": user_id,
-                        "event_count": len(events),
-                        "event_types": [e.event_type for e in events]
+                        "user_id": event.user_id,
+                        "event_count": count,
+                        "window": self.pattern_window,
+                        "event_type": event.event_type
                     }
                 )
                 
@@ -136,31 +160,57 @@ class AuditTrail:
         user_id: Optional[str] = None
     ) -> List[AuditEvent]:
         """Retrieve audit events with optional filtering"""
-        events = []
+        return list(self.iter_events(start_date, end_date, event_type, user_id))
         
-        # Get all log files in the date range
-        log_files = self.log_dir.glob("audit_*.log")
-        for log_file in log_files:
-            file_date = datetime.strptime(log_file.stem.split("_")[1], "%Y%m%d")
-            if start_date and file_date < start_date:
-                continue
-            if end_date and file_date > end_date:
-                continue
-                
-            with open(log_file, "r") as f:
-                for line in f:
-                    event_data = json.loads(line)
-                    event = AuditEvent(**event_data)
-                    
-                    # Apply filters
-                    if event_type and event.event_type != event_type:
-                        continue
-                    if user_id and event.user_id != user_id:
-                        continue
-                        
-                    events.append(event)
-                    
-        return sorted(events, key=lambda x: x.timestamp)
+    def iter_events(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        event_type: Optional[str] = None,
+        user_id: Optional[str] = None
+    ) -> Iterator[AuditEvent]:
+        """Stream audit events in timestamp order
+
+        Events older than the index's retention window are read from the
+        JSONL segments, the rest from the index.
+        """
+        horizon = self.store.horizon()
+        if horizon is not None and (start_date is None or start_date.timestamp() < horizon):
+            archive_end = datetime.fromtimestamp(horizon)
+            if end_date is not None and end_date.timestamp() < horizon:
+                archive_end = end_date
+            for event_data in self.segments.iter_lines("audit", start_date, archive_end):
+                if event_type and event_data["event_type"] != event_type:
+                    continue
+                if user_id and event_data.get("user_id") != user_id:
+                    continue
+                # The index has everything from the horizon on
+                if datetime.fromisoformat(event_data["timestamp"]).timestamp() >= horizon:
+                    continue
+                yield AuditEvent(**event_data)
+            if end_date is not None and end_date.timestamp() < horizon:
+                return
+            start_date = datetime.fromtimestamp(horizon)
+        for event_data in self.store.iter_events(start_date, end_date, event_type, user_id):
+            yield AuditEvent(**event_data)
+            
+    def get_events_page(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        event_type: Optional[str] = None,
+        user_id: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[AuditEvent], Optional[str]]:
+        """Retrieve one page of audit events and the cursor for the next
+
+        Pages come from the index, so they cover its retention window.
+        """
+        events, next_cursor = self.store.query(
+            start_date, end_date, event_type, user_id, limit, cursor
+        )
+        return [AuditEvent(**event_data) for event_data in events], next_cursor
         
     def get_security_events(
         self,
@@ -169,8 +219,21 @@ class AuditTrail:
         event_type: Optional[str] = None,
         severity: Optional[str] = None
     ) -> List[SecurityEvent]:
-        """Retrieve security events with optional filtering"""
-        events = self.security_events
+        """Retrieve security events with optional filtering
+
+        Recent events come from memory; anything older than the in-memory
+        buffer is read from the security log segments for the range.
+        """
+        events = list(self.security_events)
+        oldest = events[0].timestamp if events else None
+        if start_date is not None and (oldest is None or start_date < oldest):
+            archived = [
+                SecurityEvent(**event_data)
+                for event_data in self.segments.iter_lines("security", start_date, end_date)
+            ]
+            if oldest is not None:
+                archived = [e for e in archived if e.timestamp < oldest]
+            events = archived + events
         
         # Apply filters
         if start_date:
@@ -191,41 +254,37 @@ class AuditTrail:
         event_type: Optional[str] = None,
         user_id: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Generate an audit report"""
-        events = self.get_events(start_date, end_date, event_type, user_id)
+        """Generate an audit report from the hourly rollups
+
+        The per-event timeline is served separately by ``get_timeline``.
+        """
+        counts = self.store.counts(start_date, end_date, event_type, user_id)
         security_events = self.get_security_events(start_date, end_date)
         
         report = {
-            "total_events": len(events),
+            "total_events": sum(counts.values()),
             "total_security_events": len(security_events),
             "event_types": {},
             "security_event_types": {},
             "users": {},
             "status_counts": {},
             "security_severities": {},
-            "timeline": [],
-            "error_patterns": dict(self.error_patterns)
+            "error_patterns": {
+                event_type: dict(actions)
+                for event_type, actions in self.error_patterns.items()
+            }
         }
         
-        for event in events:
+        for (counted_type, status, counted_user), count in counts.items():
             # Count event types
-            report["event_types"][event.event_type] = report["event_types"].get(event.event_type, 0) + 1
+            report["event_types"][counted_type] = report["event_types"].get(counted_type, 0) + count
             
             # Count user actions
-            if event.user_id:
-                report["users"][event.user_id] = report["users"].get(event.user_id, 0) + 1
+            if counted_user:
+                report["users"][counted_user] = report["users"].get(counted_user, 0) + count
                 
             # Count statuses
-            report["status_counts"][event.status] = report["status_counts"].get(event.status, 0) + 1
-            
-            # Add to timeline
-            report["timeline"].append({
-                "timestamp": event.timestamp.isoformat(),
-                "event_type": event.event_type,
-                "user_id": event.user_id,
-                "action": event.action,
-                "status": event.status
-            })
+            report["status_counts"][status] = report["status_counts"].get(status, 0) + count
             
         for event in security_events:
             # Count security event types
@@ -235,6 +294,31 @@ class AuditTrail:
             report["security_severities"][event.severity] = report["security_severities"].get(event.severity, 0) + 1
             
         return report
+        
+    def get_timeline(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        event_type: Optional[str] = None,
+        user_id: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Get one page of timeline entries within the index's retention window"""
+        events, next_cursor = self.store.query(
+            start_date, end_date, event_type, user_id, limit, cursor
+        )
+        timeline = [
+            {
+                "timestamp": event["timestamp"],
+                "event_type": event["event_type"],
+                "user_id": event.get("user_id"),
+                "action": event["action"],
+                "status": event["status"]
+            }
+            for event in events
+        ]
+        return timeline, next_cursor
 
 # Initialize audit trail
 audit_trail = AuditTrail() 
\ No newline at end of file
@@ -0,0 +1,197 @@
+import bisect
+import gzip
+import json
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# <prefix>_<YYYYMMDD>[_<seq>].log, optionally compressed to .log.gz.
+# Files without a sequence number predate segment rotation.
+SEGMENT_PATTERN = re.compile(r"^(?P<prefix>[a-z]+)_(?P<date>\d{8})(?:_(?P<seq>\d+))?\.log(?P<gz>\.gz)?$")
+
+DEFAULT_BLOCK_BYTES = 256 * 1024  # uncompressed bytes per gzip member
+
+
+@dataclass(frozen=True)
+class SegmentName:
+    prefix: str
+    date_str: str
+    seq: int
+    compressed: bool
+
+    @classmethod
+    def parse(cls, path: Path) -> Optional["SegmentName"]:
+        match = SEGMENT_PATTERN.match(path.name)
+        if match is None:
+            return None
+        return cls(
+            prefix=match["prefix"],
+            date_str=match["date"],
+            seq=int(match["seq"] or 0),
+            compressed=bool(match["gz"]),
+        )
+
+
+def segment_path(log_dir: Path, prefix: str, date_str: str, seq: int) -> Path:
+    return log_dir / f"{prefix}_{date_str}_{seq:04d}.log"
+
+
+def index_path(gz_path: Path) -> Path:
+    return gz_path.with_name(gz_path.name[: -len(".log.gz")] + ".idx")
+
+
+def _line_timestamp(line: bytes) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(json.loads(line)["timestamp"]).timestamp()
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def compress_segment(path: Path, block_bytes: int = DEFAULT_BLOCK_BYTES) -> Path:
+    """Compress a closed segment into independent gzip blocks plus an index
+
+    Each block of roughly ``block_bytes`` of whole lines is its own gzip
+    member, so the output is still a valid .gz file for standard tools.
+    The ``.idx`` file records, per block, the first event timestamp, the
+    byte offset and the compressed length, which lets readers seek to and
+    decompress only the blocks covering a time range.
+    """
+    gz_path = path.with_name(path.name + ".gz")
+    tmp_gz = gz_path.with_name(gz_path.name + ".tmp")
+    blocks: List[Dict[str, Any]] = []
+
+    def flush_block(out, lines: List[bytes]):
+        if not lines:
+            return
+        data = gzip.compress(b"".join(lines), compresslevel=6)
+        blocks.append({
+            "ts": _line_timestamp(lines[0]),
+            "offset": out.tell(),
+            "length": len(data),
+            "lines": len(lines),
+        })
+        out.write(data)
+
+    with open(path, "rb") as src, open(tmp_gz, "wb") as out:
+        lines: List[bytes] = []
+        size = 0
+        for line in src:
+            lines.append(line)
+            size += len(line)
+            if size >= block_bytes:
+                flush_block(out, lines)
+                lines, size = [], 0
+        flush_block(out, lines)
+        out.flush()
+        os.fsync(out.fileno())
+
+    idx_tmp = index_path(gz_path).with_suffix(".idx.tmp")
+    with open(idx_tmp, "w") as f:
+        json.dump({"source": path.name, "blocks": blocks}, f)
+    # Index first, then data: a .gz without its .idx is never visible
+    os.replace(idx_tmp, index_path(gz_path))
+    os.replace(tmp_gz, gz_path)
+    path.unlink()
+    return gz_path
+
+
+class SegmentReader:
+    """Read audit lines for a time range from plain and compressed segments"""
+
+    def __init__(self, log_dir: Path):
+        self.log_dir = Path(log_dir)
+
+    def segments(
+        self,
+        prefix: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> List[Tuple[SegmentName, Path]]:
+        """Segments for ``prefix`` whose day overlaps the range, oldest first"""
+        start_day = start_date.strftime("%Y%m%d") if start_date else None
+        end_day = end_date.strftime("%Y%m%d") if end_date else None
+        found: Dict[Tuple[str, int], Tuple[SegmentName, Path]] = {}
+        for path in self.log_dir.glob(f"{prefix}_*.log*"):
+            name = SegmentName.parse(path)
+            if name is None or name.prefix != prefix:
+                continue
+            if start_day and name.date_str < start_day:
+                continue
+            if end_day and name.date_str > end_day:
+                continue
+            key = (name.date_str, name.seq)
+            # Mid-compression both files exist; the .gz is complete once visible
+            if key not in found or name.compressed:
+                found[key] = (name, path)
+        return [found[key] for key in sorted(found)]
+
+    def iter_lines(
+        self,
+        prefix: str,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Yield decoded events in the range, one block in memory at a time"""
+        start = start_date.timestamp() if start_date else None
+        end = end_date.timestamp() if end_date else None
+        for name, path in self.segments(prefix, start_date, end_date):
+            for chunk in self._chunks(name, path, start, end):
+                for line in chunk.splitlines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    ts = datetime.fromisoformat(event["timestamp"]).timestamp()
+                    if (start is None or ts >= start) and (end is None or ts <= end):
+                        yield event
+
+    def _chunks(
+        self,
+        name: SegmentName,
+        path: Path,
+        start: Optional[float],
+        end: Optional[float],
+    ) -> Iterator[bytes]:
+        if name.compressed:
+            yield from self._compressed_chunks(path, start, end)
+            return
+        try:
+            # Both readers open their files before yielding anything, so a
+            # segment that vanished is retried without duplicating lines
+            yield from self._plain_chunks(path)
+        except FileNotFoundError:
+            # Compressed and removed between listing and reading; its .idx
+            # is in place before the .gz appears
+            gz_path = path.with_name(path.name + ".gz")
+            if not gz_path.exists():
+                return
+            yield from self._compressed_chunks(gz_path, start, end)
+
+    @staticmethod
+    def _plain_chunks(path: Path) -> Iterator[bytes]:
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.readlines(DEFAULT_BLOCK_BYTES)
+                if not chunk:
+                    return
+                yield b"".join(chunk)
+
+    @staticmethod
+    def _compressed_chunks(path: Path, start: Optional[float], end: Optional[float]) -> Iterator[bytes]:
+        with open(index_path(path)) as f:
+            blocks = json.load(f)["blocks"]
+
+        first_ts = [block["ts"] or 0.0 for block in blocks]
+        # The block holding ``start`` is the last one beginning at or before
+        # it; lines are only roughly ordered, so also read the one before
+        first = 0
+        if start is not None:
+            first = max(bisect.bisect_right(first_ts, start) - 2, 0)
+        with open(path, "rb") as f:
+            for block in blocks[first:]:
+                if end is not None and block["ts"] is not None and block["ts"] > end:
+                    break
+                f.seek(block["offset"])
+                yield gzip.decompress(f.read(block["length"]))
@@ -0,0 +1,316 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, IO, List, Optional, Tuple
+from .audit_segments import DEFAULT_BLOCK_BYTES, SegmentName, compress_segment, segment_path
+from .audit_store import AuditRow, AuditStore
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+FSYNC_ALWAYS = "always"  # fsync after every batch
+FSYNC_INTERVAL = "interval"  # fsync at most every fsync_interval seconds
+FSYNC_NEVER = "never"  # leave it to the OS
+
+_STOP = object()
+
+
+class AuditSink:
+    """Background writer for audit log lines
+
+    Callers enqueue pre-serialized lines and return immediately; a writer
+    thread drains the bounded queue in batches, keeps the current segment
+    per prefix open and fsyncs according to ``fsync_policy``. Lines
+    submitted with a ``row`` are also inserted into ``store`` in the same
+    batch, after the lines are written; an index failure is logged and
+    counted but never loses the lines.
+
+    Segments rotate when the day changes or they reach ``max_segment_bytes``.
+    Closed segments are compressed into indexed gzip blocks on a separate
+    thread so rotation never stalls the writer; segments left uncompressed
+    by a previous run are picked up at start.
+
+    When the queue is full, ``critical`` lines (errors and security
+    events) wait up to ``block_timeout`` seconds for room, applying
+    backpressure; everything else is dropped and counted.
+
+    Every ``prune_interval`` seconds the writer also prunes ``store`` to
+    its retention window, so all database writes stay on one thread.
+    """
+
+    def __init__(
+        self,
+        log_dir: Path,
+        store: Optional[AuditStore] = None,
+        max_queue: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        fsync_policy: str = FSYNC_INTERVAL,
+        fsync_interval: float = 5.0,
+        block_timeout: float = 0.5,
+        max_segment_bytes: int = 64 * 1024 * 1024,
+        compress: bool = True,
+        block_bytes: int = DEFAULT_BLOCK_BYTES,
+        prune_interval: float = 3600.0,
+    ):
+        self.log_dir = Path(log_dir)
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.block_timeout = block_timeout
+        self.max_segment_bytes = max_segment_bytes
+        self.compress = compress
+        self.block_bytes = block_bytes
+        self.prune_interval = prune_interval
+        self._next_prune = 0.0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        # prefix -> (segment, path, handle)
+        self._files: Dict[str, Tuple[SegmentName, Path, IO[str]]] = {}
+        self._last_fsync = time.monotonic()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._compressor: Optional[ThreadPoolExecutor] = None
+        # Updated from callers, the writer and the compressor
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "written": 0, "dropped": 0, "batches": 0, "fsyncs": 0,
+            "rotations": 0, "compressed": 0, "compress_errors": 0, "pruned": 0,
+            "index_errors": 0,
+        }
+
+    def start(self):
+        """Start the writer thread if it is not running"""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="audit-sink", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+                if self.compress:
+                    self._compress_leftovers()
+
+    def submit(
+        self,
+        prefix: str,
+        date_str: str,
+        line: str,
+        critical: bool = False,
+        row: Optional[AuditRow] = None,
+    ) -> bool:
+        """Queue one line for the ``prefix`` segment of ``date_str``; False if dropped"""
+        if self._thread is None:
+            self.start()
+        item = (prefix, date_str, line, row)
+        try:
+            if critical:
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self._count("dropped")
+            return False
+
+    def close(self, timeout: float = 5.0):
+        """Flush queued lines and stop the writer thread"""
+        thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.error("Audit sink queue full at shutdown, pending lines may be lost")
+        thread.join(timeout)
+        self._thread = None
+        if self._compressor is not None:
+            # Let in-flight compressions finish; the active segments stay
+            # plain and are resumed or compressed on the next start
+            self._compressor.shutdown(wait=True)
+            self._compressor = None
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return dict(self.stats, queued=self._queue.qsize())
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            self._maybe_prune()
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._maybe_fsync()
+                continue
+
+            batch: List[Tuple[str, str, str, Optional[AuditRow]]] = []
+            item = first
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception:
+                    logger.exception("Failed to write audit batch")
+
+        self._close_files()
+
+    def _write_batch(self, batch: List[Tuple[str, str, str, Optional[AuditRow]]]):
+        grouped: Dict[Tuple[str, str], List[str]] = {}
+        rows: List[AuditRow] = []
+        for prefix, date_str, line, row in batch:
+            grouped.setdefault((prefix, date_str), []).append(line)
+            if row is not None:
+                rows.append(row)
+
+        for (prefix, date_str), lines in grouped.items():
+            handle = self._handle(prefix, date_str)
+            handle.write("\n".join(lines) + "\n")
+            handle.flush()
+            if handle.tell() >= self.max_segment_bytes:
+                self._rotate(prefix)
+        self._count("written", len(batch))
+        self._count("batches")
+
+        if self.fsync_policy == FSYNC_ALWAYS:
+            self._fsync()
+        else:
+            self._maybe_fsync()
+
+        # The segment files are the record of truth; index after they are
+        # written so a database error can never cost an event
+        if rows and self.store is not None:
+            try:
+                self.store.insert_many(rows)
+            except Exception:
+                self._count("index_errors", len(rows))
+                logger.exception("Failed to index audit batch")
+
+    def _maybe_prune(self):
+        if self.store is None or time.monotonic() < self._next_prune:
+            return
+        self._next_prune = time.monotonic() + self.prune_interval
+        try:
+            self._count("pruned", self.store.prune())
+        except Exception:
+            logger.exception("Failed to prune audit store")
+
+    def _handle(self, prefix: str, date_str: str) -> IO[str]:
+        current = self._files.get(prefix)
+        if current is not None and current[0].date_str == date_str:
+            return current[2]
+        if current is not None:
+            # Day rolled over, close yesterday's segment
+            self._rotate(prefix)
+        segment = self._next_segment(prefix, date_str)
+        path = segment_path(self.log_dir, prefix, date_str, segment.seq)
+        handle = open(path, "a", encoding="utf-8")
+        self._files[prefix] = (segment, path, handle)
+        return handle
+
+    def _next_segment(self, prefix: str, date_str: str) -> SegmentName:
+        """Resume the day's last plain segment, or start the one after it"""
+        latest: Optional[SegmentName] = None
+        for path in self.log_dir.glob(f"{prefix}_{date_str}_*.log*"):
+            name = SegmentName.parse(path)
+            # While a segment is being compressed both files exist; the
+            # compressed one wins so the segment is never resumed
+            if name is not None and (
+                latest is None
+                or name.seq > latest.seq
+                or (name.seq == latest.seq and name.compressed)
+            ):
+                latest = name
+        if latest is None:
+            return SegmentName(prefix, date_str, 1, False)
+        if not latest.compressed:
+            try:
+                size = segment_path(self.log_dir, prefix, date_str, latest.seq).stat().st_size
+            except FileNotFoundError:
+                # Compressed and removed since the directory was listed
+                size = self.max_segment_bytes
+            if size < self.max_segment_bytes:
+                return latest
+        return SegmentName(prefix, date_str, latest.seq + 1, False)
+
+    def _rotate(self, prefix: str):
+        """Close the prefix's current segment and queue it for compression"""
+        _, path, handle = self._files.pop(prefix)
+        self._fsync_handle(handle)
+        handle.close()
+        self._count("rotations")
+        if self.compress:
+            self._schedule_compression(path)
+
+    def _schedule_compression(self, path: Path):
+        if self._compressor is None:
+            self._compressor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="audit-compress"
+            )
+        self._compressor.submit(self._compress, path)
+
+    def _compress(self, path: Path):
+        try:
+            compress_segment(path, self.block_bytes)
+            self._count("compressed")
+        except Exception:
+            self._count("compress_errors")
+            logger.exception(f"Failed to compress audit segment {path}")
+
+    def _compress_leftovers(self):
+        """Compress plain segments from earlier days left by a previous run"""
+        today = time.strftime("%Y%m%d")
+        for path in sorted(self.log_dir.glob("*.log")):
+            name = SegmentName.parse(path)
+            if name is not None and name.date_str < today:
+                self._schedule_compression(path)
+
+    def _maybe_fsync(self):
+        if (
+            self.fsync_policy == FSYNC_INTERVAL
+            and time.monotonic() - self._last_fsync >= self.fsync_interval
+        ):
+            self._fsync()
+
+    def _fsync(self):
+        if not self._files:
+            return
+        for _, _, handle in self._files.values():
+            self._fsync_handle(handle)
+        self._last_fsync = time.monotonic()
+        self._count("fsyncs")
+
+    def _fsync_handle(self, handle: IO[str]):
+        if self.fsync_policy == FSYNC_NEVER:
+            return
+        try:
+            handle.flush()
+            os.fsync(handle.fileno())
+        except OSError:
+            logger.exception("Failed to fsync audit file")
+
+    def _close_files(self):
+        for _, _, handle in self._files.values():
+            self._fsync_handle(handle)
+            handle.close()
+        self._files.clear()
@@ -0,0 +1,320 @@
+import json
+import math
+import sqlite3
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# (ts, event_type, user_id, status, action, data)
+AuditRow = Tuple[float, str, Optional[str], str, str, str]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS audit_events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    event_type TEXT NOT NULL,
+    user_id TEXT,
+    status TEXT NOT NULL,
+    action TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_audit_ts ON audit_events (ts, id);
+CREATE INDEX IF NOT EXISTS idx_audit_user_ts ON audit_events (user_id, ts, id);
+CREATE INDEX IF NOT EXISTS idx_audit_type_ts ON audit_events (event_type, ts, id);
+CREATE TABLE IF NOT EXISTS audit_rollups (
+    hour INTEGER NOT NULL,
+    event_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    user_id TEXT NOT NULL, -- '' for no user, NULLs never match in a primary key
+    count INTEGER NOT NULL,
+    PRIMARY KEY (hour, event_type, status, user_id)
+);
+"""
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+class AuditStore:
+    """Indexed SQLite store for audit events
+
+    Rows are written in batches by the audit sink thread and read with
+    keyset pagination on (ts, id), so a lookup for one user or event type
+    over any time range is an index range scan rather than a full read.
+    Each thread gets its own connection; WAL mode lets readers run while
+    the sink is writing.
+
+    Hourly counts per (event_type, status, user_id) are rolled up in the
+    same transaction as each insert, so reports never rescan raw events
+    except for the partial hours at the edges of the requested range.
+
+    Raw events are only kept for ``retention_days``; every event is also
+    in the JSONL segments, which remain the full record. ``prune`` deletes
+    older rows and rollups past ``rollup_retention_days``, and SQLite
+    reuses the freed pages, so the file stops growing once the window is
+    full. None keeps rows forever.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        retention_days: Optional[float] = 30,
+        rollup_retention_days: Optional[float] = 400,
+    ):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.retention_days = retention_days
+        self.rollup_retention_days = rollup_retention_days
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def to_row(data: Dict[str, Any], line: str) -> AuditRow:
+        """Build a row from an event dict and its serialized JSON line"""
+        timestamp = data["timestamp"]
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+        return (
+            timestamp.timestamp(),
+            data["event_type"],
+            data.get("user_id"),
+            data["status"],
+            data["action"],
+            line,
+        )
+
+    def insert_many(self, rows: Sequence[AuditRow]):
+        rollups: Counter = Counter()
+        for ts, event_type, user_id, status, _, _ in rows:
+            rollups[(int(ts // HOUR), event_type, status, user_id or "")] += 1
+
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO audit_events (ts, event_type, user_id, status, action, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.executemany(
+                "INSERT INTO audit_rollups (hour, event_type, status, user_id, count) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (hour, event_type, status, user_id) "
+                "DO UPDATE SET count = count + excluded.count",
+                [(*key, count) for key, count in rollups.items()],
+            )
+
+    def horizon(self, now: Optional[float] = None) -> Optional[float]:
+        """Timestamp from which raw events are guaranteed to be in the store"""
+        if self.retention_days is None:
+            return None
+        now = time.time() if now is None else now
+        # On an hour boundary, so pruned hours are covered by whole rollups
+        return math.floor((now - self.retention_days * DAY) / HOUR) * HOUR
+
+    def prune(self, now: Optional[float] = None, batch_size: int = 10_000) -> int:
+        """Delete events and rollups past their retention; returns events removed
+
+        Events are deleted oldest first in small transactions, so inserts
+        from the sink are never held up for long.
+        """
+        now = time.time() if now is None else now
+        conn = self._connection()
+        removed = 0
+        cutoff = self.horizon(now)
+        if cutoff is not None:
+            while True:
+                with conn:
+                    deleted = conn.execute(
+                        "DELETE FROM audit_events WHERE id IN "
+                        "(SELECT id FROM audit_events WHERE ts < ? ORDER BY ts LIMIT ?)",
+                        (cutoff, batch_size),
+                    ).rowcount
+                removed += deleted
+                if deleted < batch_size:
+                    break
+        if self.rollup_retention_days is not None:
+            with conn:
+                conn.execute(
+                    "DELETE FROM audit_rollups WHERE hour < ?",
+                    (int((now - self.rollup_retention_days * DAY) // HOUR),),
+                )
+        return removed
+
+    def counts(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        event_type: Optional[str] = None,
+        user_id: Optional[str] = None,
+    ) -> Counter:
+        """Event counts keyed by (event_type, status, user_id)
+
+        Whole hours come from the rollup table; partial hours at either end
+        of the range are counted from the indexed raw events.
+        """
+        start = start_date.timestamp() if start_date else None
+        end = end_date.timestamp() if end_date else None
+        # Rollups cover hours [first_hour, end_hour); the end bound is
+        # inclusive, so the hour containing it is always partial
+        first_hour = math.ceil(start / HOUR) if start is not None else None
+        end_hour = math.floor(end / HOUR) if end is not None else None
+
+        totals: Counter = Counter()
+        if first_hour is not None and end_hour is not None and first_hour >= end_hour:
+            totals.update(self._raw_counts(start, end, True, event_type, user_id))
+            return totals
+
+        if start is not None:
+            totals.update(self._raw_counts(start, first_hour * HOUR, False, event_type, user_id))
+        if end is not None:
+            totals.update(self._raw_counts(end_hour * HOUR, end, True, event_type, user_id))
+        totals.update(self._rollup_counts(first_hour, end_hour, event_type, user_id))
+        return totals
+
+    def _raw_counts(
+        self,
+        start: float,
+        end: float,
+        end_inclusive: bool,
+        event_type: Optional[str],
+        user_id: Optional[str],
+    ) -> Counter:
+        clauses = ["ts >= ?", "ts <= ?" if end_inclusive else "ts < ?"]
+        params: List[Any] = [start, end]
+        if event_type:
+            clauses.append("event_type = ?")
+            params.append(event_type)
+        if user_id:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        rows = self._connection().execute(
+            "SELECT event_type, status, COALESCE(user_id, ''), COUNT(*) FROM audit_events "
+            f"WHERE {' AND '.join(clauses)} GROUP BY 1, 2, 3",
+            params,
+        )
+        return Counter({(t, s, u): n for t, s, u, n in rows})
+
+    def _rollup_counts(
+        self,
+        first_hour: Optional[int],
+        end_hour: Optional[int],
+        event_type: Optional[str],
+        user_id: Optional[str],
+    ) -> Counter:
+        clauses: List[str] = []
+        params: List[Any] = []
+        if first_hour is not None:
+            clauses.append("hour >= ?")
+            params.append(first_hour)
+        if end_hour is not None:
+            clauses.append("hour < ?")
+            params.append(end_hour)
+        if event_type:
+            clauses.append("event_type = ?")
+            params.append(event_type)
+        if user_id:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        rows = self._connection().execute(
+            "SELECT event_type, status, user_id, SUM(count) FROM audit_rollups"
+            f"{where} GROUP BY 1, 2, 3",
+            params,
+        )
+        return Counter({(t, s, u): n for t, s, u, n in rows})
+
+    def _where(
+        self,
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        event_type: Optional[str],
+        user_id: Optional[str],
+        cursor: Optional[Tuple[float, int]] = None,
+    ) -> Tuple[str, List[Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        if start_date:
+            clauses.append("ts >= ?")
+            params.append(start_date.timestamp())
+        if end_date:
+            clauses.append("ts <= ?")
+            params.append(end_date.timestamp())
+        if event_type:
+            clauses.append("event_type = ?")
+            params.append(event_type)
+        if user_id:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if cursor:
+            clauses.append("(ts > ? OR (ts = ? AND id > ?))")
+            params.extend([cursor[0], cursor[0], cursor[1]])
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def query(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        event_type: Optional[str] = None,
+        user_id: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Fetch one page of events in timestamp order
+
+        Returns the events and an opaque cursor for the next page, or None
+        when there are no more events.
+        """
+        where, params = self._where(
+            start_date, end_date, event_type, user_id, self._decode_cursor(cursor)
+        )
+        rows = self._connection().execute(
+            f"SELECT id, ts, data FROM audit_events{where} ORDER BY ts, id LIMIT ?",
+            [*params, limit + 1],
+        ).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_id, last_ts, _ = rows[-1]
+            next_cursor = f"{last_ts!r}:{last_id}"
+        return [json.loads(data) for _, _, data in rows], next_cursor
+
+    def iter_events(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        event_type: Optional[str] = None,
+        user_id: Optional[str] = None,
+        batch_size: int = 1000,
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream matching events in timestamp order, one page in memory"""
+        cursor = None
+        while True:
+            events, cursor = self.query(
+                start_date, end_date, event_type, user_id, batch_size, cursor
+            )
+            yield from events
+            if cursor is None:
+                return
+
+    @staticmethod
+    def _decode_cursor(cursor: Optional[str]) -> Optional[Tuple[float, int]]:
+        if not cursor:
+            return None
+        try:
+            ts, row_id = cursor.rsplit(":", 1)
+            return float(ts), int(row_id)
+        except ValueError:
+            raise ValueError(f"Invalid audit cursor: {cursor}")
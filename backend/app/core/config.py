@@ -36,6 +36,10 @@ class Settings(BaseSettings):
     REDIS_PASSWORD: str = os.getenv("REDIS_PASSWORD", "redispass")
     REDIS_DB: int = int(os.getenv("REDIS_DB", "0"))
     REDIS_URL: str = f"redis://:{REDIS_PASSWORD}@{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
+    # Per-request checks (rate limits, IP blocks) give up on Redis after
+    # this many seconds and use local state for REDIS_RETRY_INTERVAL
+    REDIS_REQUEST_TIMEOUT: float = float(os.getenv("REDIS_REQUEST_TIMEOUT", "0.25"))
+    REDIS_RETRY_INTERVAL: int = int(os.getenv("REDIS_RETRY_INTERVAL", "30"))
 
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
@@ -143,6 +147,39 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: str = os.getenv("SMTP_PASSWORD", "")
     EMAIL_FROM: str = os.getenv("EMAIL_FROM", "noreply@example.com")
 
+    # Access logging
+    # Fraction of successful requests whose access log line is written;
+    # errors are always logged
+    ACCESS_LOG_SAMPLE_RATE: float = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0"))
+    # Per-route overrides as "path_prefix=rate,...", longest prefix wins
+    ACCESS_LOG_SAMPLE_RATES: str = os.getenv("ACCESS_LOG_SAMPLE_RATES", "")
+
+    # Event loop monitoring
+    LOOP_LAG_INTERVAL: float = float(os.getenv("LOOP_LAG_INTERVAL", "0.25"))
+    # Watchdog that reports callbacks blocking the loop, with their stacks;
+    # on by default in debug
+    LOOP_BLOCK_DETECTION: bool = os.getenv(
+        "LOOP_BLOCK_DETECTION", os.getenv("DEBUG", "True")
+    ).lower() == "true"
+    LOOP_BLOCK_THRESHOLD_MS: int = int(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))
+
+    # System metrics
+    METRICS_DISK_PATH: str = os.getenv("METRICS_DISK_PATH", "/")
+    # Counting sockets walks every one on the host, so it is opt-in and
+    # refreshed at its own, slower interval
+    METRICS_COLLECT_CONNECTIONS: bool = os.getenv(
+        "METRICS_COLLECT_CONNECTIONS", "False"
+    ).lower() == "true"
+    METRICS_CONNECTIONS_INTERVAL: int = int(os.getenv("METRICS_CONNECTIONS_INTERVAL", "60"))
+
+    def get_access_log_sample_rates(self) -> dict[str, float]:
+        rates = {}
+        for item in self.ACCESS_LOG_SAMPLE_RATES.split(","):
+            if "=" in item:
+                prefix, rate = item.rsplit("=", 1)
+                rates[prefix.strip()] = float(rate)
+        return rates
+
     # Security Headers
     SECURITY_HEADERS: dict = {
         "X-Frame-Options": "DENY",
@@ -0,0 +1,16 @@
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+# Set by RequestContextMiddleware for the lifetime of each request and
+# inherited by tasks spawned while handling it
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Executions per query fingerprint within the current request. The Counter
+# is shared, so queries run in threadpool workers count towards it too.
+request_queries_var: ContextVar[Optional[Counter]] = ContextVar("request_queries", default=None)
+
+
+def get_request_id() -> Optional[str]:
+    """Get the ID of the request currently being handled, if any"""
+    return request_id_var.get()
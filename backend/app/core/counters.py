@@ -0,0 +1,157 @@
+from array import array
+import time
+from collections import OrderedDict
+from typing import Hashable, List, Optional
+
+
+class TimeBucketedCountMinSketch:
+    """Approximate per-key event counts over a sliding time window
+
+    The window is split into ``buckets`` slots, each holding a count-min
+    sketch of ``depth`` x ``width`` counters. Memory is fixed no matter how
+    many distinct keys are seen; estimates never undercount and only
+    overcount on hash collisions, which is the safe direction for abuse
+    detection.
+    """
+
+    def __init__(
+        self,
+        window: float,
+        buckets: int = 6,
+        width: int = 2048,
+        depth: int = 4,
+    ) -> None:
+        self.window = window
+        self.buckets = buckets
+        self.bucket_seconds = window / buckets
+        self.width = width
+        self.depth = depth
+        self._slots: List[array] = [
+            array("I", bytes(4 * width * depth)) for _ in range(buckets)
+        ]
+        self._slot_epochs: List[int] = [-1] * buckets
+
+    def _epoch(self, now: float) -> int:
+        return int(now // self.bucket_seconds)
+
+    def _slot(self, epoch: int) -> array:
+        index = epoch % self.buckets
+        if self._slot_epochs[index] != epoch:
+            # Slot last held an expired bucket, reuse it
+            self._slots[index] = array("I", bytes(4 * self.width * self.depth))
+            self._slot_epochs[index] = epoch
+        return self._slots[index]
+
+    def _cells(self, key: Hashable) -> List[int]:
+        return [
+            row * self.width + hash((row, key)) % self.width
+            for row in range(self.depth)
+        ]
+
+    def add(self, key: Hashable, count: int = 1, now: Optional[float] = None) -> int:
+        """Count ``count`` events for ``key`` and return the windowed estimate"""
+        now = time.time() if now is None else now
+        slot = self._slot(self._epoch(now))
+        cells = self._cells(key)
+        for cell in cells:
+            slot[cell] += count
+        return self._estimate(cells, now)
+
+    def estimate(self, key: Hashable, now: Optional[float] = None) -> int:
+        """Estimated number of events for ``key`` within the window"""
+        now = time.time() if now is None else now
+        return self._estimate(self._cells(key), now)
+
+    def _estimate(self, cells: List[int], now: float) -> int:
+        current = self._epoch(now)
+        total = 0
+        for index, epoch in enumerate(self._slot_epochs):
+            if current - self.buckets < epoch <= current:
+                slot = self._slots[index]
+                total += min(slot[cell] for cell in cells)
+        return total
+
+
+class SlidingWindowCounter:
+    """Event count over a sliding window, kept in fixed time buckets
+
+    Updates and reads are O(1) amortized: buckets that fell out of the
+    window are cleared lazily, at most ``buckets`` of them per call.
+    """
+
+    __slots__ = ("bucket_seconds", "counts", "last_epoch", "total")
+
+    def __init__(self, window: float, buckets: int = 12, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        self.bucket_seconds = window / buckets
+        self.counts = [0] * buckets
+        self.last_epoch = int(now // self.bucket_seconds)
+        self.total = 0
+
+    def _advance(self, now: float) -> None:
+        epoch = int(now // self.bucket_seconds)
+        if epoch <= self.last_epoch:
+            return
+        steps = min(epoch - self.last_epoch, len(self.counts))
+        for step in range(1, steps + 1):
+            index = (self.last_epoch + step) % len(self.counts)
+            self.total -= self.counts[index]
+            self.counts[index] = 0
+        self.last_epoch = epoch
+
+    def add(self, count: int = 1, now: Optional[float] = None) -> int:
+        """Count ``count`` events and return the windowed total"""
+        now = time.time() if now is None else now
+        self._advance(now)
+        self.counts[self.last_epoch % len(self.counts)] += count
+        self.total += count
+        return self.total
+
+    def value(self, now: Optional[float] = None) -> int:
+        """Events counted within the window"""
+        self._advance(time.time() if now is None else now)
+        return self.total
+
+
+class ThresholdTracker:
+    """Per-key sliding-window counts that fire once per threshold crossing
+
+    ``record`` returns the windowed count the first time a key goes over
+    ``threshold`` and None otherwise; the key re-arms once its count drops
+    back to the threshold. At most ``max_keys`` keys are tracked, least
+    recently seen first out.
+    """
+
+    def __init__(
+        self,
+        window: float,
+        threshold: int,
+        buckets: int = 12,
+        max_keys: int = 10_000,
+    ) -> None:
+        self.window = window
+        self.threshold = threshold
+        self.buckets = buckets
+        self.max_keys = max_keys
+        # key -> [counter, alerted]
+        self._keys: "OrderedDict[Hashable, list]" = OrderedDict()
+
+    def record(self, key: Hashable, now: Optional[float] = None) -> Optional[int]:
+        now = time.time() if now is None else now
+        state = self._keys.get(key)
+        if state is None:
+            state = [SlidingWindowCounter(self.window, self.buckets, now), False]
+            self._keys[key] = state
+            if len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+        else:
+            self._keys.move_to_end(key)
+
+        counter, alerted = state
+        if alerted and counter.value(now) <= self.threshold:
+            alerted = state[1] = False
+        count = counter.add(1, now)
+        if count > self.threshold and not alerted:
+            state[1] = True
+            return count
+        return None
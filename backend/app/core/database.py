@@ -5,6 +5,8 @@ import os
 from dotenv import load_dotenv
 from typing import Dict, List, Optional, Any, TypeVar, Generic, Generator
 from .config import get_settings
+from .metrics import metrics_registry
+from .monitoring import database_monitor
 
 load_dotenv()
 
@@ -20,9 +22,22 @@ engine = create_engine(
     pool_size=5,
     max_overflow=10
 )
+# Per-fingerprint query timings and N+1 detection
+database_monitor.instrument(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _pool_metrics():
+    """Connection pool gauges for /metrics"""
+    pool = engine.pool
+    yield ("db_pool_size", "gauge", "Configured connection pool size", [("", [], pool.size())])
+    yield ("db_pool_checked_out", "gauge", "Connections currently in use", [("", [], pool.checkedout())])
+    yield ("db_pool_overflow", "gauge", "Connections open beyond the pool size", [("", [], max(pool.overflow(), 0))])
+
+
+metrics_registry.register_collector(_pool_metrics)
+
 Base = declarative_base()
 
 # Database tables
@@ -10,23 +10,32 @@ from .exceptions import (
     ServiceError,
     ErrorResponse
 )
+from .counters import SlidingWindowCounter
 from .logging import get_logger, get_audit_logger
 from .monitoring import performance_monitor, database_monitor
+from collections import deque
 from datetime import datetime
 import traceback
 import uuid
-from typing import Dict, Any
+from typing import Deque, Dict, Any
 
 logger = get_logger(__name__)
 audit_logger = get_audit_logger()
 
 class ErrorTracker:
-    """Track and analyze errors for monitoring and improvement"""
+    """Track and analyze errors for monitoring and improvement
+
+    Memory is constant in the number of errors: each error type keeps its
+    total, a ring buffer of the latest ``max_contexts`` contexts and a
+    bucketed one-hour counter for the recent rate.
+    """
     
-    def __init__(self):
+    def __init__(self, max_contexts: int = 100, rate_window: int = 3600):
+        self.max_contexts = max_contexts
+        self.rate_window = rate_window
         self.error_counts: Dict[str, int] = {}
-        self.error_timestamps: Dict[str, list] = {}
-        self.error_contexts: Dict[str, list] = {}
+        self.error_rates: Dict[str, SlidingWindowCounter] = {}
+        self.error_contexts: Dict[str, Deque[Dict[str, Any]]] = {}
         
     def track_error(self, error_type: str, context: Dict[str, Any]):
         """Track an error occurrence with context"""
@@ -36,19 +45,19 @@ class ErrorTracker:
         # Update error counts
         self.error_counts[error_type] = self.error_counts.get(error_type, 0) + 1
         
-        # Store error context
+        # Store error context, keeping the latest few per type
         if error_type not in self.error_contexts:
-            self.error_contexts[error_type] = []
+            self.error_contexts[error_type] = deque(maxlen=self.max_contexts)
         self.error_contexts[error_type].append({
             "error_id": error_id,
             "timestamp": timestamp,
             "context": context
         })
         
-        # Track timestamps for rate limiting
-        if error_type not in self.error_timestamps:
-            self.error_timestamps[error_type] = []
-        self.error_timestamps[error_type].append(timestamp)
+        # Count towards the recent error rate
+        if error_type not in self.error_rates:
+            self.error_rates[error_type] = SlidingWindowCounter(self.rate_window)
+        self.error_rates[error_type].add()
         
         return error_id
         
@@ -56,13 +65,10 @@ class ErrorTracker:
         """Get error statistics for monitoring"""
         return {
             "total_errors": sum(self.error_counts.values()),
-            "error_types": self.error_counts,
+            "error_types": dict(self.error_counts),
             "recent_errors": {
-                error_type: len([
-                    t for t in timestamps 
-                    if (datetime.utcnow() - t).total_seconds() < 3600
-                ])
-                for error_type, timestamps in self.error_timestamps.items()
+                error_type: counter.value()
+                for error_type, counter in self.error_rates.items()
             }
         }
 
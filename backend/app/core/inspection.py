@@ -0,0 +1,242 @@
+from dataclasses import dataclass, field
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote_plus
+from fastapi import Request
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+# Headers inspected by rules that target "headers"
+DEFAULT_HEADERS = ("user-agent", "x-forwarded-for", "x-real-ip", "referer")
+
+
+@dataclass(frozen=True)
+class InspectionRule:
+    """A WAF-style signature
+
+    ``targets`` holds any of "path", "query", "headers" (the default header
+    set) or "header:<name>" for a specific header.
+    """
+    id: str
+    pattern: str
+    targets: Tuple[str, ...] = ("path", "query", "headers")
+    severity: str = "medium"
+
+
+DEFAULT_RULES: List[InspectionRule] = [
+    InspectionRule("legacy-sql-keyword", r"sql", ("headers",), "low"),
+    InspectionRule("legacy-script-keyword", r"script", ("headers",), "low"),
+    InspectionRule("sqli-union-select", r"union(?:\s|/\*.*?\*/)+(?:all\s+)?select", severity="high"),
+    InspectionRule("sqli-tautology", r"'\s*or\s+'?\d+'?\s*=\s*'?\d+", severity="high"),
+    InspectionRule("sqli-comment", r"'\s*(?:--|#|/\*)", ("query",), "medium"),
+    InspectionRule("xss-script-tag", r"<\s*script\b", severity="high"),
+    InspectionRule("xss-event-handler", r"\bon(?:error|load|mouseover)\s*=", ("query", "headers"), "medium"),
+    InspectionRule("xss-js-uri", r"javascript\s*:", severity="medium"),
+    InspectionRule("path-traversal", r"(?:\.\./|\.\.\\|%2e%2e%2f)", ("path", "query"), "high"),
+    InspectionRule("sensitive-file", r"/etc/passwd|\.env\b|\.git/", ("path", "query"), "high"),
+    InspectionRule("log4shell", r"\$\{jndi:", ("path", "query", "headers"), "critical"),
+    InspectionRule(
+        "scanner-user-agent",
+        r"sqlmap|nikto|nmap|masscan|zgrab|acunetix",
+        ("header:user-agent",),
+        "medium",
+    ),
+]
+
+
+# Flags of a pattern without inline flags; anything more came from one
+_BASE_FLAGS = re.compile("").flags
+# Global inline flags such as "(?i)"; only valid at the start of a pattern
+_GLOBAL_FLAGS = re.compile(r"\(\?([aiLmsux]+)\)")
+# An unescaped \1..\99 or a (?(1)...) conditional
+_NUMBERED_REFERENCE = re.compile(r"(?<!\\)(?:\\\\)*\\[1-9]|\(\?\(\d")
+
+
+def normalize_pattern(pattern: str) -> str:
+    """Return a rule pattern in a form that can be embedded in a combined regex
+
+    Leading global flags are rewritten to a scoped group, ``(?i)evil``
+    becomes ``(?i:evil)``, since they are an error anywhere but at the
+    start of the combined pattern. Named groups and numbered backreferences
+    raise ``re.error``: once rules are combined the group numbers shift and
+    names may clash.
+    """
+    flags = ""
+    while True:
+        match = _GLOBAL_FLAGS.match(pattern)
+        if match is None:
+            break
+        flags += match.group(1)
+        pattern = pattern[match.end():]
+    if flags:
+        pattern = f"(?{flags}:{pattern})"
+
+    compiled = re.compile(pattern)
+    if compiled.flags != _BASE_FLAGS:
+        raise re.error("global inline flags must come first")
+    if compiled.groupindex:
+        raise re.error("named groups are not supported")
+    if compiled.groups and _NUMBERED_REFERENCE.search(pattern):
+        raise re.error("backreferences are not supported")
+    # Compiled inside a group the way it is combined, so a pattern can
+    # not close the wrapper and leak into its neighbours
+    re.compile(f"(?P<rule>{pattern})")
+    return pattern
+
+
+@dataclass
+class CompiledRuleSet:
+    """Rules compiled to one combined regex per inspected target"""
+    rules: List[InspectionRule]
+    # target -> (combined pattern, group name -> rule)
+    matchers: Dict[str, Tuple["re.Pattern[str]", Dict[str, InspectionRule]]] = field(default_factory=dict)
+
+    @classmethod
+    def compile(cls, rules: Iterable[InspectionRule]) -> "CompiledRuleSet":
+        """Compile rules, skipping invalid ones
+
+        Raises ``re.error`` if a combined pattern still fails to compile.
+        """
+        valid: List[InspectionRule] = []
+        by_target: Dict[str, List[Tuple[str, str, InspectionRule]]] = defaultdict(list)
+
+        for index, rule in enumerate(rules):
+            try:
+                pattern = normalize_pattern(rule.pattern)
+            except re.error as e:
+                logger.error(f"Skipping invalid inspection rule {rule.id}: {str(e)}")
+                continue
+            valid.append(rule)
+            group = f"r{index}"
+            for target in rule.targets:
+                if target == "headers":
+                    for header in DEFAULT_HEADERS:
+                        by_target[f"header:{header}"].append((group, pattern, rule))
+                else:
+                    by_target[target.lower()].append((group, pattern, rule))
+
+        matchers = {}
+        for target, entries in by_target.items():
+            # The leading lookahead finds positions where any rule starts;
+            # each rule is then tried there in its own optional zero-width
+            # group, so overlapping signatures are all captured instead of
+            # the first alternative consuming the span
+            gate = "|".join(f"(?:{pattern})" for _, pattern, _ in entries)
+            captures = "".join(f"(?:(?=(?P<{group}>{pattern}))|)" for group, pattern, _ in entries)
+            matchers[target] = (
+                re.compile(f"(?={gate}){captures}", re.IGNORECASE),
+                {group: rule for group, _, rule in entries},
+            )
+        return cls(rules=valid, matchers=matchers)
+
+
+class RuleEngine:
+    """Inspect requests against a hot-reloadable signature set
+
+    Rules come from the JSON file in ``WAF_RULES_FILE`` (a list of objects
+    with ``id``, ``pattern`` and optional ``targets`` and ``severity``), or
+    the built-in defaults. The file is re-read when its mtime changes,
+    checked at most every ``reload_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        rules_file: Optional[str] = None,
+        reload_interval: float = 5.0,
+    ):
+        self.rules_file = Path(rules_file) if rules_file else None
+        self.reload_interval = reload_interval
+        self.hit_counts: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self.ruleset = CompiledRuleSet.compile(DEFAULT_RULES)
+        self.reload()
+
+    def _load_rules(self) -> List[InspectionRule]:
+        with open(self.rules_file) as f:
+            raw_rules = json.load(f)
+        return [
+            InspectionRule(
+                id=rule["id"],
+                pattern=rule["pattern"],
+                targets=tuple(rule.get("targets", ("path", "query", "headers"))),
+                severity=rule.get("severity", "medium"),
+            )
+            for rule in raw_rules
+        ]
+
+    def reload(self, force: bool = False) -> bool:
+        """Recompile rules if the rules file changed; returns True on reload"""
+        if self.rules_file is None:
+            return False
+        with self._lock:
+            try:
+                mtime = self.rules_file.stat().st_mtime
+                if not force and mtime == self._mtime:
+                    return False
+                ruleset = CompiledRuleSet.compile(self._load_rules())
+            except (OSError, ValueError, KeyError, TypeError, re.error) as e:
+                # The previous rule set stays active
+                logger.error(f"Failed to load inspection rules from {self.rules_file}: {str(e)}")
+                return False
+            # Swapped in one assignment so in-flight requests keep a
+            # consistent rule set
+            self.ruleset = ruleset
+            self._mtime = mtime
+            logger.info(
+                "Inspection rules loaded",
+                extra={"rules_file": str(self.rules_file), "rule_count": len(ruleset.rules)}
+            )
+            return True
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if self.rules_file is not None and now >= self._next_check:
+            self._next_check = now + self.reload_interval
+            self.reload()
+
+    def inspect(self, request: Request) -> List[InspectionRule]:
+        """Return the rules matched by a request
+
+        Each target is scanned once; every rule matching at a position is
+        reported, including signatures that overlap.
+        """
+        self._maybe_reload()
+        matchers = self.ruleset.matchers
+        matched: Dict[str, InspectionRule] = {}
+
+        def scan(target: str, value: str):
+            entry = matchers.get(target)
+            if entry is None or not value:
+                return
+            pattern, groups = entry
+            for match in pattern.finditer(value):
+                for group, span in match.groupdict().items():
+                    if span is not None:
+                        rule = groups[group]
+                        matched[rule.id] = rule
+
+        scan("path", request.url.path)
+        scan("query", unquote_plus(request.url.query))
+        for target in matchers:
+            if target.startswith("header:"):
+                scan(target, request.headers.get(target[7:], ""))
+
+        for rule_id in matched:
+            self.hit_counts[rule_id] += 1
+        return list(matched.values())
+
+    def get_stats(self) -> Dict[str, int]:
+        """Per-rule hit counters"""
+        return dict(self.hit_counts)
+
+
+rule_engine = RuleEngine(rules_file=os.getenv("WAF_RULES_FILE"))
@@ -1,60 +1,111 @@
+import atexit
 import logging
 import logging.handlers
 import os
 from pathlib import Path
 import json
-from datetime import datetime
+import queue
 import sys
+import time
 import traceback
 from typing import Any, Dict, Optional
 import socket
 from logging.handlers import RotatingFileHandler
+from .context import get_request_id
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+AUDIT_LOGGER = "audit"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
 
 # Create logs directory if it doesn't exist
 log_dir = Path("logs")
 log_dir.mkdir(exist_ok=True)
 
+# Attributes every LogRecord has; anything else on a record came from ``extra``
+_RECORD_ATTRS = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", None, None))
+) | {"message", "asctime", "correlation_id", "taskName"}
+
+
+def _dumps(data: Dict[str, Any]) -> str:
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                data, default=str, option=orjson.OPT_NON_STR_KEYS
+            ).decode()
+        except TypeError:
+            # e.g. integers wider than 64 bits; json handles those
+            pass
+    return json.dumps(data, default=str)
+
+
 class EnhancedStructuredLogFormatter(logging.Formatter):
-    """Enhanced structured JSON logging with additional context"""
+    """Enhanced structured JSON logging with additional context
+
+    Host and process fields are computed once, the timestamp prefix is
+    cached per second, and ``extra`` fields are copied only when a record
+    carries any. Serialization uses orjson when it is installed.
+    """
     
     def __init__(self):
         super().__init__()
-        self.hostname = socket.gethostname()
-        self.pid = os.getpid()
-    
-    def format(self, record):
-        # Create a structured log entry with enhanced context
-        log_entry = {
-            "timestamp": datetime.utcnow().isoformat(),
+        self.static_fields = {
+            "hostname": socket.gethostname(),
+            "pid": os.getpid(),
+        }
+        self._ts_second = -1
+        self._ts_prefix = ""
+
+    def _timestamp(self, created: float) -> str:
+        second = int(created)
+        if second != self._ts_second:
+            self._ts_prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+            self._ts_second = second
+        return f"{self._ts_prefix}.{int((created - second) * 1_000_000):06d}"
+
+    def _base_entry(self, record: logging.LogRecord) -> Dict[str, Any]:
+        return {
+            "timestamp": self._timestamp(record.created),
             "level": record.levelname,
             "message": record.getMessage(),
             "module": record.module,
             "function": record.funcName,
             "line": record.lineno,
             "logger": record.name,
-            "hostname": self.hostname,
-            "pid": self.pid,
+            **self.static_fields,
             "thread": record.thread,
             "thread_name": record.threadName
         }
+    
+    def format(self, record):
+        log_entry = self._base_entry(record)
         
-        # Add exception info if present
+        # Add exception info if present, formatting the traceback only once
+        # per record however many handlers use it
         if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
             log_entry["exception"] = {
                 "type": record.exc_info[0].__name__,
                 "message": str(record.exc_info[1]),
-                "traceback": self.formatException(record.exc_info)
+                "traceback": record.exc_text
             }
             
         # Add extra fields if present
-        if hasattr(record, "extra"):
-            log_entry.update(record.extra)
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                log_entry[key] = value
             
         # Add correlation ID if present in request context
-        if hasattr(record, "correlation_id"):
-            log_entry["correlation_id"] = record.correlation_id
+        correlation_id = getattr(record, "correlation_id", None)
+        if correlation_id is not None:
+            log_entry["correlation_id"] = correlation_id
             
-        return json.dumps(log_entry)
+        return _dumps(log_entry)
 
 class CorrelationFilter(logging.Filter):
     """Filter to add correlation ID to log records"""
@@ -63,63 +114,126 @@ class CorrelationFilter(logging.Filter):
         # Add correlation ID from request context if available
         if hasattr(record, "request"):
             record.correlation_id = getattr(record.request.state, "correlation_id", None)
+        elif not hasattr(record, "correlation_id"):
+            record.correlation_id = get_request_id()
         return True
 
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks the caller on a full queue
+
+    Records below ERROR are dropped and counted when the queue is full;
+    errors wait up to ``block_timeout`` seconds for room first.
+    """
+
+    def __init__(self, log_queue: "queue.Queue", block_timeout: float = 0.1):
+        super().__init__(log_queue)
+        self.block_timeout = block_timeout
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge args on the calling thread so later mutation of them can't
+        # change the message, but leave formatting to the listener thread.
+        # exc_info is kept for the formatters; nothing here is pickled.
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if record.levelno >= logging.ERROR:
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LoggerNameFilter(logging.Filter):
+    """Pass records from one logger tree, or everything else when ``exclude``"""
+
+    def __init__(self, name: str, exclude: bool = False):
+        super().__init__()
+        self.prefix = name + "."
+        self.logger_name = name
+        self.exclude = exclude
+
+    def filter(self, record):
+        matches = record.name == self.logger_name or record.name.startswith(self.prefix)
+        return matches != self.exclude
+
+
+_queue_handler: Optional[DroppingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _rotating_handler(filename: str, level: int, formatter: logging.Formatter) -> logging.Handler:
+    handler = RotatingFileHandler(
+        filename=log_dir / filename,
+        maxBytes=10*1024*1024,  # 10MB
+        backupCount=5,
+        encoding='utf-8'
+    )
+    handler.setLevel(level)
+    handler.setFormatter(formatter)
+    return handler
+
+
 def setup_logging():
-    """Configure enhanced logging with rotation and structured format"""
-    
+    """Configure queue-based logging with rotation and structured format
+
+    Loggers only enqueue records; a single listener thread formats them
+    and does all console and file I/O. Handlers are created here once, so
+    ``get_logger`` never adds any.
+    """
+    global _queue_handler, _listener
+    if _listener is not None:
+        return logging.getLogger()
+
     # Create root logger
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
     
     # Remove existing handlers
     root_logger.handlers = []
+
+    app_only = LoggerNameFilter(AUDIT_LOGGER, exclude=True)
     
-    # Create console handler with color support
+    # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(EnhancedStructuredLogFormatter())
-    console_handler.addFilter(CorrelationFilter())
-    root_logger.addHandler(console_handler)
-    
-    # Create file handler with rotation
-    file_handler = logging.handlers.RotatingFileHandler(
-        filename=log_dir / "app.log",
-        maxBytes=10*1024*1024,  # 10MB
-        backupCount=5,
-        encoding='utf-8'
-    )
-    file_handler.setLevel(logging.INFO)
-    file_handler.setFormatter(EnhancedStructuredLogFormatter())
-    file_handler.addFilter(CorrelationFilter())
-    root_logger.addHandler(file_handler)
-    
-    # Create error file handler
-    error_handler = logging.handlers.RotatingFileHandler(
-        filename=log_dir / "error.log",
-        maxBytes=10*1024*1024,  # 10MB
-        backupCount=5,
-        encoding='utf-8'
-    )
-    error_handler.setLevel(logging.ERROR)
-    error_handler.setFormatter(EnhancedStructuredLogFormatter())
-    error_handler.addFilter(CorrelationFilter())
-    root_logger.addHandler(error_handler)
-    
-    # Create audit log handler
-    audit_handler = logging.handlers.RotatingFileHandler(
-        filename=log_dir / "audit.log",
-        maxBytes=10*1024*1024,  # 10MB
-        backupCount=5,
-        encoding='utf-8'
-    )
-    audit_handler.setLevel(logging.INFO)
-    audit_handler.setFormatter(EnhancedStructuredLogFormatter())
-    audit_handler.addFilter(CorrelationFilter())
-    audit_logger = logging.getLogger("audit")
-    audit_logger.addHandler(audit_handler)
+
+    handlers = [
+        console_handler,
+        _rotating_handler("app.log", logging.INFO, EnhancedStructuredLogFormatter()),
+        _rotating_handler("error.log", logging.ERROR, EnhancedStructuredLogFormatter()),
+        # Structured request fields for log shipping
+        _rotating_handler("app.json", logging.INFO, JSONFormatter()),
+    ]
+    for handler in handlers:
+        handler.addFilter(app_only)
+
+    # Audit records only go to the audit log
+    audit_handler = _rotating_handler("audit.log", logging.INFO, EnhancedStructuredLogFormatter())
+    audit_handler.addFilter(LoggerNameFilter(AUDIT_LOGGER))
+    handlers.append(audit_handler)
+
+    _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    # Runs on the calling thread, where the request context is set
+    _queue_handler.addFilter(CorrelationFilter())
+    root_logger.addHandler(_queue_handler)
+
+    audit_logger = logging.getLogger(AUDIT_LOGGER)
+    audit_logger.handlers = [_queue_handler]
     audit_logger.setLevel(logging.INFO)
     audit_logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(
+        _queue_handler.queue, *handlers, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(shutdown_logging)
     
     # Set up logging for specific modules
     logging.getLogger("uvicorn").setLevel(logging.WARNING)
@@ -127,51 +241,33 @@ def setup_logging():
     
     return root_logger
 
-# Initialize logging
-logger = setup_logging()
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logging_stats() -> Dict[str, int]:
+    """Queue depth and drop count of the logging pipeline"""
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0, "capacity": 0}
+    return {
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+        "capacity": _queue_handler.queue.maxsize,
+    }
+
 
 def get_logger(name: str) -> logging.Logger:
-    """Get a configured logger instance"""
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-    
-    # Create formatters
-    console_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    file_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    json_formatter = JSONFormatter()
-    
-    # Console handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
-    
-    # File handler
-    file_handler = RotatingFileHandler(
-        'logs/app.log',
-        maxBytes=10*1024*1024,  # 10MB
-        backupCount=5
-    )
-    file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
-    
-    # JSON handler for structured logging
-    json_handler = RotatingFileHandler(
-        'logs/app.json',
-        maxBytes=10*1024*1024,  # 10MB
-        backupCount=5
-    )
-    json_handler.setFormatter(json_formatter)
-    logger.addHandler(json_handler)
-    
-    return logger
+    """Get a logger; records go through the shared queue on the root logger"""
+    return logging.getLogger(name)
 
 def get_audit_logger() -> logging.Logger:
     """Get the audit logger instance"""
-    return logging.getLogger("audit")
+    return logging.getLogger(AUDIT_LOGGER)
 
 def log_api_call(
     logger: logging.Logger,
@@ -182,9 +278,14 @@ def log_api_call(
     status_code: Optional[int] = None,
     duration: Optional[float] = None,
     error: Optional[str] = None,
-    stack_trace: Optional[str] = None
+    stack_trace: Optional[str] = None,
+    sample_rate: Optional[float] = None
 ) -> None:
-    """Log an API call with structured data"""
+    """Log an API call with structured data
+
+    ``sample_rate`` marks access logs written for only a fraction of
+    requests, so counts can be scaled back up downstream.
+    """
     extra = {
         'request_id': request_id,
         'path': path,
@@ -195,34 +296,36 @@ def log_api_call(
         'error': error,
         'stack_trace': stack_trace
     }
+    if sample_rate is not None:
+        extra['sample_rate'] = sample_rate
     
     if error:
         logger.error(f"API call failed: {error}", extra=extra)
     else:
         logger.info("API call completed", extra=extra)
 
-class JSONFormatter(logging.Formatter):
-    """Custom formatter for JSON structured logging"""
-    
-    def format(self, record: logging.LogRecord) -> str:
-        """Format the log record as JSON"""
-        log_data = {
-            'timestamp': datetime.utcnow().isoformat(),
-            'level': record.levelname,
-            'logger': record.name,
-            'message': record.getMessage(),
-            'request_id': getattr(record, 'request_id', None),
-            'user_id': getattr(record, 'user_id', None),
-            'path': getattr(record, 'path', None),
-            'method': getattr(record, 'method', None),
-            'status_code': getattr(record, 'status_code', None),
-            'duration': getattr(record, 'duration', None),
-            'error': getattr(record, 'error', None),
-            'stack_trace': getattr(record, 'stack_trace', None)
+class JSONFormatter(EnhancedStructuredLogFormatter):
+    """Custom formatter for JSON structured logging
+
+    Always emits the API call fields, null when absent, so every line of
+    the structured log has the same shape.
+    """
+
+    API_FIELDS = (
+        "request_id", "user_id", "path", "method", "status_code",
+        "duration", "error", "stack_trace",
+    )
+
+    def _base_entry(self, record: logging.LogRecord) -> Dict[str, Any]:
+        entry = {
+            "timestamp": self._timestamp(record.created),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
         }
-        
-        # Add extra fields if present
-        if hasattr(record, 'extra'):
-            log_data.update(record.extra)
-            
-        return json.dumps(log_data) 
\ No newline at end of file
+        for field in self.API_FIELDS:
+            entry[field] = getattr(record, field, None)
+        return entry
+
+# Initialize logging
+logger = setup_logging()
@@ -0,0 +1,181 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from starlette.types import Scope
+from .config import get_settings
+from .logging import get_logger
+from .metrics import metrics_registry
+
+logger = get_logger(__name__)
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+loop_lag = metrics_registry.histogram(
+    "event_loop_lag_seconds",
+    "Delay between when a loop callback was due and when it ran",
+    (),
+    buckets=LAG_BUCKETS,
+)
+loop_blocked = metrics_registry.histogram(
+    "event_loop_blocked_seconds",
+    "Loop stalls longer than the blocking threshold, by route being served",
+    ("route",),
+    buckets=LAG_BUCKETS,
+)
+
+
+class LoopMonitor:
+    """Event loop lag sampler with an optional blocking-call detector
+
+    A callback rescheduled every ``interval`` seconds records how late it
+    ran in ``event_loop_lag_seconds``. This is always cheap enough to run.
+
+    With ``detect_blocking``, a watchdog thread also checks the callback's
+    heartbeat. When it is more than ``block_threshold`` seconds overdue,
+    something is holding the loop: the watchdog captures the loop thread's
+    stack and the route of the request whose task is running. When the
+    loop recovers, the stall is recorded in ``event_loop_blocked_seconds``
+    and kept in ``reports``. The recorded duration is how long the
+    heartbeat was overdue, a lower bound on the stall of up to
+    ``interval``. Route attribution needs the middleware to register each
+    request's task with ``track_request``.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.25,
+        block_threshold: float = 0.1,
+        detect_blocking: bool = False,
+        max_reports: int = 100,
+        stack_limit: int = 30,
+    ):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.detect_blocking = detect_blocking
+        self.stack_limit = stack_limit
+        self.reports: Deque[Dict[str, Any]] = deque(maxlen=max_reports)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._expected = 0.0
+        self._beat = 0.0
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._requests: "weakref.WeakKeyDictionary[asyncio.Task, Scope]" = weakref.WeakKeyDictionary()
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """Start sampling on ``loop``, the running loop by default"""
+        if self._loop is not None:
+            return
+        self._loop = loop or asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._expected = self._beat + self.interval
+        self._handle = self._loop.call_later(self.interval, self._tick)
+        if self.detect_blocking:
+            self._stop_event.clear()
+            self._watchdog = threading.Thread(
+                target=self._watch, name="loop-watchdog", daemon=True
+            )
+            self._watchdog.start()
+            logger.info(
+                "Event loop blocking detection enabled",
+                extra={"threshold": self.block_threshold}
+            )
+
+    def stop(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._stop_event.set()
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+        self._loop = None
+
+    def track_request(self, scope: Scope) -> None:
+        """Associate the current task with a request for stall attribution"""
+        if self.detect_blocking:
+            task = asyncio.current_task()
+            if task is not None:
+                self._requests[task] = scope
+
+    def _tick(self):
+        now = time.monotonic()
+        loop_lag.observe((), max(now - self._expected, 0.0))
+        self._beat = now
+        self._expected = now + self.interval
+        if self._loop is not None:
+            self._handle = self._loop.call_later(self.interval, self._tick)
+
+    def _watch(self):
+        poll = self.block_threshold / 2
+        while not self._stop_event.wait(poll):
+            beat = self._beat
+            overdue = time.monotonic() - beat - self.interval
+            if overdue < self.block_threshold:
+                continue
+            report = self._capture()
+            # Wait for the loop to run the heartbeat again
+            while self._beat == beat and not self._stop_event.wait(poll):
+                pass
+            report["duration"] = self._beat - beat - self.interval
+            self._record(report)
+
+    def _capture(self) -> Dict[str, Any]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame, limit=self.stack_limit) if frame else []
+        task = asyncio.current_task(self._loop) if self._loop else None
+        scope = self._requests.get(task) if task is not None else None
+        route = None
+        if scope is not None:
+            matched = scope.get("route")
+            route = getattr(matched, "path_format", None) or getattr(matched, "path", None)
+        return {
+            "timestamp": time.time(),
+            "route": route or "<unmatched>",
+            "path": scope.get("path") if scope else None,
+            "task": task.get_name() if task is not None else None,
+            # format_stack lists the outermost frame first; the blocking
+            # call is at the end
+            "stack": "".join(stack),
+        }
+
+    def _record(self, report: Dict[str, Any]):
+        loop_blocked.observe((report["route"],), report["duration"])
+        self.reports.append(report)
+        logger.warning(
+            "Event loop blocked",
+            extra={
+                "duration": report["duration"],
+                "route": report["route"],
+                "path": report["path"],
+                "stack": report["stack"]
+            }
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "detect_blocking": self.detect_blocking,
+            "block_threshold": self.block_threshold,
+            "lag": loop_lag.snapshot().get((), {}),
+            "blocked_by_route": {
+                route: stats for (route,), stats in loop_blocked.snapshot().items()
+            },
+            "recent_blocks": list(self.reports),
+        }
+
+
+settings = get_settings()
+
+loop_monitor = LoopMonitor(
+    interval=settings.LOOP_LAG_INTERVAL,
+    block_threshold=settings.LOOP_BLOCK_THRESHOLD_MS / 1000,
+    detect_blocking=settings.LOOP_BLOCK_DETECTION,
+)
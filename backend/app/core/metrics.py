@@ -0,0 +1,259 @@
+import threading
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Upper bounds, in seconds, of the cumulative buckets exported to Prometheus
+DEFAULT_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+LabelValues = Tuple[str, ...]
+Labels = Sequence[Tuple[str, str]]
+# (name, type, help, [(name suffix, labels, value)])
+Sample = Tuple[str, str, str, List[Tuple[str, Labels, float]]]
+
+
+class HdrHistogram:
+    """Log-linear histogram of non-negative values, HDR style
+
+    Values are recorded as integers in ``unit`` (microseconds for
+    latencies). Below ``2 ** sub_bits`` every integer has its own bucket;
+    above, each power of two is split into ``2 ** (sub_bits - 1)`` buckets,
+    so any recorded value is known to within ``2 ** (1 - sub_bits)`` of
+    its true value (about 1.6% with the default 7 bits) across the whole
+    range. Buckets are kept sparsely, so idle ranges cost nothing.
+    """
+
+    __slots__ = ("unit", "sub_bits", "counts", "count", "total", "max")
+
+    def __init__(self, unit: float = 1e-6, sub_bits: int = 7):
+        self.unit = unit
+        self.sub_bits = sub_bits
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _index(self, value: int) -> int:
+        sub_count = 1 << self.sub_bits
+        if value < sub_count:
+            return value
+        shift = value.bit_length() - self.sub_bits
+        half = sub_count >> 1
+        return sub_count + (shift - 1) * half + (value >> shift) - half
+
+    def _upper_bound(self, index: int) -> int:
+        """Largest integer value stored in bucket ``index``"""
+        sub_count = 1 << self.sub_bits
+        if index < sub_count:
+            return index
+        half = sub_count >> 1
+        shift = (index - sub_count) // half + 1
+        mantissa = (index - sub_count) % half + half
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value: float):
+        scaled = int(value / self.unit) if value > 0 else 0
+        index = self._index(scaled)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def _sorted_buckets(self) -> List[Tuple[float, int]]:
+        return [
+            (self._upper_bound(index) * self.unit, self.counts[index])
+            for index in sorted(self.counts)
+        ]
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q`` quantile"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in self._sorted_buckets():
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def cumulative(self, bounds: Sequence[float]) -> List[int]:
+        """Counts of values at or below each of ``bounds``, which must be sorted"""
+        result = []
+        buckets = self._sorted_buckets()
+        seen = 0
+        position = 0
+        for bound in bounds:
+            while position < len(buckets) and buckets[position][0] <= bound:
+                seen += buckets[position][1]
+                position += 1
+            result.append(seen)
+        return result
+
+
+class HistogramFamily:
+    """HDR histograms for each combination of label values"""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str],
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, HdrHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values: LabelValues, value: float):
+        histogram = self._series.get(label_values)
+        if histogram is None:
+            with self._lock:
+                histogram = self._series.setdefault(label_values, HdrHistogram())
+        histogram.record(value)
+
+    def snapshot(self) -> Dict[LabelValues, Dict[str, float]]:
+        """Count, sum and quantiles per series, for JSON consumers"""
+        return {
+            label_values: {
+                "count": histogram.count,
+                "sum": histogram.total,
+                "max": histogram.max,
+                **{f"p{int(q * 100)}": histogram.quantile(q) for q in QUANTILES},
+            }
+            for label_values, histogram in list(self._series.items())
+        }
+
+    def collect(self) -> Iterable[Sample]:
+        bucket_samples = []
+        quantile_samples = []
+        for label_values, histogram in list(self._series.items()):
+            pairs = list(zip(self.labels, label_values))
+            for bound, count in zip(self.buckets, histogram.cumulative(self.buckets)):
+                bucket_samples.append(("_bucket", [*pairs, ("le", _format_value(bound))], count))
+            bucket_samples.append(("_bucket", [*pairs, ("le", "+Inf")], histogram.count))
+            bucket_samples.append(("_sum", pairs, histogram.total))
+            bucket_samples.append(("_count", pairs, histogram.count))
+            for q in QUANTILES:
+                quantile_samples.append(("", [*pairs, ("quantile", str(q))], histogram.quantile(q)))
+
+        yield (self.name, "histogram", self.help, bucket_samples)
+        yield (
+            f"{self.name}_quantile",
+            "gauge",
+            f"{self.help} (quantiles from the in-process HDR histogram)",
+            quantile_samples,
+        )
+
+
+class CounterFamily:
+    """Monotonic counters for each combination of label values"""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values: LabelValues = (), amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def collect(self) -> Iterable[Sample]:
+        yield (self.name, "counter", self.help, [
+            ("", list(zip(self.labels, label_values)), value)
+            for label_values, value in list(self._values.items())
+        ])
+
+
+class MetricsRegistry:
+    """Process-wide metrics rendered in the Prometheus text format
+
+    Histogram and counter families are updated inline. Values that already
+    live elsewhere (pool sizes, queue depths) are read at scrape time by
+    collector callbacks returning ``(name, type, help, samples)`` tuples,
+    so modules that are never imported add nothing.
+    """
+
+    def __init__(self):
+        self._families: Dict[str, object] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help: str, labels: Sequence[str], **kwargs) -> HistogramFamily:
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = HistogramFamily(name, help, labels, **kwargs)
+            return family
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> CounterFamily:
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = CounterFamily(name, help, labels)
+            return family
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        sources: List[Callable[[], Iterable[Sample]]] = [
+            family.collect for family in list(self._families.values())
+        ] + list(self._collectors)
+        for source in sources:
+            for name, metric_type, help, samples in source():
+                lines.append(f"# HELP {name} {_escape_help(help)}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for suffix, labels, value in samples:
+                    lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def status_class(status_code: int) -> str:
+    return f"{status_code // 100}xx"
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(str(value))}"' for key, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+# Shared registry served on /metrics
+metrics_registry = MetricsRegistry()
+
+http_request_duration = metrics_registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status class",
+    ("method", "route", "status"),
+)
+cache_requests = metrics_registry.counter(
+    "cache_requests_total",
+    "Cache lookups by result",
+    ("result",),
+)
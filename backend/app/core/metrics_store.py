@@ -0,0 +1,251 @@
+import math
+import struct
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence
+
+NAN = float("nan")
+
+
+@dataclass(frozen=True)
+class Resolution:
+    name: str
+    seconds: int  # 0 for raw samples
+    file_period: str  # strftime format of the period each file covers
+    retention: int  # seconds
+
+
+RAW = Resolution("raw", 0, "%Y%m%d", 2 * 86400)
+MINUTE = Resolution("1m", 60, "%Y%m%d", 30 * 86400)
+HOUR = Resolution("1h", 3600, "%Y%m", 365 * 86400)
+RESOLUTIONS = (RAW, MINUTE, HOUR)
+
+
+def flatten(metrics: Mapping[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves of a nested metrics dict keyed by dotted path"""
+    flat: Dict[str, float] = {}
+    for key, value in metrics.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, Mapping):
+            flat.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = float(value)
+    return flat
+
+
+class _Rollup:
+    """Running count, sum, min and max of every field for one period"""
+
+    __slots__ = ("start", "count", "counts", "sums", "mins", "maxs")
+
+    def __init__(self, start: float, width: int):
+        self.start = start
+        self.count = 0
+        self.counts = [0] * width  # non-NaN samples per field
+        self.sums = [0.0] * width
+        self.mins = [math.inf] * width
+        self.maxs = [-math.inf] * width
+
+    def add(self, values: Sequence[float], count: int = 1, mins=None, maxs=None):
+        mins = values if mins is None else mins
+        maxs = values if maxs is None else maxs
+        self.count += count
+        for i, value in enumerate(values):
+            if math.isnan(value):
+                continue
+            self.counts[i] += count
+            self.sums[i] += value * count
+            if mins[i] < self.mins[i]:
+                self.mins[i] = mins[i]
+            if maxs[i] > self.maxs[i]:
+                self.maxs[i] = maxs[i]
+
+    def values(self) -> List[float]:
+        out: List[float] = []
+        for count, total, low, high in zip(self.counts, self.sums, self.mins, self.maxs):
+            if count == 0:
+                out.extend((NAN, NAN, NAN))
+            else:
+                out.extend((total / count, low, high))
+        return out
+
+
+class MetricsStore:
+    """Append-only time series of fixed-width binary records
+
+    Each sample is written as one little-endian record of the timestamp
+    followed by a float64 per field, so appends never rewrite earlier data
+    and a time range is found by binary search on the record index. Samples
+    are rolled up on the fly into 1-minute and 1-hour records holding the
+    mean, min and max of each field; each resolution has its own files and
+    retention. Missing fields are stored as NaN.
+
+    ``fields`` fixes the record layout. ``version`` is part of the file
+    names; bump it when the fields change so new files are started instead
+    of old ones being misread.
+    """
+
+    def __init__(self, metrics_dir: Path, fields: Sequence[str], version: int = 1):
+        self.metrics_dir = Path(metrics_dir)
+        self.metrics_dir.mkdir(parents=True, exist_ok=True)
+        self.fields = tuple(fields)
+        self.version = version
+        width = len(self.fields)
+        self._raw_format = struct.Struct(f"<d{width}d")
+        self._rollup_format = struct.Struct(f"<dI{3 * width}d")
+        self._minute: Optional[_Rollup] = None
+        self._hour: Optional[_Rollup] = None
+        self._resume()
+
+    def _record_format(self, resolution: Resolution) -> struct.Struct:
+        return self._raw_format if resolution is RAW else self._rollup_format
+
+    def _path(self, resolution: Resolution, ts: float) -> Path:
+        period = time.strftime(resolution.file_period, time.gmtime(ts))
+        return self.metrics_dir / f"metrics_v{self.version}_{resolution.name}_{period}.bin"
+
+    def _append(self, resolution: Resolution, ts: float, payload: bytes):
+        with open(self._path(resolution, ts), "ab") as f:
+            f.write(payload)
+
+    def append(self, metrics: Mapping[str, Any], ts: Optional[float] = None):
+        """Write one sample and update the rollups"""
+        ts = time.time() if ts is None else ts
+        flat = flatten(metrics)
+        values = [flat.get(field, NAN) for field in self.fields]
+        self._append(RAW, ts, self._raw_format.pack(ts, *values))
+        self._add_sample(ts, values)
+
+    def _add_sample(self, ts: float, values: Sequence[float]):
+        minute_start = ts - ts % MINUTE.seconds
+        if self._minute is not None and self._minute.start != minute_start:
+            self._close_minute()
+        if self._minute is None:
+            self._minute = _Rollup(minute_start, len(self.fields))
+        self._minute.add(values)
+
+    def _close_minute(self):
+        minute = self._minute
+        self._minute = None
+        packed = minute.values()
+        self._append(MINUTE, minute.start, self._rollup_format.pack(minute.start, minute.count, *packed))
+        self._add_minute(minute.start, minute.count, packed)
+
+    def _add_minute(self, minute_start: float, count: int, packed: Sequence[float]):
+        hour_start = minute_start - minute_start % HOUR.seconds
+        if self._hour is not None and self._hour.start != hour_start:
+            hour = self._hour
+            self._append(HOUR, hour.start, self._rollup_format.pack(hour.start, hour.count, *hour.values()))
+            self._hour = None
+            self._cleanup()
+        if self._hour is None:
+            self._hour = _Rollup(hour_start, len(self.fields))
+        self._hour.add(packed[0::3], count, packed[1::3], packed[2::3])
+
+    def _resume(self):
+        """Rebuild the rollups in progress when the process last stopped
+
+        Minute records since the last hour record are replayed into the
+        hour rollup, then raw samples since the last minute record into
+        the minute rollup. Minutes and hours that never got their record
+        are written as the replay, or the next sample, crosses their end.
+        Only the raw retention window is looked at.
+        """
+        now = time.time()
+        since = now - RAW.retention
+        last_hour = None
+        for record in self._read(HOUR, since, now):
+            last_hour = record[0]
+        replay_from = since - since % HOUR.seconds if last_hour is None else last_hour + HOUR.seconds
+
+        for record in self._read(MINUTE, replay_from, now):
+            self._add_minute(record[0], record[1], record[2:])
+            replay_from = record[0] + MINUTE.seconds
+        for record in self._read(RAW, replay_from, now):
+            self._add_sample(record[0], record[1:])
+
+    def _cleanup(self):
+        now = time.time()
+        for resolution in RESOLUTIONS:
+            cutoff = time.strftime(resolution.file_period, time.gmtime(now - resolution.retention))
+            for path in self.metrics_dir.glob(f"metrics_v{self.version}_{resolution.name}_*.bin"):
+                if path.stem.rsplit("_", 1)[-1] < cutoff:
+                    path.unlink(missing_ok=True)
+
+    def _files(self, resolution: Resolution, start: float, end: float) -> List[Path]:
+        first = time.strftime(resolution.file_period, time.gmtime(start))
+        last = time.strftime(resolution.file_period, time.gmtime(end))
+        paths = []
+        for path in self.metrics_dir.glob(f"metrics_v{self.version}_{resolution.name}_*.bin"):
+            if first <= path.stem.rsplit("_", 1)[-1] <= last:
+                paths.append(path)
+        return sorted(paths)
+
+    def _read(self, resolution: Resolution, start: float, end: float) -> Iterator[tuple]:
+        record = self._record_format(resolution)
+        for path in self._files(resolution, start, end):
+            with open(path, "rb") as f:
+                # A trailing partial record is an append in progress
+                count = f.seek(0, 2) // record.size
+
+                def ts_at(index: int) -> float:
+                    f.seek(index * record.size)
+                    return struct.unpack("<d", f.read(8))[0]
+
+                low, high = 0, count
+                while low < high:
+                    mid = (low + high) // 2
+                    if ts_at(mid) < start:
+                        low = mid + 1
+                    else:
+                        high = mid
+                f.seek(low * record.size)
+                for _ in range(low, count):
+                    values = record.unpack(f.read(record.size))
+                    if values[0] > end:
+                        break
+                    yield values
+
+    def query(
+        self,
+        hours: float = 1,
+        resolution: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Samples for the last ``hours``, oldest first
+
+        ``resolution`` is "raw", "1m" or "1h"; by default raw samples are
+        used up to 1 hour, minute rollups up to 2 days and hourly beyond.
+        Rollup entries carry ``count`` and ``<field>``/``<field>.min``/
+        ``<field>.max``. NaN values are returned as None.
+        """
+        if resolution is None:
+            chosen = RAW if hours <= 1 else MINUTE if hours <= 48 else HOUR
+        else:
+            chosen = next((r for r in RESOLUTIONS if r.name == resolution), None)
+            if chosen is None:
+                raise ValueError(f"Unknown resolution: {resolution}")
+
+        wanted = [self.fields.index(field) for field in fields] if fields else range(len(self.fields))
+        end = time.time()
+        results = []
+        for record in self._read(chosen, end - hours * 3600, end):
+            entry: Dict[str, Any] = {"timestamp": record[0]}
+            if chosen is RAW:
+                for i in wanted:
+                    entry[self.fields[i]] = _clean(record[1 + i])
+            else:
+                entry["count"] = record[1]
+                for i in wanted:
+                    name = self.fields[i]
+                    base = 2 + 3 * i
+                    entry[name] = _clean(record[base])
+                    entry[f"{name}.min"] = _clean(record[base + 1])
+                    entry[f"{name}.max"] = _clean(record[base + 2])
+            results.append(entry)
+        return results
+
+
+def _clean(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
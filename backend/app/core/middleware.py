@@ -1,143 +1,272 @@
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from collections import Counter
 from datetime import datetime
+import random
 import time
-from typing import Callable
+import traceback
+from typing import TYPE_CHECKING, Dict, Optional
 from .audit import audit_trail, AuditEvent
+from .context import request_id_var, request_queries_var
 from .logging import get_logger, log_api_call
+from .loop_monitor import loop_monitor
+from .metrics import http_request_duration, status_class
+from .monitoring import database_monitor
 import uuid
 
+if TYPE_CHECKING:
+    from .security import SecurityMonitor
+
 logger = get_logger(__name__)
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware to log API requests and responses"""
-    
+REQUEST_ID_HEADER = "X-Request-ID"
+
+
+class RequestContextMiddleware:
+    """Pure ASGI middleware handling request context in a single pass
+
+    Replaces the former LoggingMiddleware/RequestIDMiddleware/SecurityMiddleware
+    chain. Per request it:
+    - propagates the request ID (incoming ``X-Request-ID`` or a new one)
+      through ``request.state``, a contextvar and the response headers
+    - runs IP block, rate limit and signature checks when a
+      ``SecurityMonitor`` is given
+    - times the request, records it in the per-route latency histogram
+      and writes the access log and audit event
+
+    Access logs for successful requests are sampled per route: the
+    longest matching prefix in ``sample_rates`` gives the fraction kept,
+    ``default_sample_rate`` otherwise. Failed requests are always logged.
+
+    Unlike ``BaseHTTPMiddleware`` it does not spawn a task or wrap the
+    response body stream, so streaming responses pass through untouched.
+    """
+
     def __init__(
         self,
         app: ASGIApp,
         *,
+        security_monitor: Optional["SecurityMonitor"] = None,
         exclude_paths: list[str] = None,
-        exclude_methods: list[str] = None
+        exclude_methods: list[str] = None,
+        sample_rates: Optional[Dict[str, float]] = None,
+        default_sample_rate: float = 1.0
     ):
-        super().__init__(app)
-        self.exclude_paths = exclude_paths or []
-        self.exclude_methods = exclude_methods or []
-        
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        # Skip logging for excluded paths/methods
+        self.app = app
+        self.security_monitor = security_monitor
+        self.exclude_paths = set(exclude_paths or [])
+        self.exclude_methods = set(exclude_methods or [])
+        self.default_sample_rate = default_sample_rate
+        self._sample_rates = sorted(
+            (sample_rates or {}).items(), key=lambda item: len(item[0]), reverse=True
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get(REQUEST_ID_HEADER) or str(uuid.uuid4())
+        scope.setdefault("state", {})["request_id"] = request_id
+        token = request_id_var.set(request_id)
+        loop_monitor.track_request(scope)
+        queries: Counter = Counter()
+        queries_token = request_queries_var.set(queries)
+        try:
+            await self._handle(scope, receive, send, request_id)
+        finally:
+            request_queries_var.reset(queries_token)
+            request_id_var.reset(token)
+        if queries:
+            database_monitor.check_request(self._route_template(scope), queries)
+
+    async def _handle(self, scope: Scope, receive: Receive, send: Send, request_id: str) -> None:
+        request = Request(scope)
+        client_ip = scope["client"][0] if scope.get("client") else None
+
+        if self.security_monitor is not None and client_ip:
+            rejection = await self._check_security(request, client_ip)
+            if rejection is not None:
+                await rejection(scope, receive, send)
+                return
+
         if (
-            request.url.path in self.exclude_paths
-            or request.method in self.exclude_methods
+            scope["path"] in self.exclude_paths
+            or scope["method"] in self.exclude_methods
         ):
-            return await call_next(request)
-            
-        # Get user ID if authenticated
-        user_id = None
-        if hasattr(request.state, "user"):
-            user_id = request.state.user.id
-        
-        # Start timer
-        start_time = time.time()
-        
-        # Get request details
-        request_id = request.headers.get("X-Request-ID", "unknown")
-        client_ip = request.client.host if request.client else "unknown"
-        
-        # Log request
-        logger.info(
-            f"Request: {request.method} {request.url.path}",
+            await self.app(scope, receive, self._with_request_id(send, request_id))
+            return
+
+        client_ip = client_ip or "unknown"
+        path = scope["path"]
+        method = scope["method"]
+
+        # Log request; headers and query strings are left out, they may
+        # carry credentials and dominate log volume
+        logger.debug(
+            f"Request: {method} {path}",
             extra={
                 "request_id": request_id,
                 "client_ip": client_ip,
-                "user_id": user_id,
-                "method": request.method,
-                "path": request.url.path,
-                "query_params": dict(request.query_params),
-                "headers": dict(request.headers)
+                "method": method,
+                "path": path
             }
         )
-        
-        # Process request
+
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = request_id
+            await send(message)
+
+        start_time = time.perf_counter()
         try:
-            response = await call_next(request)
-            duration = time.time() - start_time
-            
-            # Log successful request
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            duration = time.perf_counter() - start_time
+            user_id = self._user_id(scope)
+            self._observe(scope, method, 500, duration)
+
+            # Log failed request
             log_api_call(
                 logger=logger,
                 request_id=request_id,
-                path=request.url.path,
-                method=request.method,
+                path=path,
+                method=method,
                 user_id=user_id,
-                status_code=response.status_code,
-                duration=duration
-            )
-            
-            # Log audit event
-            audit_trail.log_event(
-                AuditEvent(
-                    timestamp=datetime.now(),
-                    event_type="api_request",
-                    user_id=user_id,
-                    action=f"{request.method} {request.url.path}",
-                    details={
-                        "request_id": request_id,
-                        "client_ip": client_ip,
-                        "status_code": response.status_code,
-                        "duration": duration
-                    },
-                    ip_address=client_ip,
-                    status="success" if response.status_code < 400 else "error"
-                )
+                duration=duration,
+                error=str(e),
+                stack_trace=traceback.format_exc()
             )
-            
-            return response
-        except Exception as e:
-            duration = time.time() - start_time
-            
-            # Log failed request
+            self._audit(request_id, method, path, user_id, client_ip, 500, duration, "error")
+            raise
+
+        duration = time.perf_counter() - start_time
+        user_id = self._user_id(scope)
+        self._observe(scope, method, status_code, duration)
+
+        # Log completed request, sampling successes
+        sample_rate = 1.0 if status_code >= 400 else self._sample_rate(path)
+        if sample_rate >= 1.0 or random.random() < sample_rate:
             log_api_call(
                 logger=logger,
                 request_id=request_id,
-                path=request.url.path,
-                method=request.method,
+                path=path,
+                method=method,
                 user_id=user_id,
+                status_code=status_code,
                 duration=duration,
-                error=str(e),
-                stack_trace=str(e.__traceback__)
+                sample_rate=sample_rate if sample_rate < 1.0 else None
             )
-            
-            # Log audit event
-            audit_trail.log_event(
-                AuditEvent(
-                    timestamp=datetime.now(),
-                    event_type="api_request",
-                    user_id=user_id,
-                    action=f"{request.method} {request.url.path}",
-                    details={
-                        "request_id": request_id,
-                        "client_ip": client_ip,
-                        "status_code": response.status_code,
-                        "duration": duration
-                    },
-                    ip_address=client_ip,
-                    status="error"
-                )
+        self._audit(
+            request_id, method, path, user_id, client_ip, status_code, duration,
+            "success" if status_code < 400 else "error"
+        )
+
+    def _sample_rate(self, path: str) -> float:
+        for prefix, rate in self._sample_rates:
+            if path.startswith(prefix):
+                return rate
+        return self.default_sample_rate
+
+    async def _check_security(self, request: Request, client_ip: str) -> Optional[JSONResponse]:
+        """Run security checks, returning a response if the request is rejected"""
+        monitor = self.security_monitor
+
+        # Check if IP is blocked
+        if await monitor.check_ip_block(client_ip):
+            return JSONResponse(
+                status_code=403,
+                content={"detail": "IP address blocked due to suspicious activity"},
+                headers={REQUEST_ID_HEADER: request.state.request_id},
             )
-            
-            raise
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    """Middleware to add a unique request ID to each request"""
-    
-    async def dispatch(
-        self, request: Request, call_next: Callable
-    ) -> Response:
-        request_id = str(uuid.uuid4())
-        request.state.request_id = request_id
-        
-        response = await call_next(request)
-        response.headers["X-Request-ID"] = request_id
-        
-        return response 
\ No newline at end of file
+        # Check rate limit
+        if not await monitor.check_rate_limit(client_ip):
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests"},
+                headers={REQUEST_ID_HEADER: request.state.request_id},
+            )
+
+        # Check for suspicious activity
+        matched_rules = monitor.inspect_request(request)
+        if matched_rules:
+            monitor.log_security_event(
+                "suspicious_request",
+                {
+                    "ip": client_ip,
+                    "path": request.url.path,
+                    "method": request.method,
+                    "rules": [rule.id for rule in matched_rules],
+                    "severities": sorted({rule.severity for rule in matched_rules}),
+                    "headers": dict(request.headers)
+                }
+            )
+        return None
+
+    @staticmethod
+    def _with_request_id(send: Send, request_id: str) -> Send:
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = request_id
+            await send(message)
+
+        return send_wrapper
+
+    @staticmethod
+    def _observe(scope: Scope, method: str, status_code: int, duration: float) -> None:
+        http_request_duration.observe(
+            (method, RequestContextMiddleware._route_template(scope), status_class(status_code)),
+            duration
+        )
+
+    @staticmethod
+    def _route_template(scope: Scope) -> str:
+        # The router stores the matched route in the scope; using its
+        # template keeps one series per endpoint rather than per URL
+        route = scope.get("route")
+        template = getattr(route, "path_format", None) or getattr(route, "path", None)
+        return template or "<unmatched>"
+
+    @staticmethod
+    def _user_id(scope: Scope) -> Optional[str]:
+        # Set on request.state by auth dependencies while the request ran
+        state = scope.get("state", {})
+        user = state.get("user")
+        if user is not None:
+            return getattr(user, "id", None)
+        return state.get("user_id")
+
+    @staticmethod
+    def _audit(
+        request_id: str,
+        method: str,
+        path: str,
+        user_id: Optional[str],
+        client_ip: str,
+        status_code: int,
+        duration: float,
+        status: str,
+    ) -> None:
+        audit_trail.log_event(
+            AuditEvent(
+                timestamp=datetime.now(),
+                event_type="api_request",
+                user_id=user_id,
+                action=f"{method} {path}",
+                details={
+                    "request_id": request_id,
+                    "client_ip": client_ip,
+                    "status_code": status_code,
+                    "duration": duration
+                },
+                ip_address=client_ip,
+                status=status
+            )
+        )
@@ -1,26 +1,71 @@
-import psutil
+import re
 import time
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
+from .config import get_settings
+from .context import request_queries_var
+from .counters import SlidingWindowCounter, ThresholdTracker
 from .logging import get_logger, get_audit_logger
+from .metrics import HdrHistogram, metrics_registry
+from .metrics_store import MetricsStore
+from .system_metrics import SystemMetricsCollector
 import threading
 from datetime import datetime
-import json
+from functools import lru_cache
 from pathlib import Path
-from collections import defaultdict
+from collections import Counter, OrderedDict, deque
 
 logger = get_logger(__name__)
 audit_logger = get_audit_logger()
 
+# Record layout of the metrics time series, as dotted paths into the
+# dict built by PerformanceMonitor._collect_metrics
+METRIC_FIELDS = (
+    "cpu.percent",
+    "cpu.process_percent",
+    "memory.available",
+    "memory.percent",
+    "memory.process_memory",
+    "disk.free",
+    "disk.percent",
+    "network.connections",
+    "network.io_counters.bytes_sent",
+    "network.io_counters.bytes_recv",
+    "errors.total",
+)
+
 class PerformanceMonitor:
-    """Monitor system and application performance"""
+    """Monitor system and application performance
+
+    Errors are counted in bucketed sliding windows per type (one hour for
+    the alert threshold, a day for reporting) and only the latest
+    ``max_error_samples`` are kept, so memory does not grow with the error
+    rate and stats cost O(buckets) per type.
+    """
     
-    def __init__(self, interval: int = 60):
+    def __init__(
+        self,
+        interval: int = 5,
+        max_error_samples: int = 100,
+        error_rate_threshold: int = 100,
+        error_pattern_threshold: int = 10,
+        collector: Optional[SystemMetricsCollector] = None
+    ):
         self.interval = interval
+        self.collector = collector or SystemMetricsCollector()
         self.metrics_dir = Path("metrics")
         self.metrics_dir.mkdir(exist_ok=True)
+        self.store = MetricsStore(self.metrics_dir, METRIC_FIELDS)
         self._stop_event = threading.Event()
         self._monitor_thread = None
-        self.error_metrics = defaultdict(list)
+        self.error_rate_threshold = error_rate_threshold
+        self.hourly_errors: Dict[str, SlidingWindowCounter] = {}
+        self.daily_errors: Dict[str, SlidingWindowCounter] = {}
+        self.recent_errors: deque = deque(maxlen=max_error_samples)
+        # Fires once when a single path passes the threshold within a day
+        self.error_patterns = ThresholdTracker(
+            86400, error_pattern_threshold, buckets=24, max_keys=1000
+        )
+        self._error_lock = threading.Lock()
         
     def start(self):
         """Start the monitoring thread"""
@@ -46,62 +91,42 @@ class PerformanceMonitor:
                 metrics = self._collect_metrics()
                 self._save_metrics(metrics)
                 self._check_thresholds(metrics)
-                self._analyze_error_metrics()
             except Exception as e:
                 logger.exception("Error in monitoring loop")
-            time.sleep(self.interval)
+            self._stop_event.wait(self.interval)
             
     def _collect_metrics(self) -> Dict[str, Any]:
         """Collect system and application metrics"""
-        process = psutil.Process()
-        
         return {
             "timestamp": datetime.utcnow().isoformat(),
-            "cpu": {
-                "percent": psutil.cpu_percent(),
-                "count": psutil.cpu_count(),
-                "process_percent": process.cpu_percent()
-            },
-            "memory": {
-                "total": psutil.virtual_memory().total,
-                "available": psutil.virtual_memory().available,
-                "percent": psutil.virtual_memory().percent,
-                "process_memory": process.memory_info().rss
-            },
-            "disk": {
-                "total": psutil.disk_usage('/').total,
-                "used": psutil.disk_usage('/').used,
-                "free": psutil.disk_usage('/').free,
-                "percent": psutil.disk_usage('/').percent
-            },
-            "network": {
-                "connections": len(psutil.net_connections()),
-                "io_counters": psutil.net_io_counters()._asdict()
-            },
-            "errors": {
-                "total": sum(len(errors) for errors in self.error_metrics.values()),
-                "by_type": {error_type: len(errors) for error_type, errors in self.error_metrics.items()}
-            }
+            **self.collector.collect(),
+            "errors": self.get_error_counts()
         }
+
+    def get_error_counts(self) -> Dict[str, Any]:
+        """Errors seen in the last 24 hours, in total and by type"""
+        with self._error_lock:
+            by_type = {
+                error_type: counter.value()
+                for error_type, counter in self.daily_errors.items()
+            }
+        return {"total": sum(by_type.values()), "by_type": by_type}
         
     def _save_metrics(self, metrics: Dict[str, Any]):
-        """Save metrics to file"""
-        date_str = datetime.utcnow().strftime("%Y-%m-%d")
-        metrics_file = self.metrics_dir / f"metrics_{date_str}.json"
-        
+        """Append metrics to the time-series store"""
         try:
-            if metrics_file.exists():
-                with open(metrics_file, 'r') as f:
-                    existing_metrics = json.load(f)
-            else:
-                existing_metrics = []
-                
-            existing_metrics.append(metrics)
-            
-            with open(metrics_file, 'w') as f:
-                json.dump(existing_metrics, f, indent=2)
+            self.store.append(metrics)
         except Exception as e:
             logger.exception("Error saving metrics")
+
+    def get_metrics_history(
+        self,
+        hours: float = 1,
+        resolution: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Get stored metrics for the last ``hours``"""
+        return self.store.query(hours, resolution, fields)
             
     def _check_thresholds(self, metrics: Dict[str, Any]):
         """Check metrics against thresholds and alert if necessary"""
@@ -109,7 +134,7 @@ class PerformanceMonitor:
             "cpu_percent": 80,
             "memory_percent": 80,
             "disk_percent": 80,
-            "error_rate": 100  # errors per hour
+            "error_rate": self.error_rate_threshold  # errors per hour
         }
         
         if metrics["cpu"]["percent"] > thresholds["cpu_percent"]:
@@ -140,78 +165,189 @@ class PerformanceMonitor:
             )
             
         # Check error rates
-        for error_type, errors in self.error_metrics.items():
-            recent_errors = [
-                error for error in errors
-                if (datetime.utcnow() - error["timestamp"]).total_seconds() < 3600
-            ]
-            if len(recent_errors) > thresholds["error_rate"]:
+        with self._error_lock:
+            hourly = {
+                error_type: counter.value()
+                for error_type, counter in self.hourly_errors.items()
+            }
+        for error_type, count in hourly.items():
+            if count > thresholds["error_rate"]:
                 logger.warning(
                     f"High error rate for {error_type}",
                     extra={
-                        "current": len(recent_errors),
+                        "current": count,
                         "threshold": thresholds["error_rate"]
                     }
                 )
-                
-    def _analyze_error_metrics(self):
-        """Analyze error metrics for patterns and trends"""
-        for error_type, errors in self.error_metrics.items():
-            # Remove errors older than 24 hours
-            self.error_metrics[error_type] = [
-                error for error in errors
-                if (datetime.utcnow() - error["timestamp"]).total_seconds() < 86400
-            ]
-            
-            # Analyze error patterns
-            if len(errors) > 0:
-                error_paths = defaultdict(int)
-                error_methods = defaultdict(int)
-                error_users = defaultdict(int)
-                
-                for error in errors:
-                    error_paths[error["path"]] += 1
-                    error_methods[error["method"]] += 1
-                    if error.get("user_id"):
-                        error_users[error["user_id"]] += 1
-                        
-                # Log patterns if significant
-                if max(error_paths.values()) > 10:
-                    logger.warning(
-                        f"Error pattern detected for {error_type}",
-                        extra={
-                            "most_common_path": max(error_paths.items(), key=lambda x: x[1]),
-                            "most_common_method": max(error_methods.items(), key=lambda x: x[1]),
-                            "affected_users": len(error_users)
-                        }
-                    )
                     
     def log_error(self, error_type: str, error_id: str, path: str, method: str):
         """Log an error occurrence for monitoring"""
-        self.error_metrics[error_type].append({
-            "error_id": error_id,
-            "timestamp": datetime.utcnow(),
-            "path": path,
-            "method": method
-        })
+        now = time.time()
+        with self._error_lock:
+            if error_type not in self.hourly_errors:
+                self.hourly_errors[error_type] = SlidingWindowCounter(3600, now=now)
+                self.daily_errors[error_type] = SlidingWindowCounter(86400, buckets=24, now=now)
+            self.hourly_errors[error_type].add(now=now)
+            self.daily_errors[error_type].add(now=now)
+            self.recent_errors.append({
+                "error_id": error_id,
+                "error_type": error_type,
+                "timestamp": datetime.utcnow(),
+                "path": path,
+                "method": method
+            })
+            pattern_count = self.error_patterns.record((error_type, method, path), now)
+
+        if pattern_count is not None:
+            logger.warning(
+                f"Error pattern detected for {error_type}",
+                extra={
+                    "path": path,
+                    "method": method,
+                    "count": pattern_count,
+                    "window": "24h"
+                }
+            )
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"\bVALUES\s*(\(\s*[^()]*\))(?:\s*,\s*\([^()]*\))*", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(statement: str) -> str:
+    """Normalize a SQL statement so queries differing only in literals match
+
+    String and numeric literals become ``?``, ``IN`` lists and multi-row
+    ``VALUES`` collapse to one entry, and whitespace is squeezed. Bound
+    parameter placeholders are already stable and are kept.
+    """
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _NUMBER_LITERAL.sub("?", normalized)
+    normalized = _IN_LIST.sub("IN (?+)", normalized)
+    normalized = _VALUES_LIST.sub(r"VALUES \1", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+class QueryStats:
+    """Aggregate timings of one query fingerprint"""
+
+    __slots__ = ("fingerprint", "count", "total", "max", "histogram", "errors")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = HdrHistogram()
+        self.errors = 0
+
+    def record(self, duration: float):
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        self.histogram.record(duration)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "fingerprint": self.fingerprint,
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "p95": self.histogram.quantile(0.95),
+            "p99": self.histogram.quantile(0.99),
+            "errors": self.errors,
+        }
+
 
 class DatabaseMonitor:
-    """Monitor database performance"""
+    """Monitor database performance
+
+    ``instrument`` hooks an SQLAlchemy engine so every statement is timed
+    and aggregated by fingerprint in a table of at most ``max_fingerprints``
+    entries, least recently used first out. Queries are also counted per
+    request in ``request_queries_var``; ``check_request`` reports a SELECT
+    fingerprint run ``n_plus_one_threshold`` or more times in one request
+    as a likely N+1 pattern, keeping counts for at most
+    ``max_n_plus_one`` route/fingerprint pairs, least recently flagged
+    first out.
+    """
     
-    def __init__(self):
-        self.query_times: Dict[str, float] = {}
-        self.slow_query_threshold = 1.0  # seconds
-        self.error_queries: List[Dict[str, Any]] = []
+    def __init__(
+        self,
+        max_fingerprints: int = 1000,
+        slow_query_threshold: float = 1.0,
+        n_plus_one_threshold: int = 10,
+        max_n_plus_one: int = 1000
+    ):
+        self.max_fingerprints = max_fingerprints
+        self.slow_query_threshold = slow_query_threshold  # seconds
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.max_n_plus_one = max_n_plus_one
+        self.query_stats: "OrderedDict[str, QueryStats]" = OrderedDict()
+        self.error_queries: deque = deque(maxlen=1000)
+        # (route, fingerprint) -> requests where it looked like N+1
+        self.n_plus_one: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        # Monotonic totals for /metrics; eviction from the tables above
+        # never lowers them
+        self.queries_total = 0
+        self.n_plus_one_totals: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def instrument(self, engine):
+        """Attach timing hooks to an SQLAlchemy engine"""
+        from sqlalchemy import event
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info["query_start"].pop()
+            self.log_query(statement, time.perf_counter() - started)
+
+        @event.listens_for(engine, "handle_error")
+        def _error(exception_context):
+            starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+            if starts:
+                starts.pop()
+            self.log_query_error(
+                exception_context.statement or "",
+                str(exception_context.original_exception),
+                ""
+            )
+
+    def _stats(self, key: str) -> QueryStats:
+        stats = self.query_stats.get(key)
+        if stats is None:
+            stats = self.query_stats[key] = QueryStats(key)
+            if len(self.query_stats) > self.max_fingerprints:
+                self.query_stats.popitem(last=False)
+        else:
+            self.query_stats.move_to_end(key)
+        return stats
         
     def log_query(self, query: str, duration: float):
         """Log database query performance"""
-        self.query_times[query] = duration
+        key = fingerprint(query)
+        with self._lock:
+            self._stats(key).record(duration)
+            self.queries_total += 1
+
+        request_queries = request_queries_var.get()
+        if request_queries is not None:
+            request_queries[key] += 1
         
         if duration > self.slow_query_threshold:
             logger.warning(
                 "Slow database query",
                 extra={
-                    "query": query,
+                    "query": key,
                     "duration": duration,
                     "threshold": self.slow_query_threshold
                 }
@@ -219,29 +355,80 @@ class DatabaseMonitor:
             
     def log_query_error(self, query: str, error: str, stack_trace: str):
         """Log database query errors"""
+        key = fingerprint(query)
+        with self._lock:
+            self._stats(key).errors += 1
         self.error_queries.append({
             "timestamp": datetime.utcnow(),
-            "query": query,
+            "query": key,
             "error": error,
             "stack_trace": stack_trace
         })
-        
-        # Keep only last 1000 errors
-        if len(self.error_queries) > 1000:
-            self.error_queries = self.error_queries[-1000:]
+
+    def check_request(self, route: str, counts: Counter):
+        """Report fingerprints repeated often enough to look like N+1"""
+        for key, count in counts.items():
+            if count >= self.n_plus_one_threshold and key.lstrip("( ").upper().startswith("SELECT"):
+                with self._lock:
+                    self.n_plus_one[(route, key)] = self.n_plus_one.pop((route, key), 0) + 1
+                    self.n_plus_one_totals[route] += 1
+                    if len(self.n_plus_one) > self.max_n_plus_one:
+                        self.n_plus_one.popitem(last=False)
+                logger.warning(
+                    "Possible N+1 query pattern",
+                    extra={
+                        "route": route,
+                        "query": key,
+                        "executions": count,
+                        "threshold": self.n_plus_one_threshold
+                    }
+                )
             
-    def get_slow_queries(self) -> Dict[str, float]:
-        """Get all queries that exceeded the threshold"""
-        return {
-            query: duration
-            for query, duration in self.query_times.items()
-            if duration > self.slow_query_threshold
-        }
+    def get_slow_queries(self, limit: int = 10, sort_by: str = "total") -> List[Dict[str, Any]]:
+        """Get the top ``limit`` fingerprints by "total", "mean", "max" or "p99" time"""
+        with self._lock:
+            stats = [s.as_dict() for s in self.query_stats.values()]
+        return sorted(stats, key=lambda s: s[sort_by], reverse=True)[:limit]
+
+    def get_n_plus_one(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get the routes and queries most often flagged as N+1"""
+        with self._lock:
+            top = Counter(self.n_plus_one).most_common(limit)
+        return [
+            {"route": route, "fingerprint": key, "requests": count}
+            for (route, key), count in top
+        ]
         
     def get_query_errors(self) -> List[Dict[str, Any]]:
         """Get recent query errors"""
-        return self.error_queries
+        return list(self.error_queries)
+
+    def collect_metrics(self):
+        """Query totals and the slowest fingerprints for /metrics"""
+        with self._lock:
+            stats = list(self.query_stats.values())
+            queries_total = self.queries_total
+            n_plus_one = dict(self.n_plus_one_totals)
+        yield ("db_queries_total", "counter", "Statements executed", [
+            ("", [], queries_total)
+        ])
+        top = sorted(stats, key=lambda s: s.total, reverse=True)[:20]
+        yield ("db_query_seconds_top", "gauge", "Total time of the 20 most expensive query fingerprints", [
+            ("", [("fingerprint", s.fingerprint[:200])], s.total) for s in top
+        ])
+        yield ("db_n_plus_one_total", "counter", "Requests with a likely N+1 query pattern", [
+            ("", [("route", route)], count) for route, count in n_plus_one.items()
+        ])
 
 # Initialize monitors
-performance_monitor = PerformanceMonitor()
-database_monitor = DatabaseMonitor() 
\ No newline at end of file
+settings = get_settings()
+
+performance_monitor = PerformanceMonitor(
+    collector=SystemMetricsCollector(
+        disk_path=settings.METRICS_DISK_PATH,
+        collect_connections=settings.METRICS_COLLECT_CONNECTIONS,
+        connections_interval=settings.METRICS_CONNECTIONS_INTERVAL,
+    )
+)
+database_monitor = DatabaseMonitor() 
+metrics_registry.register_collector(database_monitor.collect_metrics)
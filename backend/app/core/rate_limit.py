@@ -1,67 +1,331 @@
 from fastapi import HTTPException, Request, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+import functools
+import hashlib
+import inspect
+import math
 import time
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+from redis.exceptions import RedisError
 from app.core.config import get_settings
-from datetime import datetime
+from app.core.redis import RedisHealth, redis_client, redis_health
+from .logging import get_logger
 
 settings = get_settings()
+logger = get_logger(__name__)
+
+# GCRA (generic cell rate algorithm) in a single round trip. Only the
+# theoretical arrival time (TAT) is stored per key, so each check is O(1)
+# and the key expires on its own once the client goes quiet. Redis' own
+# clock is used so replicas with skewed clocks agree.
+#
+# KEYS[1] - limiter key
+# ARGV[1] - emission interval in ms (period / limit)
+# ARGV[2] - period in ms
+# ARGV[3] - cost of this request
+# Returns {allowed, remaining, retry_after_ms}
+GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if tat == nil or tat < now then
+    tat = now
+end
+local new_tat = tat + interval * cost
+local allow_at = new_tat - period
+if allow_at > now then
+    return {0, 0, allow_at - now}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now))
+return {1, math.floor((period - (new_tat - now)) / interval), 0}
+"""
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # seconds
+
+
+class InMemoryGCRA:
+    """Process-local GCRA used when Redis is unavailable"""
+
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self.max_keys = max_keys
+        self._tat: "OrderedDict[str, float]" = OrderedDict()
+
+    def hit(self, key: str, limit: int, period: float, cost: int = 1) -> RateLimitResult:
+        now = time.monotonic()
+        interval = period / limit
+        tat = max(self._tat.get(key, now), now)
+        new_tat = tat + interval * cost
+        allow_at = new_tat - period
+
+        if allow_at > now:
+            return RateLimitResult(False, limit, 0, allow_at - now)
+
+        self._tat[key] = new_tat
+        self._tat.move_to_end(key)
+        # Least recently seen keys go first; their TAT is almost always in
+        # the past already, so evicting them loses no state
+        while len(self._tat) > self.max_keys:
+            self._tat.popitem(last=False)
+
+        remaining = int((period - (new_tat - now)) // interval)
+        return RateLimitResult(True, limit, remaining, 0.0)
 
 
 class RateLimiter:
-    def __init__(self) -> None:
-        self.requests: Dict[str, List[float]] = {}
-        self.cleanup_interval: int = 60  # seconds
+    def __init__(
+        self,
+        limit: Optional[int] = None,
+        period: int = 60,
+        prefix: str = "ratelimit",
+        health: RedisHealth = redis_health,
+    ) -> None:
+        self.limit = limit or settings.RATE_LIMIT_PER_MINUTE
+        self.period = period
+        self.prefix = prefix
+        # Shared circuit: after a Redis error every limiter stays on the
+        # in-memory fallback until the retry interval has passed
+        self.health = health
+        self._script = None
+        self._fallback = InMemoryGCRA()
 
-    async def __call__(self, request: Request) -> None:
-        """Rate limiting middleware"""
-        try:
-            client_ip = request.client.host
-            if client_ip is None:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Could not determine client IP",
+    async def hit(
+        self,
+        key: str,
+        limit: Optional[int] = None,
+        period: Optional[int] = None,
+        cost: int = 1,
+    ) -> RateLimitResult:
+        """Consume ``cost`` units for ``key`` and report whether it is allowed
+
+        Redis is called through the async client with a short timeout, so
+        an outage never blocks the event loop; any error trips the shared
+        circuit and the in-memory limiter answers instead.
+        """
+        limit = limit or self.limit
+        period = period or self.period
+
+        if self.health.available:
+            try:
+                if self._script is None:
+                    self._script = redis_client.get_async_client().register_script(GCRA_SCRIPT)
+                period_ms = period * 1000
+                allowed, remaining, retry_after_ms = await self._script(
+                    keys=[f"{self.prefix}:{key}"],
+                    args=[period_ms / limit, period_ms, cost],
                 )
+                return RateLimitResult(
+                    bool(allowed), limit, int(remaining), int(retry_after_ms) / 1000
+                )
+            except RedisError as e:
+                self.health.record_failure("Rate limiter", e)
+                self._script = None
+
+        return self._fallback.hit(key, limit, period, cost)
 
-            current_time = time.time()
-
-            # Clean up old entries
-            self._cleanup_old_entries(current_time)
-
-            # Check rate limit
-            if client_ip in self.requests:
-                if len(self.requests[client_ip]) >= settings.RATE_LIMIT_PER_MINUTE:
-                    raise HTTPException(
-                        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                        detail="Too many requests",
-                    )
-                self.requests[client_ip].append(current_time)
-            else:
-                self.requests[client_ip] = [current_time]
-        except HTTPException:
-            raise
-        except Exception as e:
+    async def __call__(self, request: Request) -> None:
+        """Rate limiting middleware"""
+        client_ip = request.client.host if request.client else None
+        if client_ip is None:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Rate limiting error: {str(e)}",
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Could not determine client IP",
             )
 
-    def _cleanup_old_entries(self, current_time: float) -> None:
-        """Remove entries older than cleanup interval"""
-        try:
-            for ip in list(self.requests.keys()):
-                self.requests[ip] = [
-                    t
-                    for t in self.requests[ip]
-                    if current_time - t < self.cleanup_interval
-                ]
-                if not self.requests[ip]:
-                    del self.requests[ip]
-        except Exception as e:
+        result = await self.hit(f"ip:{client_ip}")
+        if not result.allowed:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to clean up rate limit entries: {str(e)}",
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(result.retry_after))},
             )
 
 
 rate_limiter = RateLimiter()
+
+
+# Plan tiers: budget per bucket as (cost units, period in seconds). Reads,
+# writes and generation calls draw from separate buckets, so exhausting the
+# generation budget never throttles cheap reads from the same client.
+PLAN_TIERS: Dict[str, Dict[str, Tuple[int, int]]] = {
+    "anonymous": {"read": (60, 60), "write": (20, 60), "generation": (10, 3600)},
+    "free": {"read": (300, 60), "write": (60, 60), "generation": (50, 3600)},
+    "pro": {"read": (1200, 60), "write": (300, 60), "generation": (500, 3600)},
+    "enterprise": {"read": (6000, 60), "write": (1500, 60), "generation": (5000, 3600)},
+}
+DEFAULT_PLAN = "free"
+API_KEY_HEADER = "X-API-Key"
+
+
+@dataclass(frozen=True)
+class RouteCost:
+    bucket: str
+    cost: int = 1
+
+
+# Longest matching path prefix wins; unmatched routes cost 1 read (safe
+# methods) or 1 write (everything else).
+ROUTE_COSTS: Dict[str, RouteCost] = {
+    "/api/v1/content/generation/generate/image": RouteCost("generation", 5),
+    "/api/v1/content/generation/variations": RouteCost("generation", 3),
+    "/api/v1/content/generation": RouteCost("generation", 1),
+    "/api/v1/content/media": RouteCost("write", 2),
+}
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+@dataclass(frozen=True)
+class QuotaIdentity:
+    key: str
+    plan: str
+
+
+def resolve_identity(request: Request) -> QuotaIdentity:
+    """Identify the caller by user ID, then API key, then client IP"""
+    user = getattr(request.state, "user", None)
+    user_id = getattr(user, "id", None) or getattr(request.state, "user_id", None)
+    plan = getattr(user, "plan", None) or getattr(request.state, "plan", None)
+
+    if user_id is None:
+        authorization = request.headers.get("authorization", "")
+        if authorization[:7].lower() == "bearer ":
+            # Imported lazily, security pulls in the Supabase client
+            from app.core.security import verify_token
+
+            payload = verify_token(authorization[7:])
+            if payload:
+                user_id = payload.get("sub")
+                plan = plan or payload.get("plan")
+
+    if user_id is not None:
+        return QuotaIdentity(f"user:{user_id}", plan or DEFAULT_PLAN)
+
+    api_key = request.headers.get(API_KEY_HEADER)
+    if api_key:
+        # Never store raw keys in Redis
+        digest = hashlib.sha256(api_key.encode()).hexdigest()[:32]
+        return QuotaIdentity(f"key:{digest}", plan or DEFAULT_PLAN)
+
+    client_ip = request.client.host if request.client else None
+    if client_ip is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Could not determine client IP",
+        )
+    return QuotaIdentity(f"ip:{client_ip}", "anonymous")
+
+
+def _raise_if_limited(result: RateLimitResult) -> None:
+    if not result.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={
+                "Retry-After": str(math.ceil(result.retry_after)),
+                "X-RateLimit-Limit": str(result.limit),
+                "X-RateLimit-Remaining": "0",
+            },
+        )
+
+
+class QuotaEngine:
+    """Tiered quotas keyed by caller identity with per-route cost weights"""
+
+    def __init__(
+        self,
+        limiter: RateLimiter = rate_limiter,
+        tiers: Optional[Dict[str, Dict[str, Tuple[int, int]]]] = None,
+        route_costs: Optional[Dict[str, RouteCost]] = None,
+    ) -> None:
+        self.limiter = limiter
+        self.tiers = tiers or PLAN_TIERS
+        route_costs = route_costs or ROUTE_COSTS
+        self._route_costs = sorted(
+            route_costs.items(), key=lambda item: len(item[0]), reverse=True
+        )
+
+    def route_cost(self, method: str, path: str) -> RouteCost:
+        for prefix, cost in self._route_costs:
+            if path.startswith(prefix):
+                return cost
+        return RouteCost("read" if method in SAFE_METHODS else "write")
+
+    async def check(self, request: Request) -> RateLimitResult:
+        identity = resolve_identity(request)
+        route_cost = self.route_cost(request.method, request.url.path)
+        tier = self.tiers.get(identity.plan) or self.tiers[DEFAULT_PLAN]
+        limit, period = tier[route_cost.bucket]
+        return await self.limiter.hit(
+            f"quota:{identity.key}:{route_cost.bucket}",
+            limit=limit,
+            period=period,
+            cost=route_cost.cost,
+        )
+
+    async def __call__(self, request: Request) -> None:
+        """Quota dependency, attach to a router with ``Depends(quota_engine)``"""
+        _raise_if_limited(await self.check(request))
+
+
+quota_engine = QuotaEngine()
+
+
+def rate_limit(limit: int, period: int) -> Callable:
+    """Limit an endpoint to ``limit`` calls per ``period`` seconds per caller
+
+    Must be applied below the route decorator so FastAPI registers the
+    wrapped function. A ``Request`` parameter is injected into the endpoint
+    signature when the endpoint does not declare one.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+        request_param = next(
+            (
+                name
+                for name, param in signature.parameters.items()
+                if param.annotation is Request
+            ),
+            None,
+        )
+        injected = request_param is None
+        if injected:
+            request_param = "_rate_limit_request"
+            parameters = [
+                *signature.parameters.values(),
+                inspect.Parameter(
+                    request_param,
+                    inspect.Parameter.KEYWORD_ONLY,
+                    annotation=Request,
+                ),
+            ]
+            # Keyword-only params must come before **kwargs
+            signature = signature.replace(
+                parameters=sorted(parameters, key=lambda p: p.kind)
+            )
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            request = kwargs.pop(request_param) if injected else kwargs[request_param]
+            identity = resolve_identity(request)
+            result = await rate_limiter.hit(
+                f"route:{func.__module__}.{func.__qualname__}:{identity.key}",
+                limit=limit,
+                period=period,
+            )
+            _raise_if_limited(result)
+            return await func(*args, **kwargs)
+
+        wrapper.__signature__ = signature
+        return wrapper
+
+    return decorator
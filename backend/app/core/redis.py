@@ -1,16 +1,46 @@
 import redis
+import redis.asyncio
 import logging
 import time
 from typing import Optional, Any, Dict
+from redis.asyncio.retry import Retry
+from redis.backoff import NoBackoff
 from redis.exceptions import ConnectionError, RedisError
 
 from app.core.config import settings
+from app.core.metrics import cache_requests
 
 logger = logging.getLogger(__name__)
 
+class RedisHealth:
+    """Circuit breaker shared by everything that checks Redis per request
+
+    After a failure every user of the circuit skips Redis for
+    ``retry_interval`` seconds and falls back to local state, so an outage
+    costs one short timeout per interval rather than one per request and
+    per feature.
+    """
+
+    def __init__(self, retry_interval: float = 30):
+        self.retry_interval = retry_interval
+        self._down_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def record_failure(self, source: str, error: Exception) -> None:
+        if self.available:
+            logger.warning(
+                f"{source} falling back to local state for {self.retry_interval}s: {str(error)}"
+            )
+        self._down_until = time.monotonic() + self.retry_interval
+
+
 class RedisClient:
     def __init__(self):
         self._client: Optional[redis.Redis] = None
+        self._async_client: Optional[redis.asyncio.Redis] = None
         self._max_retries = 3
         self._retry_delay = 1  # seconds
 
@@ -42,15 +72,37 @@ class RedisClient:
                 logger.warning(f"Redis connection attempt {retries} failed. Retrying in {self._retry_delay}s...")
                 time.sleep(self._retry_delay)
 
+    def get_async_client(self) -> redis.asyncio.Redis:
+        """Get the async client used on the request path
+
+        It connects lazily, with short timeouts and no retries: callers
+        fall back to local state on any error instead of holding the event
+        loop while Redis is down.
+        """
+        if self._async_client is None:
+            self._async_client = redis.asyncio.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                password=settings.REDIS_PASSWORD,
+                db=settings.REDIS_DB,
+                decode_responses=True,
+                socket_timeout=settings.REDIS_REQUEST_TIMEOUT,
+                socket_connect_timeout=settings.REDIS_REQUEST_TIMEOUT,
+                retry=Retry(NoBackoff(), 0),
+            )
+        return self._async_client
+
     def get(self, key: str, default: Any = None) -> Any:
         """Get value from Redis"""
         try:
             client = self.get_client()
             value = client.get(key)
-            return value if value is not None else default
         except RedisError as e:
+            cache_requests.inc(("error",))
             logger.error(f"Error getting key {key} from Redis: {str(e)}")
             return default
+        cache_requests.inc(("hit" if value is not None else "miss",))
+        return value if value is not None else default
 
     def set(self, key: str, value: Any, expire: Optional[int] = None) -> bool:
         """Set value in Redis with optional expiration"""
@@ -99,4 +151,7 @@ class RedisClient:
                 logger.error(f"Error closing Redis connection: {str(e)}")
 
 # Global Redis client instance
-redis_client = RedisClient() 
\ No newline at end of file
+redis_client = RedisClient()
+
+# Shared by every per-request Redis check
+redis_health = RedisHealth(settings.REDIS_RETRY_INTERVAL) 
\ No newline at end of file
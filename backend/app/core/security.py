@@ -8,9 +8,16 @@ import os
 from dotenv import load_dotenv
 from pydantic import BaseModel
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List
+from typing import Any, Optional, Dict, List
 from jose import JWTError, jwt
 import time
+from collections import OrderedDict
+from fastapi import Request
+from redis.exceptions import RedisError
+from app.core.rate_limit import RateLimiter
+from app.core.redis import RedisHealth, redis_client, redis_health
+from .counters import TimeBucketedCountMinSketch
+from .inspection import InspectionRule, rule_engine
 from .logging import get_logger, get_audit_logger
 import ipaddress
 
@@ -168,74 +175,131 @@ def verify_token(token: str) -> Optional[dict]:
         return None
 
 class SecurityMonitor:
-    """Monitor and handle security-related events"""
+    """Monitor and handle security-related events
+
+    State lives in Redis so blocks and counters apply across replicas. When
+    Redis is unreachable the monitor falls back to fixed-size in-process
+    structures, so memory does not grow with the number of client IPs.
+    Redis is reached through the async client with a short timeout, and
+    the circuit is shared with the rate limiter, so an outage costs one
+    fast failure per retry interval for both.
+    """
     
-    def __init__(self):
-        self.failed_attempts: Dict[str, List[float]] = {}
-        self.blocked_ips: Dict[str, float] = {}
-        self.rate_limits: Dict[str, List[float]] = {}
+    def __init__(self, health: RedisHealth = redis_health):
         self.block_duration = 3600  # 1 hour
         self.max_failed_attempts = 5
         self.rate_limit_window = 60  # 1 minute
         self.max_requests_per_window = 100
+        self.failed_attempt_buckets = 6
+        self.max_local_blocks = 10_000
+        self.redis_prefix = "security"
+        self.health = health
+        # Local fallback state, bounded regardless of traffic
+        self.failed_attempts = TimeBucketedCountMinSketch(
+            window=self.block_duration, buckets=self.failed_attempt_buckets
+        )
+        self.blocked_ips: "OrderedDict[str, float]" = OrderedDict()  # ip -> blocked until
+        self.rate_limits = RateLimiter(
+            limit=self.max_requests_per_window,
+            period=self.rate_limit_window,
+            prefix=f"{self.redis_prefix}:rate",
+            health=health,
+        )
+        self.rule_engine = rule_engine
         
-    def check_ip_block(self, ip: str) -> bool:
+    def _redis(self):
+        """Get the async Redis client, or None while the circuit is open"""
+        if not self.health.available:
+            return None
+        return redis_client.get_async_client()
+            
+    def _redis_failed(self, error: Exception):
+        self.health.record_failure("Security monitor", error)
+        
+    def _cache_block(self, ip: str, blocked_until: float):
+        self.blocked_ips[ip] = blocked_until
+        self.blocked_ips.move_to_end(ip)
+        while len(self.blocked_ips) > self.max_local_blocks:
+            self.blocked_ips.popitem(last=False)
+        
+    async def check_ip_block(self, ip: str) -> bool:
         """Check if an IP is blocked"""
-        if ip in self.blocked_ips:
-            if time.time() - self.blocked_ips[ip] < self.block_duration:
+        now = time.time()
+        blocked_until = self.blocked_ips.get(ip)
+        if blocked_until is not None:
+            if now < blocked_until:
+                return True
+            del self.blocked_ips[ip]
+            
+        client = self._redis()
+        if client is not None:
+            try:
+                ttl_ms = await client.pttl(f"{self.redis_prefix}:blocked:{ip}")
+            except RedisError as e:
+                self._redis_failed(e)
+                return False
+            if ttl_ms > 0:
+                self._cache_block(ip, now + ttl_ms / 1000)
                 return True
-            else:
-                del self.blocked_ips[ip]
         return False
         
-    def record_failed_attempt(self, ip: str):
+    async def record_failed_attempt(self, ip: str):
         """Record a failed authentication attempt"""
         now = time.time()
-        if ip not in self.failed_attempts:
-            self.failed_attempts[ip] = []
-            
-        self.failed_attempts[ip].append(now)
+        attempts = None
         
-        # Remove attempts older than block duration
-        self.failed_attempts[ip] = [
-            t for t in self.failed_attempts[ip]
-            if now - t < self.block_duration
-        ]
+        client = self._redis()
+        if client is not None:
+            # One counter per time bucket; the window total is the sum of
+            # the live buckets, each of which expires on its own
+            bucket_seconds = self.block_duration / self.failed_attempt_buckets
+            epoch = int(now // bucket_seconds)
+            prefix = f"{self.redis_prefix}:failed:{ip}"
+            try:
+                pipe = client.pipeline(transaction=False)
+                pipe.incr(f"{prefix}:{epoch}")
+                pipe.expire(f"{prefix}:{epoch}", self.block_duration)
+                pipe.mget([
+                    f"{prefix}:{epoch - i}"
+                    for i in range(self.failed_attempt_buckets)
+                ])
+                _, _, counts = await pipe.execute()
+                attempts = sum(int(c) for c in counts if c is not None)
+            except RedisError as e:
+                self._redis_failed(e)
+                client = None
+                
+        if attempts is None:
+            attempts = self.failed_attempts.add(ip, now=now)
         
         # Check if IP should be blocked
-        if len(self.failed_attempts[ip]) >= self.max_failed_attempts:
-            self.blocked_ips[ip] = now
+        if attempts >= self.max_failed_attempts:
+            self._cache_block(ip, now + self.block_duration)
+            if client is not None:
+                try:
+                    await client.set(
+                        f"{self.redis_prefix}:blocked:{ip}", 1, ex=self.block_duration
+                    )
+                except RedisError as e:
+                    self._redis_failed(e)
             audit_logger.warning(
                 "IP blocked due to multiple failed attempts",
                 extra={
                     "ip": ip,
-                    "attempts": len(self.failed_attempts[ip]),
+                    "attempts": attempts,
                     "block_duration": self.block_duration
                 }
             )
             
-    def check_rate_limit(self, ip: str) -> bool:
+    async def check_rate_limit(self, ip: str) -> bool:
         """Check if request rate limit is exceeded"""
-        now = time.time()
-        if ip not in self.rate_limits:
-            self.rate_limits[ip] = []
-            
-        # Remove requests outside the window
-        self.rate_limits[ip] = [
-            t for t in self.rate_limits[ip]
-            if now - t < self.rate_limit_window
-        ]
-        
-        # Add current request
-        self.rate_limits[ip].append(now)
-        
-        # Check if rate limit is exceeded
-        if len(self.rate_limits[ip]) > self.max_requests_per_window:
+        result = await self.rate_limits.hit(ip)
+        if not result.allowed:
             audit_logger.warning(
                 "Rate limit exceeded",
                 extra={
                     "ip": ip,
-                    "requests": len(self.rate_limits[ip]),
+                    "limit": result.limit,
                     "window": self.rate_limit_window
                 }
             )
@@ -250,62 +314,13 @@ class SecurityMonitor:
             extra=details
         )
         
+    def inspect_request(self, request: Request) -> List[InspectionRule]:
+        """Return the inspection rules a request matches"""
+        return self.rule_engine.inspect(request)
+        
     def is_suspicious_request(self, request: Request) -> bool:
         """Check if a request appears suspicious"""
-        suspicious_headers = [
-            "user-agent",
-            "x-forwarded-for",
-            "x-real-ip"
-        ]
-        
-        for header in suspicious_headers:
-            if header in request.headers:
-                value = request.headers[header]
-                # Add your suspicious pattern checks here
-                if "sql" in value.lower() or "script" in value.lower():
-                    return True
-                    
-        return False
-
-class SecurityMiddleware:
-    """Middleware for security monitoring"""
-    
-    def __init__(self, app):
-        self.app = app
-        self.security_monitor = SecurityMonitor()
-        
-    async def __call__(self, request: Request, call_next):
-        client_ip = request.client.host if request.client else None
-        
-        if client_ip:
-            # Check if IP is blocked
-            if self.security_monitor.check_ip_block(client_ip):
-                raise HTTPException(
-                    status_code=403,
-                    detail="IP address blocked due to suspicious activity"
-                )
-                
-            # Check rate limit
-            if not self.security_monitor.check_rate_limit(client_ip):
-                raise HTTPException(
-                    status_code=429,
-                    detail="Too many requests"
-                )
-                
-            # Check for suspicious activity
-            if self.security_monitor.is_suspicious_request(request):
-                self.security_monitor.log_security_event(
-                    "suspicious_request",
-                    {
-                        "ip": client_ip,
-                        "path": request.url.path,
-                        "method": request.method,
-                        "headers": dict(request.headers)
-                    }
-                )
-                
-        response = await call_next(request)
-        return response
+        return bool(self.inspect_request(request))
 
 # Initialize security monitor
 security_monitor = SecurityMonitor()
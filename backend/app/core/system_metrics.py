@@ -0,0 +1,199 @@
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import psutil
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+def _read(path: Path) -> Optional[str]:
+    try:
+        return path.read_text().strip()
+    except (OSError, ValueError):
+        return None
+
+
+def _read_int(path: Path) -> Optional[int]:
+    value = _read(path)
+    if value is None or value == "max":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+class CgroupLimits:
+    """CPU and memory limits of the container the process runs in
+
+    Supports the unified (v2) hierarchy and the v1 ``cpu``/``cpuacct``/
+    ``memory`` controllers. Limits are read once; usage files are single
+    small reads from a pseudo filesystem. Anything missing or unlimited
+    reads as None, in which case host-wide figures are used.
+    """
+
+    # v1 reports "unlimited" memory as a huge page-aligned number
+    _UNLIMITED = 1 << 60
+
+    def __init__(self, root: Path = CGROUP_ROOT):
+        self.root = root
+        self.version = 2 if (root / "cgroup.controllers").exists() else 1
+        self.cpu_limit = self._cpu_limit()
+        self.memory_limit = self._memory_limit()
+
+    def _cpu_limit(self) -> Optional[float]:
+        """Number of CPUs the cgroup may use, possibly fractional"""
+        if self.version == 2:
+            value = _read(self.root / "cpu.max")
+            if not value:
+                return None
+            quota, _, period = value.partition(" ")
+            if quota == "max":
+                return None
+            try:
+                return int(quota) / int(period or 100000)
+            except ValueError:
+                return None
+        quota = _read_int(self.root / "cpu" / "cpu.cfs_quota_us")
+        period = _read_int(self.root / "cpu" / "cpu.cfs_period_us")
+        if not quota or quota < 0 or not period:
+            return None
+        return quota / period
+
+    def _memory_limit(self) -> Optional[int]:
+        if self.version == 2:
+            limit = _read_int(self.root / "memory.max")
+        else:
+            limit = _read_int(self.root / "memory" / "memory.limit_in_bytes")
+        if limit is None or limit >= self._UNLIMITED:
+            return None
+        return limit
+
+    def cpu_usage(self) -> Optional[float]:
+        """Total CPU seconds used by the cgroup"""
+        if self.version == 2:
+            stat = _read(self.root / "cpu.stat")
+            if stat:
+                for line in stat.splitlines():
+                    key, _, value = line.partition(" ")
+                    if key == "usage_usec":
+                        return int(value) / 1e6
+            return None
+        usage = _read_int(self.root / "cpuacct" / "cpuacct.usage")
+        return usage / 1e9 if usage is not None else None
+
+    def memory_usage(self) -> Optional[int]:
+        if self.version == 2:
+            return _read_int(self.root / "memory.current")
+        return _read_int(self.root / "memory" / "memory.usage_in_bytes")
+
+
+class SystemMetricsCollector:
+    """Cheap per-sample system metrics
+
+    Each subsystem is read once per sample: one ``virtual_memory``, one
+    ``disk_usage`` and one ``net_io_counters`` call. The process handle is
+    kept between samples so its CPU percentage is measured since the
+    previous sample instead of always reading 0. Counting network
+    connections walks every socket on the host, so it only runs when
+    ``collect_connections`` is set, at most every ``connections_interval``
+    seconds; otherwise it is left out and stored as missing.
+
+    Inside a container with CPU or memory limits, ``cpu.percent``,
+    ``cpu.count`` and the memory figures are relative to those limits, and
+    the host-wide values are kept under ``host_percent``.
+    """
+
+    def __init__(
+        self,
+        disk_path: str = "/",
+        collect_connections: bool = False,
+        connections_interval: float = 60,
+        cgroup: Optional[CgroupLimits] = None,
+    ):
+        self.disk_path = disk_path
+        self.collect_connections = collect_connections
+        self.connections_interval = connections_interval
+        self.cgroup = cgroup or CgroupLimits()
+        self._process = psutil.Process(os.getpid())
+        self._cpu_count = psutil.cpu_count()
+        self._connections: Optional[int] = None
+        self._connections_at = 0.0
+        self._last_cpu: Optional[Tuple[float, float]] = None
+        # Prime the percentages, the first call always returns 0.0
+        psutil.cpu_percent(interval=None)
+        self._process.cpu_percent(interval=None)
+        self._cgroup_cpu_percent()
+
+    def _cgroup_cpu_percent(self) -> Optional[float]:
+        """Cgroup CPU use since the previous call, as a percentage of its limit"""
+        if self.cgroup.cpu_limit is None:
+            return None
+        usage = self.cgroup.cpu_usage()
+        if usage is None:
+            return None
+        now = time.monotonic()
+        last, self._last_cpu = self._last_cpu, (now, usage)
+        if last is None or now <= last[0]:
+            return None
+        return 100.0 * (usage - last[1]) / ((now - last[0]) * self.cgroup.cpu_limit)
+
+    def _connection_count(self) -> Optional[int]:
+        now = time.monotonic()
+        if self._connections is None or now - self._connections_at >= self.connections_interval:
+            try:
+                self._connections = len(psutil.net_connections(kind="inet"))
+            except (psutil.AccessDenied, OSError):
+                self._connections = None
+            self._connections_at = now
+        return self._connections
+
+    def collect(self) -> Dict[str, Any]:
+        host_cpu = psutil.cpu_percent(interval=None)
+        vm = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        net = psutil.net_io_counters()
+        with self._process.oneshot():
+            process_cpu = self._process.cpu_percent(interval=None)
+            rss = self._process.memory_info().rss
+
+        cpu_percent = self._cgroup_cpu_percent()
+        cpu = {
+            "percent": host_cpu if cpu_percent is None else cpu_percent,
+            "host_percent": host_cpu,
+            "count": self.cgroup.cpu_limit or self._cpu_count,
+            "process_percent": process_cpu,
+        }
+
+        memory_limit = self.cgroup.memory_limit
+        memory_usage = self.cgroup.memory_usage() if memory_limit is not None else None
+        if memory_usage is not None:
+            total = min(memory_limit, vm.total)
+            memory = {
+                "total": total,
+                "available": max(total - memory_usage, 0),
+                "percent": 100.0 * memory_usage / total,
+            }
+        else:
+            memory = {"total": vm.total, "available": vm.available, "percent": vm.percent}
+        memory["host_percent"] = vm.percent
+        memory["process_memory"] = rss
+
+        network: Dict[str, Any] = {"io_counters": net._asdict() if net else {}}
+        if self.collect_connections:
+            connections = self._connection_count()
+            if connections is not None:
+                network["connections"] = connections
+
+        return {
+            "cpu": cpu,
+            "memory": memory,
+            "disk": {
+                "total": disk.total,
+                "used": disk.used,
+                "free": disk.free,
+                "percent": disk.percent,
+            },
+            "network": network,
+        }
@@ -1,7 +1,11 @@
 from fastapi import FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.api import mock_routes
 from app.core.config import settings
+from app.core.loop_monitor import loop_monitor
+from app.core.metrics import metrics_registry
+from app.core.middleware import RequestContextMiddleware
 
 app = FastAPI(
     title="Auto-Scheduler API",
@@ -18,6 +22,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request ID, timing and access/audit logging in one ASGI layer
+app.add_middleware(
+    RequestContextMiddleware,
+    exclude_paths=["/health", "/metrics"],
+    sample_rates=settings.get_access_log_sample_rates(),
+    default_sample_rate=settings.ACCESS_LOG_SAMPLE_RATE,
+)
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    loop_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    loop_monitor.stop()
+
 # Include mock routes
 app.include_router(mock_routes.router, prefix="/api/v1")
 
@@ -32,3 +52,11 @@ async def health_check():
         "version": settings.APP_VERSION,
         "environment": settings.ENVIRONMENT
     }
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(
+        metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
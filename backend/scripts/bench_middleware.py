@@ -0,0 +1,145 @@
+"""Microbenchmark: per-request middleware overhead
+
+Compares the former BaseHTTPMiddleware chain (LoggingMiddleware +
+RequestIDMiddleware) with the single pure-ASGI RequestContextMiddleware by
+driving each stack directly through the ASGI interface, without a server
+or network in the way.
+
+Log output and audit writes are disabled by default so the numbers show
+framework overhead only; pass --with-io to include them.
+
+Usage (from backend/):
+    python scripts/bench_middleware.py [--requests N] [--with-io]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi import FastAPI, Request, Response  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+
+from app.core import middleware as middleware_module  # noqa: E402
+from app.core.audit import audit_trail  # noqa: E402
+from app.core.middleware import RequestContextMiddleware  # noqa: E402
+
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    """Shape of the former LoggingMiddleware, for comparison"""
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        start_time = time.time()
+        request_id = request.headers.get("X-Request-ID", "unknown")
+        client_ip = request.client.host if request.client else "unknown"
+        middleware_module.logger.info(
+            f"Request: {request.method} {request.url.path}",
+            extra={
+                "request_id": request_id,
+                "client_ip": client_ip,
+                "query_params": dict(request.query_params),
+                "headers": dict(request.headers),
+            },
+        )
+        response = await call_next(request)
+        duration = time.time() - start_time
+        middleware_module.log_api_call(
+            logger=middleware_module.logger,
+            request_id=request_id,
+            path=request.url.path,
+            method=request.method,
+            status_code=response.status_code,
+            duration=duration,
+        )
+        middleware_module.RequestContextMiddleware._audit(
+            request_id, request.method, request.url.path, None, client_ip,
+            response.status_code, duration, "success",
+        )
+        return response
+
+
+class LegacyRequestIDMiddleware(BaseHTTPMiddleware):
+    """Shape of the former RequestIDMiddleware, for comparison"""
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        request_id = str(uuid.uuid4())
+        request.state.request_id = request_id
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        return response
+
+
+def build_app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"item_id": item_id}
+
+    if stack == "legacy":
+        app.add_middleware(LegacyLoggingMiddleware)
+        app.add_middleware(LegacyRequestIDMiddleware)
+    elif stack == "asgi":
+        app.add_middleware(RequestContextMiddleware)
+    return app
+
+
+async def run(app: FastAPI, requests: int) -> float:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/items/42",
+        "raw_path": b"/items/42",
+        "query_string": b"q=test",
+        "root_path": "",
+        "headers": [(b"host", b"bench"), (b"user-agent", b"bench/1.0")],
+        "client": ("127.0.0.1", 12345),
+        "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    # Warm up routing and caches
+    for _ in range(200):
+        await app(dict(scope, state={}), receive, send)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope, state={}), receive, send)
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--with-io", action="store_true")
+    args = parser.parse_args()
+
+    if not args.with_io:
+        logging.disable(logging.CRITICAL)
+        audit_trail.log_event = lambda event: None
+
+    results = {
+        stack: asyncio.run(run(build_app(stack), args.requests))
+        for stack in ("none", "legacy", "asgi")
+    }
+    baseline = results["none"]
+    for stack, per_request in results.items():
+        overhead = (per_request - baseline) * 1e6
+        print(f"{stack:>7}: {per_request * 1e6:8.1f} us/request  (+{overhead:.1f} us middleware)")
+
+
+if __name__ == "__main__":
+    main()
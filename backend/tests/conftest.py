@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# The app creates logs/ relative to the working directory on import
+os.chdir(tempfile.mkdtemp(prefix="backend-tests-"))
@@ -0,0 +1,63 @@
+import json
+from datetime import datetime, timedelta
+
+from app.core.audit_segments import SegmentReader, compress_segment, index_path, segment_path
+
+DAY = datetime(2026, 3, 14, 12, 0, 0)
+
+
+def write_segment(log_dir, seq, events):
+    path = segment_path(log_dir, "audit", DAY.strftime("%Y%m%d"), seq)
+    with open(path, "w") as f:
+        for event in events:
+            f.write(json.dumps(event) + "\n")
+    return path
+
+
+def make_events(count, offset=0):
+    return [
+        {"timestamp": (DAY + timedelta(seconds=offset + i)).isoformat(), "n": offset + i}
+        for i in range(count)
+    ]
+
+
+def test_compressed_segment_round_trip(tmp_path):
+    path = write_segment(tmp_path, 1, make_events(500))
+
+    gz_path = compress_segment(path, block_bytes=1024)
+
+    assert not path.exists()
+    assert index_path(gz_path).exists()
+    events = list(SegmentReader(tmp_path).iter_lines("audit"))
+    assert [event["n"] for event in events] == list(range(500))
+
+
+def test_index_seeks_to_time_range(tmp_path):
+    compress_segment(write_segment(tmp_path, 1, make_events(500)), block_bytes=1024)
+    start = DAY + timedelta(seconds=200)
+    end = DAY + timedelta(seconds=209)
+
+    events = list(SegmentReader(tmp_path).iter_lines("audit", start, end))
+
+    assert [event["n"] for event in events] == list(range(200, 210))
+
+
+def test_segments_are_read_in_order(tmp_path):
+    compress_segment(write_segment(tmp_path, 1, make_events(10)))
+    write_segment(tmp_path, 2, make_events(10, offset=10))
+
+    events = list(SegmentReader(tmp_path).iter_lines("audit"))
+
+    assert [event["n"] for event in events] == list(range(20))
+
+
+def test_segment_compressed_after_listing_is_still_read(tmp_path):
+    path = write_segment(tmp_path, 1, make_events(10))
+    reader = SegmentReader(tmp_path)
+    listed = reader.segments("audit")
+    compress_segment(path)
+    reader.segments = lambda *args: listed
+
+    events = list(reader.iter_lines("audit"))
+
+    assert [event["n"] for event in events] == list(range(10))
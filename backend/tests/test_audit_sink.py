@@ -0,0 +1,99 @@
+import json
+from datetime import datetime, timedelta
+
+from app.core.audit_segments import SegmentReader
+from app.core.audit_sink import FSYNC_NEVER, AuditSink
+from app.core.audit_store import DAY, AuditStore
+
+START = datetime(2026, 3, 14, 12, 0, 0)
+
+
+def make_event(n, when=None):
+    return {
+        "timestamp": (when or START + timedelta(seconds=n)).isoformat(),
+        "event_type": "login" if n % 2 else "upload",
+        "user_id": f"user-{n % 3}",
+        "status": "success",
+        "action": f"action-{n}",
+        "n": n,
+    }
+
+
+def submit_all(sink, events):
+    for event in events:
+        line = json.dumps(event)
+        date_str = event["timestamp"][:10].replace("-", "")
+        sink.submit("audit", date_str, line, row=AuditStore.to_row(event, line))
+
+
+def test_sink_store_segments_round_trip(tmp_path):
+    store = AuditStore(tmp_path / "audit.db", retention_days=None)
+    sink = AuditSink(
+        tmp_path, store=store, batch_size=50, flush_interval=0.01,
+        fsync_policy=FSYNC_NEVER, max_segment_bytes=4096,
+    )
+    events = [make_event(n) for n in range(200)]
+
+    submit_all(sink, events)
+    sink.close()
+
+    stats = sink.get_stats()
+    assert stats["written"] == 200
+    assert stats["rotations"] > 0
+    assert stats["compressed"] == stats["rotations"]
+    assert list(tmp_path.glob("audit_*.log.gz"))
+
+    segment_events = list(SegmentReader(tmp_path).iter_lines("audit"))
+    assert [event["n"] for event in segment_events] == list(range(200))
+    indexed = list(store.iter_events(batch_size=30))
+    assert [event["n"] for event in indexed] == list(range(200))
+    logins = list(store.iter_events(event_type="login", user_id="user-1"))
+    assert [event["n"] for event in logins] == [n for n in range(200) if n % 2 and n % 3 == 1]
+
+
+def test_index_failure_keeps_segment_lines(tmp_path):
+    class BrokenStore(AuditStore):
+        def insert_many(self, rows):
+            raise RuntimeError("database is locked")
+
+    sink = AuditSink(
+        tmp_path, store=BrokenStore(tmp_path / "audit.db"), flush_interval=0.01,
+        fsync_policy=FSYNC_NEVER, compress=False,
+    )
+
+    submit_all(sink, [make_event(n) for n in range(10)])
+    sink.close()
+
+    assert sink.get_stats()["index_errors"] == 10
+    assert [event["n"] for event in SegmentReader(tmp_path).iter_lines("audit")] == list(range(10))
+
+
+def test_cursor_pages_through_equal_timestamps(tmp_path):
+    store = AuditStore(tmp_path / "audit.db")
+    events = [make_event(n, when=START) for n in range(25)]
+    store.insert_many([AuditStore.to_row(event, json.dumps(event)) for event in events])
+
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = store.query(limit=10, cursor=cursor)
+        seen.extend(event["n"] for event in page)
+        if cursor is None:
+            break
+
+    assert seen == list(range(25))
+
+
+def test_prune_keeps_rollups_for_reports(tmp_path):
+    store = AuditStore(tmp_path / "audit.db", retention_days=30)
+    now = START.timestamp()
+    old = [make_event(n, when=START - timedelta(days=40, seconds=n)) for n in range(5)]
+    recent = [make_event(n, when=START - timedelta(days=1, seconds=n)) for n in range(5, 8)]
+    store.insert_many([AuditStore.to_row(event, json.dumps(event)) for event in old + recent])
+
+    assert store.prune(now=now, batch_size=2) == 5
+
+    assert store.horizon(now) <= now - 30 * DAY
+    assert [event["n"] for event in store.iter_events()] == [7, 6, 5]
+    counts = store.counts(START - timedelta(days=60), START)
+    assert sum(counts.values()) == 8
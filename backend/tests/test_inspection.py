@@ -0,0 +1,58 @@
+from starlette.requests import Request
+
+from app.core.inspection import DEFAULT_RULES, CompiledRuleSet, InspectionRule, RuleEngine
+
+
+def make_request(path="/", query=b"", headers=()):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": query,
+        "headers": [(name.encode(), value.encode()) for name, value in headers],
+    })
+
+
+def test_overlapping_signatures_are_all_reported():
+    engine = RuleEngine()
+    matched = engine.inspect(make_request(headers=[("user-agent", "sqlmap/1.4")]))
+
+    assert {rule.id for rule in matched} == {"legacy-sql-keyword", "scanner-user-agent"}
+    assert engine.get_stats() == {"legacy-sql-keyword": 1, "scanner-user-agent": 1}
+
+
+def test_rule_starting_inside_another_match_is_reported():
+    rules = [
+        InspectionRule("abc", r"abc", ("path",)),
+        InspectionRule("bcd", r"bcd", ("path",)),
+    ]
+    engine = RuleEngine()
+    engine.ruleset = CompiledRuleSet.compile(rules)
+
+    matched = engine.inspect(make_request(path="/abcd"))
+
+    assert {rule.id for rule in matched} == {"abc", "bcd"}
+
+
+def test_clean_request_matches_nothing():
+    engine = RuleEngine()
+    matched = engine.inspect(make_request(
+        path="/api/v1/media",
+        query=b"page=2",
+        headers=[("user-agent", "Mozilla/5.0")],
+    ))
+
+    assert matched == []
+    assert engine.get_stats() == {}
+
+
+def test_invalid_rules_are_skipped():
+    rules = [InspectionRule("bad", r"(?P<name>x)"), InspectionRule("ok", r"evil", ("path",))]
+
+    ruleset = CompiledRuleSet.compile(rules)
+
+    assert [rule.id for rule in ruleset.rules] == ["ok"]
+
+
+def test_default_rules_compile():
+    assert len(CompiledRuleSet.compile(DEFAULT_RULES).rules) == len(DEFAULT_RULES)
@@ -0,0 +1,38 @@
+import pytest
+
+from app.core.metrics import HdrHistogram
+
+
+def test_quantiles_within_relative_precision():
+    histogram = HdrHistogram()
+    values = [i / 1e5 for i in range(1, 100_001)]  # 10 us to 1 s
+    for value in values:
+        histogram.record(value)
+
+    for q in (0.5, 0.9, 0.99, 0.999):
+        exact = values[int(q * len(values)) - 1]
+        assert histogram.quantile(q) == pytest.approx(exact, rel=2 ** -6)
+    assert histogram.quantile(1.0) == histogram.max == 1.0
+    assert histogram.count == 100_000
+
+
+def test_small_values_are_exact():
+    histogram = HdrHistogram()
+    for micros in (1, 2, 3, 50, 100):
+        histogram.record(micros * 1e-6)
+
+    assert histogram.quantile(0.2) == pytest.approx(1e-6)
+    assert histogram.quantile(0.6) == pytest.approx(3e-6)
+    assert histogram.quantile(1.0) == pytest.approx(100e-6)
+
+
+def test_cumulative_counts_for_prometheus_buckets():
+    histogram = HdrHistogram()
+    for value in (0.001, 0.004, 0.02, 0.2, 3.0):
+        histogram.record(value)
+
+    assert histogram.cumulative((0.005, 0.05, 0.5, 5.0)) == [2, 3, 4, 5]
+
+
+def test_empty_histogram():
+    assert HdrHistogram().quantile(0.99) == 0.0
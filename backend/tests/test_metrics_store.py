@@ -0,0 +1,64 @@
+import time
+
+from app.core.metrics_store import MetricsStore
+
+FIELDS = ("cpu", "memory.used")
+
+
+def sample(i):
+    return {"cpu": float(i % 100), "memory": {"used": float(1000 + i)}}
+
+
+def timestamps():
+    hour = time.time() // 3600 * 3600
+    start = hour - 3 * 3600
+    # Every 10 s for 2.5 hours, so minute and hour boundaries are crossed
+    return [start + 10 * i for i in range(900)]
+
+
+def contents(path):
+    return {file.name: file.read_bytes() for file in sorted(path.iterdir())}
+
+
+def test_restart_produces_same_files_as_uninterrupted_run(tmp_path):
+    series = timestamps()
+    uninterrupted = MetricsStore(tmp_path / "a", FIELDS)
+    for i, ts in enumerate(series):
+        uninterrupted.append(sample(i), ts)
+
+    # Stop mid-minute and mid-hour, just before an hour boundary
+    stop = 355
+    first = MetricsStore(tmp_path / "b", FIELDS)
+    for i, ts in enumerate(series[:stop]):
+        first.append(sample(i), ts)
+    restarted = MetricsStore(tmp_path / "b", FIELDS)
+    for i, ts in enumerate(series[stop:], start=stop):
+        restarted.append(sample(i), ts)
+
+    assert contents(tmp_path / "b") == contents(tmp_path / "a")
+
+
+def test_rollups_hold_mean_min_and_max(tmp_path):
+    store = MetricsStore(tmp_path, FIELDS)
+    series = timestamps()
+    for i, ts in enumerate(series[:13]):
+        store.append(sample(i), ts)
+
+    minutes = store.query(hours=4, resolution="1m")
+
+    assert [entry["count"] for entry in minutes] == [6, 6]
+    assert minutes[0]["cpu"] == 2.5
+    assert minutes[0]["cpu.min"] == 0.0
+    assert minutes[0]["cpu.max"] == 5.0
+    assert minutes[1]["memory.used.max"] == 1011.0
+
+
+def test_missing_fields_are_none(tmp_path):
+    store = MetricsStore(tmp_path, FIELDS)
+    ts = timestamps()[0]
+
+    store.append({"cpu": 1.0}, ts)
+
+    assert store.query(hours=4, resolution="raw") == [
+        {"timestamp": ts, "cpu": 1.0, "memory.used": None}
+    ]
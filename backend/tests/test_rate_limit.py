@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.core import rate_limit
+from app.core.redis import RedisHealth
+from app.core.rate_limit import InMemoryGCRA, RateLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+def test_gcra_allows_burst_up_to_limit(clock):
+    limiter = InMemoryGCRA()
+
+    results = [limiter.hit("ip:1", limit=5, period=10) for _ in range(6)]
+
+    assert [result.allowed for result in results] == [True] * 5 + [False]
+    assert [result.remaining for result in results[:5]] == [4, 3, 2, 1, 0]
+    assert results[5].retry_after == pytest.approx(2.0)
+
+
+def test_gcra_refills_one_interval_at_a_time(clock):
+    limiter = InMemoryGCRA()
+    for _ in range(5):
+        limiter.hit("ip:1", limit=5, period=10)
+
+    clock.now += 2.0
+    assert limiter.hit("ip:1", limit=5, period=10).allowed
+    assert not limiter.hit("ip:1", limit=5, period=10).allowed
+    # Other keys have their own budget
+    assert limiter.hit("ip:2", limit=5, period=10).allowed
+
+
+def test_gcra_cost_larger_than_budget_is_rejected(clock):
+    limiter = InMemoryGCRA()
+
+    assert not limiter.hit("key", limit=10, period=60, cost=11).allowed
+    assert limiter.hit("key", limit=10, period=60, cost=10).allowed
+
+
+def test_gcra_evicts_least_recent_keys(clock):
+    limiter = InMemoryGCRA(max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.hit(key, limit=1, period=60)
+
+    assert list(limiter._tat) == ["b", "c"]
+
+
+class FailingRedis:
+    def __init__(self):
+        self.calls = 0
+
+    def get_async_client(self):
+        return self
+
+    def register_script(self, script):
+        async def run(keys, args):
+            self.calls += 1
+            raise RedisConnectionError("timed out")
+        return run
+
+
+def test_falls_back_to_memory_and_trips_shared_circuit(clock, monkeypatch):
+    redis = FailingRedis()
+    monkeypatch.setattr(rate_limit, "redis_client", redis)
+    health = RedisHealth(retry_interval=30)
+    limiter = RateLimiter(limit=2, period=60, health=health)
+    other = RateLimiter(limit=2, period=60, prefix="quota", health=health)
+
+    async def hits():
+        return [await limiter.hit("ip:1") for _ in range(3)] + [await other.hit("ip:1")]
+
+    results = asyncio.run(hits())
+
+    assert [result.allowed for result in results] == [True, True, False, True]
+    # Only the first call waited on Redis; the circuit skipped it afterwards
+    assert redis.calls == 1
+    assert not health.available
+
+    clock.now += 30
+    asyncio.run(limiter.hit("ip:2"))
+    assert redis.calls == 2
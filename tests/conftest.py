@@ -0,0 +1,100 @@
+from typing import BinaryIO, Dict, Iterator, Set, Tuple
+
+import pytest
+
+from app.storage.base import STORAGE_STREAM_CHUNK_SIZE, StorageBackend, StorageError, StorageNotFoundError
+
+
+class MemoryBackend(StorageBackend):
+    """
+    In-memory storage backend for tests.
+    Uploads of the part numbers in ``fail_parts`` and ranged reads at the
+    offsets in ``fail_reads`` fail until removed, to simulate a transfer
+    interrupted part way.
+    """
+    min_part_size = 1
+
+    def __init__(self, name: str):
+        self.name = name
+        self.files: Dict[str, bytes] = {}
+        self.uploads: Dict[str, Dict[int, bytes]] = {}
+        self.fail_parts: Set[int] = set()
+        self.fail_reads: Set[int] = set()
+        self.calls: Dict[str, int] = {}
+        self._next_upload = 0
+
+    def _call(self, operation: str) -> None:
+        self.calls[operation] = self.calls.get(operation, 0) + 1
+
+    def _get(self, path: str) -> bytes:
+        if path not in self.files:
+            raise StorageNotFoundError(f"{path} not found")
+        return self.files[path]
+
+    def upload(self, file: BinaryIO, path: str) -> str:
+        self._call("upload")
+        data = b""
+        while True:
+            chunk = file.read(1024)
+            if not chunk:
+                break
+            data += chunk
+        self.files[path] = data
+        return self.url(path)
+
+    def download(self, path: str) -> bytes:
+        return self._get(path)
+
+    def open_stream(self, path: str, chunk_size: int = STORAGE_STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+        data = self._get(path)
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+
+    def delete(self, path: str) -> None:
+        self._get(path)
+        del self.files[path]
+
+    def url(self, path: str) -> str:
+        return f"memory://{self.name}/{path}"
+
+    def size(self, path: str) -> int:
+        return len(self._get(path))
+
+    def read_range(self, path: str, start: int, length: int) -> bytes:
+        self._call("read_range")
+        if start in self.fail_reads:
+            raise StorageError(f"Read of {path} at {start} failed")
+        return self._get(path)[start:start + length]
+
+    def create_multipart(self, path: str) -> str:
+        self._call("create_multipart")
+        self._next_upload += 1
+        upload_id = str(self._next_upload)
+        self.uploads[upload_id] = {}
+        return upload_id
+
+    def upload_part(self, path: str, upload_id: str, part_number: int, data: bytes) -> str:
+        self._call("upload_part")
+        if part_number in self.fail_parts:
+            raise StorageError(f"Part {part_number} of {path} failed")
+        self.uploads[upload_id][part_number] = data
+        return f"etag-{part_number}"
+
+    def list_parts(self, path: str, upload_id: str) -> Dict[int, str]:
+        if upload_id not in self.uploads:
+            raise StorageError(f"No upload {upload_id}")
+        return {number: f"etag-{number}" for number in self.uploads[upload_id]}
+
+    def complete_multipart(self, path: str, upload_id: str, parts: Dict[int, str]) -> str:
+        stored = self.uploads.pop(upload_id)
+        self.files[path] = b"".join(stored[number] for number in sorted(parts))
+        return self.url(path)
+
+    def abort_multipart(self, path: str, upload_id: str) -> None:
+        self._call("abort_multipart")
+        self.uploads.pop(upload_id, None)
+
+
+@pytest.fixture
+def memory_backends() -> Tuple[MemoryBackend, MemoryBackend]:
+    return MemoryBackend("hot"), MemoryBackend("cold")
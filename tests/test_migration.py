@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+sqlalchemy = pytest.importorskip("sqlalchemy")
+policy = pytest.importorskip("app.storage.policy")
+
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.models.file import FileMetadata, StorageBackendType  # noqa: E402
+from app.storage.manager import StorageManager  # noqa: E402
+
+
+class MemoryStorageManager(StorageManager):
+    def __init__(self, hot, cold):
+        self.backends = {"s3": hot, "b2": cold}
+        self.default_backend = "s3"
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def db():
+    engine = sqlalchemy.create_engine("sqlite://")
+    FileMetadata.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def storage(db, memory_backends):
+    hot, cold = memory_backends
+    old = datetime.utcnow() - timedelta(days=policy.HOT_STORAGE_MAX_AGE_DAYS + 1)
+    for number in range(1, 6):
+        path = f"media/{number}.mp4"
+        hot.files[path] = f"video {number}".encode()
+        db.add(FileMetadata(
+            path=path, backend=StorageBackendType.S3, url=hot.url(path), uploaded_at=old
+        ))
+    hot.files["media/new.mp4"] = b"recent"
+    db.add(FileMetadata(
+        path="media/new.mp4", backend=StorageBackendType.S3, url=hot.url("media/new.mp4")
+    ))
+    db.commit()
+    return MemoryStorageManager(hot, cold)
+
+
+def test_migration_resumes_from_checkpoint(db, storage):
+    hot, cold = storage.backends["s3"], storage.backends["b2"]
+    checkpoints = []
+
+    def interrupt(progress):
+        checkpoints.append(progress.as_dict())
+        raise Interrupted()
+
+    with pytest.raises(Interrupted):
+        policy.migrate_hot_to_cold(db, storage, batch_size=2, on_progress=interrupt)
+    assert checkpoints[0]["last_id"] == 2
+    assert checkpoints[0]["moved"] == 2
+
+    progress = policy.migrate_hot_to_cold(db, storage, batch_size=2, checkpoint=checkpoints[0])
+
+    assert progress.moved == 5
+    assert progress.failed == 0
+    assert progress.total == 5
+    assert progress.cutoff == checkpoints[0]["cutoff"]
+    # Files of the committed batch are not copied again
+    assert cold.calls["upload"] == 5
+    assert sorted(cold.files) == [f"media/{number}.mp4" for number in range(1, 6)]
+    assert list(hot.files) == ["media/new.mp4"]
+    cold_rows = db.query(FileMetadata).filter(FileMetadata.backend == StorageBackendType.B2).count()
+    assert cold_rows == 5
+
+
+def test_file_moved_before_commit_uses_cold_copy(db, storage):
+    hot, cold = storage.backends["s3"], storage.backends["b2"]
+    # A previous run moved the file but crashed before committing its batch
+    hot.move("media/1.mp4", cold)
+
+    progress = policy.migrate_hot_to_cold(db, storage, batch_size=2)
+
+    assert progress.moved == 5
+    assert cold.calls["upload"] == 5
+    row = db.query(FileMetadata).filter(FileMetadata.path == "media/1.mp4").one()
+    assert row.backend == StorageBackendType.B2
+    assert row.url == cold.url("media/1.mp4")
+
+
+def test_failed_file_is_recorded_and_skipped(db, storage, monkeypatch):
+    hot = storage.backends["s3"]
+    del hot.files["media/3.mp4"]
+    monkeypatch.setattr(policy.time, "sleep", lambda seconds: None)
+
+    progress = policy.migrate_hot_to_cold(db, storage, batch_size=2, max_retries=1)
+
+    assert progress.moved == 4
+    assert progress.failed == 1
+    assert progress.failed_ids == [3]
+    assert progress.last_id == 5
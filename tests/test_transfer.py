@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+from app.storage.transfer import TransferEngine, TransferError
+
+PART_SIZE = 1024
+DATA = os.urandom(PART_SIZE * 4 + 100)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return TransferEngine(
+        part_size=PART_SIZE, concurrency=2, max_retries=0, state_dir=str(tmp_path / "state")
+    )
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(DATA)
+    return path
+
+
+def test_upload_resumes_after_failed_part(engine, source, memory_backends):
+    backend, _ = memory_backends
+    backend.fail_parts = {3}
+
+    with open(source, "rb") as f:
+        with pytest.raises(TransferError) as excinfo:
+            engine.upload(backend, f, "media/video.mp4")
+    assert excinfo.value.failed_parts == [3]
+    assert "media/video.mp4" not in backend.files
+
+    backend.fail_parts = set()
+    with open(source, "rb") as f:
+        report = engine.upload(backend, f, "media/video.mp4")
+
+    assert backend.files["media/video.mp4"] == DATA
+    assert backend.calls["create_multipart"] == 1
+    assert report.parts == 5
+    assert report.resumed_parts == 4
+    assert report.bytes_transferred == PART_SIZE
+    assert os.listdir(engine.state_dir) == []
+
+
+def test_upload_restarts_when_local_file_changed(engine, source, memory_backends):
+    backend, _ = memory_backends
+    backend.fail_parts = {3}
+    with open(source, "rb") as f:
+        with pytest.raises(TransferError):
+            engine.upload(backend, f, "media/video.mp4")
+
+    changed = DATA[::-1]
+    source.write_bytes(changed)
+    os.utime(source, ns=(0, 0))
+    backend.fail_parts = set()
+    with open(source, "rb") as f:
+        report = engine.upload(backend, f, "media/video.mp4")
+
+    assert backend.files["media/video.mp4"] == changed
+    assert backend.calls["abort_multipart"] == 1
+    assert report.resumed_parts == 0
+
+
+def test_download_resumes_after_failed_part(engine, tmp_path, memory_backends):
+    backend, _ = memory_backends
+    backend.files["media/video.mp4"] = DATA
+    backend.fail_reads = {PART_SIZE}
+    dest = str(tmp_path / "download.mp4")
+
+    with pytest.raises(TransferError) as excinfo:
+        engine.download(backend, "media/video.mp4", dest)
+    assert excinfo.value.failed_parts == [2]
+    assert not os.path.exists(dest)
+
+    backend.fail_reads = set()
+    report = engine.download(backend, "media/video.mp4", dest)
+
+    with open(dest, "rb") as f:
+        assert f.read() == DATA
+    assert report.resumed_parts == 4
+    assert report.bytes_transferred == PART_SIZE
+    assert backend.calls["read_range"] == 6
+    assert not os.path.exists(dest + ".part")
+
+
+def test_download_of_empty_file(engine, tmp_path, memory_backends):
+    backend, _ = memory_backends
+    backend.files["empty.bin"] = b""
+    dest = tmp_path / "empty.bin"
+
+    engine.download(backend, "empty.bin", str(dest))
+
+    assert dest.read_bytes() == b""
+    assert "read_range" not in backend.calls